@@ -1,14 +1,21 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, BackgroundTasks, status, Depends
-from fastapi.responses import JSONResponse
+import time
+_import_started = time.perf_counter()
+
+from fastapi import FastAPI, HTTPException, UploadFile, File, BackgroundTasks, status, Depends, Request, Header
+from fastapi.responses import JSONResponse, PlainTextResponse, FileResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 import uvicorn
 import os
 import sys
 import shutil
+import subprocess
+import json
 import uuid
+import asyncio
 from typing import List, Dict, Any, Optional, Annotated, Union
 import datetime
+from contextlib import asynccontextmanager
 from fastapi.staticfiles import StaticFiles 
 
 # Imports for Authentication
@@ -20,28 +27,89 @@ from passlib.context import CryptContext
 sys.path.append(os.path.dirname(__file__))
 
 # Import the core query function from your refactored privateGPT.py
-from privateGPT import get_answer_from_privateGPT
+from privateGPT import aget_answer_from_privateGPT, get_chunk
 
 # Import the core ingestion function from your refactored ingest.py
-from ingest import ingest_documents
+from ingest import ingest_documents, new_progress
 
 # Import constants from your constants.py
-from constants import SOURCE_DIRECTORY, PERSIST_DIRECTORY
+from constants import SOURCE_DIRECTORY, PERSIST_DIRECTORY, ENABLE_SERVER_TIMING, OLLAMA_KEEP_WARM_INTERVAL, QUERY_DEADLINE_SECONDS, API_WORKERS, CHROMA_SERVER_PORT, LLM_MAX_CONCURRENCY
+
+# Import the map-reduce summarization service
+from summarizer import summarize_document
+
+# Import blue-green reindexing and store version management
+from reindex import reindex
+from vectorstore import (
+    list_versions, activate_version, rollback_version, delete_version, delete_documents, store_write_lock,
+    write_chroma_server_file, remove_chroma_server_file,
+)
+
+# Import the shared, pooled Ollama client
+from ollama_client import ollama_client
+from scheduler import worker_share
+
+# Import the chat session store
+from sessions import session_store
+
+# Import the job status dictionaries shared by all API workers
+from shared_state import job_store
+
+# Import the metrics registry and stage timers from metrics.py
+from metrics import (
+    render_metrics,
+    collect_timings,
+    server_timing_header,
+    QUERIES_TOTAL,
+    QUERIES_IN_FLIGHT,
+    INGESTION_TASKS,
+)
+
+# Import the opt-in request profiler from profiling.py
+from profiling import new_profile_id, profile_request, list_profiles, get_profile_path
+
+# Import the background warm-up and readiness state from startup.py
+from startup import start_background_warm_up, is_ready, startup_report, record_phase
 
 # Import config.py for authentication secrets and admin credentials
 from config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, ADMIN_USERNAME, ADMIN_HASHED_PASSWORD, pwd_context
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Loads the heavy models in a background thread so the server starts accepting
+    connections (and answering /health) immediately. /ready reports when warm-up is done.
+    Also keeps the Ollama model resident with periodic keep-warm pings.
+    """
+    start_background_warm_up()
+    keep_warm_task = None
+    if OLLAMA_KEEP_WARM_INTERVAL > 0:
+        keep_warm_task = asyncio.create_task(ollama_client.keep_warm_loop())
+    yield
+    if keep_warm_task is not None:
+        keep_warm_task.cancel()
+    await ollama_client.aclose()
+
 
-# --- In-memory dictionary to track ingestion task statuses ---
-ingestion_tasks_status: Dict[str, Dict[str, Any]] = {}
+app = FastAPI(lifespan=lifespan)
 
 # Define possible task states as constants for clarity and consistency
 TASK_STATUS_PENDING = "PENDING"
 TASK_STATUS_IN_PROGRESS = "IN_PROGRESS"
 TASK_STATUS_COMPLETED = "COMPLETED"
 TASK_STATUS_FAILED = "FAILED"
+UNFINISHED_TASK_STATES = (TASK_STATUS_PENDING, TASK_STATUS_IN_PROGRESS)
+
+# Seconds between checks for new ingestion progress on an event stream, and between keep-alive comments
+INGESTION_EVENTS_INTERVAL_SECONDS = 0.25
+INGESTION_EVENTS_KEEP_ALIVE_SECONDS = 15
+
+# --- Dictionaries to track ingestion task statuses, summarization and reindex jobs ---
+# In memory with a single worker; shared through SQLite between workers with API_WORKERS > 1
+ingestion_tasks_status: Dict[str, Dict[str, Any]] = job_store("ingestion", "overall_status", UNFINISHED_TASK_STATES, TASK_STATUS_FAILED)
+summarization_jobs: Dict[str, Dict[str, Any]] = job_store("summarize", "status", UNFINISHED_TASK_STATES, TASK_STATUS_FAILED)
+reindex_jobs: Dict[str, Dict[str, Any]] = job_store("reindex", "status", UNFINISHED_TASK_STATES, TASK_STATUS_FAILED)
 
 # --- CORS Configuration ---
 app.add_middleware(
@@ -56,11 +124,33 @@ app.add_middleware(
 class QueryRequest(BaseModel):
     """Defines the expected structure for a query request from the frontend."""
     query: str
+    # Optional conversation id; queries with the same id are answered as follow-ups
+    session_id: Optional[str] = Field(default=None, max_length=64, pattern=r"^[A-Za-z0-9_-]+$")
+
+class SourceReference(BaseModel):
+    """Compact reference to a source chunk of an answer; the full chunk is served by `/chunk/{id}`."""
+    id: str
+    source: str
+    document: str
+    page: Optional[int] = None
+    score: float
+    snippet: str
+    # [start, end) character offsets of the query terms within the snippet
+    highlights: List[List[int]]
 
 class QueryResponse(BaseModel):
     """Defines the expected structure for a query response to the frontend."""
     answer: str
-    source_documents: List[Dict[str, Any]]
+    source_documents: List[SourceReference]
+    session_id: Optional[str] = None
+    # Prompt and completion token counts reported by the LLM
+    usage: Optional[Dict[str, Any]] = None
+
+class ChunkResponse(BaseModel):
+    """Defines the response structure for a source chunk request."""
+    id: str
+    page_content: str
+    metadata: Dict[str, Any]
 
 class FileStatus(BaseModel):
     """Defines the status structure for an individual file within an ingestion task."""
@@ -78,6 +168,43 @@ class IngestionStatusResponse(BaseModel):
     task_id: str
     status: str
     files: List[FileStatus]
+    # Share of chunks whose embedding was reused from the embedding cache (set once completed)
+    embedding_cache_hit_rate: Optional[float] = None
+    # Chunks detected as near-duplicates of stored chunks (skipped or linked, see DEDUP_MODE)
+    near_duplicates: Optional[int] = None
+    # Live progress of the pipeline: stage, documents_total/documents_parsed, chunks_produced/
+    # chunks_embedded, rows_read (CSV), pages_total/pages_parsed (large PDFs), eta_seconds
+    progress: Dict[str, Any] = {}
+
+class SummarizeRequest(BaseModel):
+    """Defines the expected structure for a summarization request (original filename of the document)."""
+    filename: str
+
+class SummarizeStatusResponse(BaseModel):
+    """Defines the response structure for a summarization job status request."""
+    job_id: str
+    filename: str
+    status: str
+    progress: Dict[str, Any]
+    summary: Optional[str] = None
+    error: Optional[str] = None
+
+class ReindexRequest(BaseModel):
+    """Defines the expected structure for a reindex request."""
+    # Embedding model of the new store version (EMBEDDINGS_MODEL_NAME when omitted)
+    embeddings_model: Optional[str] = None
+    # Split the source documents again with the current chunking settings
+    rechunk: bool = False
+    # Make the new version active as soon as it is complete
+    activate: bool = True
+
+class ReindexStatusResponse(BaseModel):
+    """Defines the response structure for a reindex job status request."""
+    job_id: str
+    status: str
+    progress: Dict[str, Any]
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
 
 
 # --- Authentication Models ---
@@ -149,6 +276,28 @@ async def get_current_active_user(current_user: Annotated[User, Depends(get_curr
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Inactive user")
     return current_user
 
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login", auto_error=False)
+
+async def get_profile_id(
+    token: Annotated[Union[str, None], Depends(optional_oauth2_scheme)],
+    x_profile: Annotated[Union[str, None], Header()] = None,
+) -> Union[str, None]:
+    """
+    Returns a new profile id when the request asks to be profiled with the
+    `X-Profile: true` header, or None otherwise. Profiling is restricted to
+    authenticated admins, even on endpoints that are otherwise public.
+    """
+    if not x_profile or x_profile.lower() not in ("1", "true", "yes"):
+        return None
+    if token is None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Request profiling is only available to authenticated admins.",
+        )
+    user = await get_current_active_user(await get_current_user(token))
+    print(f"API: Profiling requested by '{user.username}'.")
+    return new_profile_id()
+
 
 # --- API Endpoints ---
 
@@ -173,6 +322,27 @@ async def login_for_access_token(
     return {"access_token": access_token, "token_type": "bearer"}
 
 
+# How often a long-running request checks whether its client is still connected (seconds)
+DISCONNECT_POLL_INTERVAL = 0.5
+
+class ClientDisconnected(Exception):
+    """Raised when the client went away before its request finished."""
+
+async def run_until_disconnected(http_request: Request, coro):
+    """
+    Awaits `coro` in a task and cancels it as soon as the client disconnects, so that
+    queued or in-flight LLM work for clients that gave up is dropped.
+    """
+    task = asyncio.create_task(coro)
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_INTERVAL)
+        if done:
+            return task.result()
+        if await http_request.is_disconnected():
+            task.cancel()
+            raise ClientDisconnected()
+
+
 @app.get("/health")
 async def health_check():
     """
@@ -181,15 +351,44 @@ async def health_check():
     """
     return {"status": "ok", "message": "PrivateGPT API is running."}
 
+@app.get("/ready")
+async def readiness_check():
+    """
+    Readiness probe. Returns 200 once the embedding model and vector store have been
+    warmed up, 503 while still starting (or if warm-up failed).
+    The body reports where startup time went (imports and warm-up phases).
+    """
+    report = startup_report()
+    return JSONResponse(
+        content=report,
+        status_code=status.HTTP_200_OK if is_ready() else status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
+
 @app.post("/query", response_model=QueryResponse)
-async def query_llm_endpoint(request: QueryRequest):
+async def query_llm_endpoint(
+    request: QueryRequest,
+    http_request: Request,
+    profile_id: Annotated[Union[str, None], Depends(get_profile_id)],
+):
     """
     Endpoint to receive a user query and return an answer from the PrivateGPT model.
-    It calls the `get_answer_from_privateGPT` function from `privateGPT.py`.
+    It calls the `aget_answer_from_privateGPT` function from `privateGPT.py`.
+    The LLM call is scheduled as interactive work; it is cancelled if the client
+    disconnects and abandoned after QUERY_DEADLINE_SECONDS.
+    Admins can send `X-Profile: true` to capture a profile of the server process while
+    this query runs (other requests served meanwhile are included).
     """
     print(f"API: Received query: '{request.query}'")
+    QUERIES_IN_FLIGHT.inc()
+    # Unauthenticated chat users are told apart by address for scheduling fairness
+    user = http_request.client.host if http_request.client else "anonymous"
+    deadline = time.monotonic() + QUERY_DEADLINE_SECONDS
     try:
-        response_data = get_answer_from_privateGPT(request.query)
+        with collect_timings() as timings, profile_request(profile_id, "query", request.query[:200]):
+            response_data = await run_until_disconnected(
+                http_request,
+                aget_answer_from_privateGPT(request.query, user=user, deadline=deadline, session_id=request.session_id),
+            )
 
         if not isinstance(response_data, dict) or "answer" not in response_data:
             raise HTTPException(
@@ -199,20 +398,74 @@ async def query_llm_endpoint(request: QueryRequest):
         
         response_data.setdefault("source_documents", [])
 
+        headers = {}
+        if ENABLE_SERVER_TIMING and timings:
+            headers["Server-Timing"] = server_timing_header(timings)
+        if profile_id:
+            headers["X-Profile-Id"] = profile_id
+
+        QUERIES_TOTAL.inc(outcome="success")
         print("API: Successfully processed query.")
-        return JSONResponse(content=response_data)
+        return JSONResponse(content=response_data, headers=headers)
+    except ClientDisconnected:
+        QUERIES_TOTAL.inc(outcome="cancelled")
+        print("API: Client disconnected, query cancelled.")
+        # 499 (client closed request); nobody is listening for the body anyway
+        return JSONResponse(content={"detail": "Client disconnected."}, status_code=499)
     except HTTPException as e:
+        QUERIES_TOTAL.inc(outcome="error")
         raise e
     except Exception as e:
+        QUERIES_TOTAL.inc(outcome="error")
         print(f"API: Unhandled error in /query endpoint: {e}", file=sys.stderr)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Internal server error processing query: {e}"
         )
+    finally:
+        QUERIES_IN_FLIGHT.dec()
+
+@app.delete("/sessions/{session_id}")
+async def delete_session_endpoint(session_id: str):
+    """
+    Ends a chat session and frees its history. Session ids are unguessable and only
+    known to the client that started the conversation.
+    """
+    if not session_store.delete(session_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Session not found or already expired.")
+    return JSONResponse(content={"message": "Session ended."}, status_code=status.HTTP_200_OK)
+
+@app.get("/chunk/{chunk_id}", response_model=ChunkResponse)
+async def get_chunk_endpoint(chunk_id: str):
+    """
+    Returns the full text and metadata of a source chunk referenced by a query
+    response. The frontend calls it only when a user expands a source. A chunk id
+    always refers to the same text, but its document may be deleted, so clients may
+    cache the response only briefly.
+    """
+    chunk = await asyncio.to_thread(get_chunk, chunk_id)
+    if chunk is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Chunk not found.")
+    return JSONResponse(content=chunk, headers={"Cache-Control": "private, max-age=60"})
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """
+    Exposes per-stage latency histograms and server counters in the
+    Prometheus text exposition format.
+    """
+    # Ingestion queue depth is derived from the task table at scrape time
+    for task_state in (TASK_STATUS_PENDING, TASK_STATUS_IN_PROGRESS, TASK_STATUS_COMPLETED, TASK_STATUS_FAILED):
+        INGESTION_TASKS.set(
+            sum(1 for task in ingestion_tasks_status.values() if task["overall_status"] == task_state),
+            status=task_state,
+        )
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
 
 @app.post("/upload_and_ingest", response_model=UploadResponse, status_code=status.HTTP_202_ACCEPTED)
 async def upload_and_ingest_endpoint(
     current_user: Annotated[User, Depends(get_current_active_user)], # MOVED THIS FIRST
+    profile_id: Annotated[Union[str, None], Depends(get_profile_id)],
     files: List[UploadFile] = File(...),
     background_tasks: BackgroundTasks = BackgroundTasks(),
 ):
@@ -220,6 +473,8 @@ async def upload_and_ingest_endpoint(
     Endpoint to handle document uploads and trigger their ingestion into the vector store.
     Files are saved to `SOURCE_DIRECTORY` and then processed by `ingest.py` in the background.
     This endpoint is now protected and requires authentication.
+    With `X-Profile: true`, the server process is profiled while the background ingestion
+    of this upload runs (other requests served meanwhile are included).
     """
     if not files:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No files uploaded.")
@@ -228,7 +483,8 @@ async def upload_and_ingest_endpoint(
     
     ingestion_tasks_status[task_id] = {
         "overall_status": TASK_STATUS_IN_PROGRESS,
-        "files": []
+        "files": [],
+        "progress": new_progress(len(files)),
     }
 
     uploaded_filenames = []
@@ -261,7 +517,7 @@ async def upload_and_ingest_endpoint(
 
         print(f"API: All files for task {task_id} saved. Triggering ingestion in background.")
 
-        background_tasks.add_task(ingest_documents_wrapper, saved_file_paths, task_id)
+        background_tasks.add_task(ingest_documents_wrapper, saved_file_paths, task_id, profile_id)
 
         return JSONResponse(
             content={
@@ -269,7 +525,8 @@ async def upload_and_ingest_endpoint(
                 "filenames": uploaded_filenames,
                 "task_id": task_id
             },
-            status_code=status.HTTP_202_ACCEPTED
+            status_code=status.HTTP_202_ACCEPTED,
+            headers={"X-Profile-Id": profile_id} if profile_id else None,
         )
     except Exception as e:
         print(f"API: Error during file upload or ingestion setup for task {task_id}: {e}", file=sys.stderr)
@@ -289,7 +546,7 @@ async def upload_and_ingest_endpoint(
         )
 
 # Wrapper function for ingest_documents to handle status updates.
-def ingest_documents_wrapper(saved_file_paths: List[str], task_id: str):
+def ingest_documents_wrapper(saved_file_paths: List[str], task_id: str, profile_id: Union[str, None] = None):
     print(f"API: Background task {task_id}: Starting ingestion process for {len(saved_file_paths)} files.")
     
     if task_id in ingestion_tasks_status:
@@ -298,7 +555,8 @@ def ingest_documents_wrapper(saved_file_paths: List[str], task_id: str):
         ingestion_tasks_status[task_id]["overall_status"] = TASK_STATUS_IN_PROGRESS
 
     try:
-        ingestion_result = ingest_documents() 
+        with profile_request(profile_id, "ingestion", f"task {task_id}: {len(saved_file_paths)} file(s)"):
+            ingestion_result = ingest_documents(progress=ingestion_tasks_status[task_id].get("progress"))
 
         if "error" in ingestion_result:
             if task_id in ingestion_tasks_status:
@@ -309,6 +567,8 @@ def ingest_documents_wrapper(saved_file_paths: List[str], task_id: str):
         else:
             if task_id in ingestion_tasks_status:
                 ingestion_tasks_status[task_id]["overall_status"] = TASK_STATUS_COMPLETED
+                ingestion_tasks_status[task_id]["embedding_cache_hit_rate"] = ingestion_result.get("embedding_cache_hit_rate")
+                ingestion_tasks_status[task_id]["near_duplicates"] = ingestion_result.get("near_duplicates")
                 for file_entry in ingestion_tasks_status[task_id]["files"]:
                     file_entry["status"] = TASK_STATUS_COMPLETED
             print(f"API: Background task {task_id}: Ingestion COMPLETED successfully for all files.")
@@ -341,15 +601,80 @@ async def get_ingestion_status_endpoint(
     task_info = ingestion_tasks_status.get(task_id)
     if task_info is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Task ID not found.")
-    
+    return ingestion_status_response(task_id, task_info)
+
+def ingestion_status_response(task_id: str, task_info: Dict[str, Any]) -> IngestionStatusResponse:
     files_status_list = [FileStatus(filename=f["filename"], status=f["status"]) for f in task_info["files"]]
 
     return IngestionStatusResponse(
         task_id=task_id,
         status=task_info["overall_status"],
-        files=files_status_list
+        files=files_status_list,
+        embedding_cache_hit_rate=task_info.get("embedding_cache_hit_rate"),
+        near_duplicates=task_info.get("near_duplicates"),
+        progress=dict(task_info.get("progress") or {}),
     )
 
+@app.get("/ingestion_status/{task_id}/events")
+async def ingestion_events_endpoint(
+    task_id: str,
+    request: Request,
+    current_user: Annotated[User, Depends(get_current_active_user)]
+):
+    """
+    Server-Sent Events stream of an ingestion task's progress. Every change is pushed
+    as a `progress` event whose data is the same JSON as `/ingestion_status/{task_id}`;
+    the stream ends after the event with the final status. Clients no longer need to
+    poll. The token goes in the Authorization header, so browsers read the stream with
+    `fetch` (EventSource cannot send headers).
+    """
+    if ingestion_tasks_status.get(task_id) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Task ID not found.")
+
+    async def events():
+        last_event = None
+        last_sent = time.monotonic()
+        while not await request.is_disconnected():
+            task_info = ingestion_tasks_status.get(task_id)
+            if task_info is None: # Removed while being watched
+                return
+            # The task's progress dict is updated in place by the ingestion thread; compare snapshots
+            event = json.dumps(ingestion_status_response(task_id, task_info).model_dump())
+            if event != last_event:
+                yield f"event: progress\ndata: {event}\n\n"
+                last_event, last_sent = event, time.monotonic()
+            elif time.monotonic() - last_sent >= INGESTION_EVENTS_KEEP_ALIVE_SECONDS:
+                yield ": keep-alive\n\n" # Keeps proxies from closing an idle stream
+                last_sent = time.monotonic()
+            if task_info["overall_status"] not in UNFINISHED_TASK_STATES:
+                return
+            await asyncio.sleep(INGESTION_EVENTS_INTERVAL_SECONDS)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}, # No buffering in nginx
+    )
+
+def find_document_path(filename: str) -> Union[str, None]:
+    """
+    Returns the path in SOURCE_DIRECTORY of the uploaded document with this original
+    filename (uploads are stored with a unique suffix), or None if there is none.
+    """
+    if not os.path.exists(SOURCE_DIRECTORY):
+        return None
+
+    original_name_base, original_name_ext = os.path.splitext(filename)
+
+    for f_on_disk in os.listdir(SOURCE_DIRECTORY):
+        file_on_disk_base, file_on_disk_ext = os.path.splitext(f_on_disk)
+
+        if file_on_disk_ext == original_name_ext and file_on_disk_base.startswith(original_name_base):
+            document_path = os.path.join(SOURCE_DIRECTORY, f_on_disk)
+            print(f"API: Found matching file on disk: '{document_path}' for original filename '{filename}'")
+            return document_path
+    return None
+
 @app.delete("/delete_document/{filename}", status_code=status.HTTP_200_OK)
 async def delete_document_endpoint(
     filename: str, 
@@ -363,19 +688,7 @@ async def delete_document_endpoint(
     """
     print(f"API: Received request to delete document: '{filename}'")
     
-    file_to_delete_path = None
-    
-    print(f"API: Contents of SOURCE_DIRECTORY ({SOURCE_DIRECTORY}): {os.listdir(SOURCE_DIRECTORY)}")
-
-    original_name_base, original_name_ext = os.path.splitext(filename)
-
-    for f_on_disk in os.listdir(SOURCE_DIRECTORY):
-        file_on_disk_base, file_on_disk_ext = os.path.splitext(f_on_disk)
-
-        if file_on_disk_ext == original_name_ext and file_on_disk_base.startswith(original_name_base):
-            file_to_delete_path = os.path.join(SOURCE_DIRECTORY, f_on_disk)
-            print(f"API: Found matching file on disk: '{file_to_delete_path}' for original filename '{filename}'")
-            break
+    file_to_delete_path = find_document_path(filename)
 
     if not file_to_delete_path:
         print(f"API: Document '{filename}' NOT found in source directory after checking all files.")
@@ -388,7 +701,7 @@ async def delete_document_endpoint(
         os.remove(file_to_delete_path)
         print(f"API: Successfully deleted file from source directory: {file_to_delete_path}")
 
-        background_tasks.add_task(ingest_documents_after_delete_wrapper)
+        background_tasks.add_task(ingest_documents_after_delete_wrapper, file_to_delete_path)
 
         return JSONResponse(
             content={"message": f"Document '{filename}' deleted and re-ingestion triggered."},
@@ -411,13 +724,17 @@ async def delete_document_endpoint(
         )
 
 # Wrapper function for ingest_documents after a delete operation
-def ingest_documents_after_delete_wrapper():
+def ingest_documents_after_delete_wrapper(deleted_path: str):
     """
     A wrapper to trigger ingest_documents after a file deletion.
-    This ensures the vector store is updated to reflect the deletion.
+    This ensures the vector store is updated to reflect the deletion: the deleted
+    document's chunks (and its index entries) are removed first.
     """
     print("API: Background task: Re-ingestion triggered after document deletion.")
     try:
+        with store_write_lock:
+            removed = delete_documents([deleted_path])
+        print(f"API: Removed {removed} chunks of '{deleted_path}' from the vector store.")
         ingestion_result = ingest_documents()
         if "error" in ingestion_result:
             print(f"API: Re-ingestion after delete FAILED: {ingestion_result['error']}", file=sys.stderr)
@@ -428,6 +745,177 @@ def ingest_documents_after_delete_wrapper():
         import traceback
         traceback.print_exc()
 
+@app.post("/summarize", status_code=status.HTTP_202_ACCEPTED)
+async def summarize_endpoint(
+    request: SummarizeRequest,
+    current_user: Annotated[User, Depends(get_current_active_user)],
+    background_tasks: BackgroundTasks,
+):
+    """
+    Starts a map-reduce summarization job for an ingested document and returns its job id.
+    Poll `/summarize/{job_id}` for progress and the summary.
+    The LLM calls run as batch work, so they never take the slots kept for chat queries.
+    This endpoint is protected and requires authentication.
+    """
+    document_path = find_document_path(request.filename)
+    if not document_path:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Document '{request.filename}' not found in source directory."
+        )
+
+    job_id = str(uuid.uuid4())
+    summarization_jobs[job_id] = {
+        "filename": request.filename,
+        "status": TASK_STATUS_PENDING,
+        "progress": {},
+        "summary": None,
+        "error": None,
+    }
+    background_tasks.add_task(summarize_document_wrapper, job_id, document_path, current_user.username)
+    print(f"API: Summarization job {job_id} started for '{document_path}'.")
+    return JSONResponse(
+        content={"message": "Summarization started in background.", "job_id": job_id},
+        status_code=status.HTTP_202_ACCEPTED,
+    )
+
+# Wrapper coroutine for summarize_document to handle job status updates.
+async def summarize_document_wrapper(job_id: str, document_path: str, user: str):
+    job = summarization_jobs[job_id]
+    job["status"] = TASK_STATUS_IN_PROGRESS
+    try:
+        result = await summarize_document(document_path, user=user, progress=job["progress"])
+        job["summary"] = result["summary"]
+        job["status"] = TASK_STATUS_COMPLETED
+        print(f"API: Summarization job {job_id} COMPLETED ({result['chunks']} chunks, {result['chunks_cached']} cached).")
+    except Exception as e:
+        job["error"] = str(e)
+        job["status"] = TASK_STATUS_FAILED
+        print(f"API: Summarization job {job_id} FAILED: {e}", file=sys.stderr)
+
+@app.get("/summarize/{job_id}", response_model=SummarizeStatusResponse)
+async def get_summarize_status_endpoint(
+    job_id: str,
+    current_user: Annotated[User, Depends(get_current_active_user)]
+):
+    """
+    Endpoint to check the status of a summarization job.
+    Returns the current stage and counts while running, and the summary once completed.
+    This endpoint is protected and requires authentication.
+    """
+    job = summarization_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job ID not found.")
+    return SummarizeStatusResponse(job_id=job_id, **job)
+
+@app.post("/reindex", status_code=status.HTTP_202_ACCEPTED)
+async def reindex_endpoint(
+    request: ReindexRequest,
+    current_user: Annotated[User, Depends(get_current_active_user)],
+    background_tasks: BackgroundTasks,
+):
+    """
+    Starts building a new store version (blue-green reindex) and returns its job id.
+    Queries are answered from the current version until the new one is complete and
+    swapped in. Poll `/reindex/{job_id}` for progress.
+    This endpoint is protected and requires authentication.
+    """
+    if any(job["status"] in UNFINISHED_TASK_STATES for job in reindex_jobs.values()):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A reindex is already running.")
+
+    job_id = str(uuid.uuid4())
+    reindex_jobs[job_id] = {"status": TASK_STATUS_PENDING, "progress": {}, "result": None, "error": None}
+    background_tasks.add_task(reindex_wrapper, job_id, request)
+    print(f"API: Reindex job {job_id} started (embeddings_model={request.embeddings_model}, rechunk={request.rechunk}).")
+    return JSONResponse(
+        content={"message": "Reindex started in background.", "job_id": job_id},
+        status_code=status.HTTP_202_ACCEPTED,
+    )
+
+# Wrapper function for reindex to handle job status updates (runs in the thread pool).
+def reindex_wrapper(job_id: str, request: ReindexRequest):
+    job = reindex_jobs[job_id]
+    job["status"] = TASK_STATUS_IN_PROGRESS
+    try:
+        job["result"] = reindex(request.embeddings_model, rechunk=request.rechunk, activate=request.activate, progress=job["progress"])
+        job["status"] = TASK_STATUS_COMPLETED
+        print(f"API: Reindex job {job_id} COMPLETED: {job['result']}")
+    except Exception as e:
+        job["error"] = str(e)
+        job["status"] = TASK_STATUS_FAILED
+        print(f"API: Reindex job {job_id} FAILED: {e}", file=sys.stderr)
+
+@app.get("/reindex/{job_id}", response_model=ReindexStatusResponse)
+async def get_reindex_status_endpoint(
+    job_id: str,
+    current_user: Annotated[User, Depends(get_current_active_user)]
+):
+    """
+    Endpoint to check the status of a reindex job.
+    This endpoint is protected and requires authentication.
+    """
+    job = reindex_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job ID not found.")
+    return ReindexStatusResponse(job_id=job_id, **job)
+
+@app.get("/store_versions")
+async def list_store_versions_endpoint(current_user: Annotated[User, Depends(get_current_active_user)]):
+    """
+    Endpoint to list the vector store versions, with the active and previous version.
+    This endpoint is protected and requires authentication.
+    """
+    return list_versions()
+
+@app.post("/store_versions/rollback")
+async def rollback_store_version_endpoint(current_user: Annotated[User, Depends(get_current_active_user)]):
+    """
+    Endpoint to re-activate the previous store version (e.g. after a bad reindex).
+    This endpoint is protected and requires authentication.
+    """
+    try:
+        version = rollback_version()
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    print(f"API: Rolled back to store version '{version}'.")
+    return {"message": f"Store version '{version}' is active.", "active": version}
+
+@app.post("/store_versions/{version}/activate")
+async def activate_store_version_endpoint(
+    version: str,
+    current_user: Annotated[User, Depends(get_current_active_user)]
+):
+    """
+    Endpoint to make an existing store version active.
+    This endpoint is protected and requires authentication.
+    """
+    details = list_versions()["versions"].get(version)
+    if details is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Store version '{version}' not found.")
+    if details.get("status") in ("building", "failed"):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Store version '{version}' is {details['status']}.")
+    activate_version(version)
+    print(f"API: Activated store version '{version}'.")
+    return {"message": f"Store version '{version}' is active.", "active": version}
+
+@app.delete("/store_versions/{version}")
+async def delete_store_version_endpoint(
+    version: str,
+    current_user: Annotated[User, Depends(get_current_active_user)]
+):
+    """
+    Endpoint to delete an inactive store version and free its disk space.
+    This endpoint is protected and requires authentication.
+    """
+    if version not in list_versions()["versions"]:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Store version '{version}' not found.")
+    try:
+        await asyncio.to_thread(delete_version, version)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    print(f"API: Deleted store version '{version}'.")
+    return {"message": f"Store version '{version}' deleted."}
+
 @app.get("/list_documents")
 async def list_documents_endpoint(current_user: Annotated[User, Depends(get_current_active_user)]):
     """
@@ -466,6 +954,30 @@ async def list_documents_endpoint(current_user: Annotated[User, Depends(get_curr
             detail=f"Failed to list documents: {e}"
         )
 
+@app.get("/profiles")
+async def list_profiles_endpoint(current_user: Annotated[User, Depends(get_current_active_user)]):
+    """
+    Lists the stored request profiles, newest first, with their per-library breakdown.
+    Profiles sample the whole server process (`"scope": "process"`), not only the request.
+    This endpoint is protected and requires authentication.
+    """
+    return JSONResponse(content=list_profiles(), status_code=status.HTTP_200_OK)
+
+@app.get("/profiles/{profile_id}")
+async def download_profile_endpoint(
+    profile_id: str,
+    current_user: Annotated[User, Depends(get_current_active_user)]
+):
+    """
+    Downloads a stored profile as folded stacks, which can be rendered with
+    flamegraph.pl, speedscope or inferno.
+    This endpoint is protected and requires authentication.
+    """
+    profile_path = get_profile_path(profile_id)
+    if profile_path is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found.")
+    return FileResponse(profile_path, media_type="text/plain", filename=f"{profile_id}.folded")
+
 @app.get("/")
 async def read_root():
     """
@@ -485,10 +997,50 @@ async def serve_admin_page(current_user: Annotated[User, Depends(get_current_act
     if not os.path.exists(admin_html_path):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Admin page not found.")
     return FileResponse(admin_html_path)
+record_phase("api_server_import", time.perf_counter() - _import_started)
+
+def start_chroma_server() -> subprocess.Popen:
+    """
+    Starts a local Chroma server that owns PERSIST_DIRECTORY and waits until it answers.
+    The API workers reach the vector store through it (see CHROMA_SERVER_HOST), and so
+    do the ingest, reindex and transfer scripts while it runs (see `chroma_server_address`).
+    """
+    chroma_executable = shutil.which("chroma") or os.path.join(os.path.dirname(sys.executable), "chroma")
+    process = subprocess.Popen(
+        [chroma_executable, "run", "--path", PERSIST_DIRECTORY, "--host", "127.0.0.1", "--port", str(CHROMA_SERVER_PORT)]
+    )
+    import chromadb
+    for _ in range(120):
+        if process.poll() is not None:
+            raise RuntimeError(f"The Chroma server exited with code {process.returncode}.")
+        try:
+            chromadb.HttpClient(host="127.0.0.1", port=CHROMA_SERVER_PORT).heartbeat()
+            write_chroma_server_file(process.pid, "127.0.0.1", CHROMA_SERVER_PORT)
+            return process
+        except Exception:
+            time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError(f"The Chroma server did not start on port {CHROMA_SERVER_PORT}.")
+
 # --- Main entry point for running the FastAPI app with Uvicorn ---
 if __name__ == "__main__":
     print("Starting FastAPI server...")
     print(f"API will listen on http://127.0.0.1:8000")
     print(f"Source documents will be saved in: {SOURCE_DIRECTORY}")
     print(f"ChromaDB will persist in: {PERSIST_DIRECTORY}")
-    uvicorn.run(app, host="127.0.0.1", port=8000)
\ No newline at end of file
+    if API_WORKERS > 1:
+        # The workers share one Chroma server instead of each opening PERSIST_DIRECTORY
+        chroma_server = start_chroma_server()
+        os.environ["CHROMA_SERVER_HOST"] = "127.0.0.1"
+        print(f"Chroma server listening on 127.0.0.1:{CHROMA_SERVER_PORT}; starting {API_WORKERS} API workers.")
+        if LLM_MAX_CONCURRENCY % API_WORKERS:
+            print(f"Warning: LLM_MAX_CONCURRENCY={LLM_MAX_CONCURRENCY} is not a multiple of API_WORKERS={API_WORKERS}; "
+                  f"each worker sends up to {worker_share(LLM_MAX_CONCURRENCY)} generations to Ollama at once.")
+        try:
+            uvicorn.run("api_server:app", host="127.0.0.1", port=8000, workers=API_WORKERS)
+        finally:
+            remove_chroma_server_file()
+            chroma_server.terminate()
+            chroma_server.wait()
+    else:
+        uvicorn.run(app, host="127.0.0.1", port=8000)
\ No newline at end of file
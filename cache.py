@@ -0,0 +1,163 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from constants import CACHE_DIRECTORY
+from metrics import CACHE_REQUESTS_TOTAL
+
+
+def content_hash(*parts: str) -> str:
+    """Stable SHA-256 hex digest of the given strings (used to build cache keys)."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+# Last-access times of cache hits are written in batches, so lookups stay reads:
+# after this many hits or seconds, or before entries are evicted
+ACCESS_FLUSH_ENTRIES = 1000
+ACCESS_FLUSH_SECONDS = 30.0
+
+
+class DiskCache:
+    """
+    Persistent key/value cache stored in a SQLite file under CACHE_DIRECTORY.
+
+    Values are bytes. When `max_bytes` is set, the least recently used entries are
+    evicted once the total size of the stored values exceeds it. The total is kept
+    up to date by triggers, so checking it costs no scan. SQLite in WAL mode makes
+    the cache safe to share between threads and processes.
+    Lookups are counted in the `privategpt_cache_requests_total` metric under `name`.
+    """
+    def __init__(self, name: str, max_bytes: Optional[int] = None, directory: str = CACHE_DIRECTORY):
+        self.name = name
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"{name}.sqlite3")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY,"
+            " value BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries(last_access)")
+        self._conn.commit()
+        self._create_total()
+        self._accessed: Dict[str, float] = {} # Hits whose last access is not written yet
+        self._accessed_since = time.monotonic()
+
+    def _create_total(self) -> None:
+        """Creates the running byte total (from the entries already stored) and the triggers that maintain it."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("CREATE TABLE IF NOT EXISTS total (id INTEGER PRIMARY KEY CHECK (id = 0), bytes INTEGER NOT NULL)")
+                self._conn.execute("INSERT OR IGNORE INTO total (id, bytes) SELECT 0, COALESCE(SUM(size), 0) FROM entries")
+                self._conn.execute(
+                    "CREATE TRIGGER IF NOT EXISTS total_insert AFTER INSERT ON entries"
+                    " BEGIN UPDATE total SET bytes = bytes + new.size; END"
+                )
+                self._conn.execute(
+                    "CREATE TRIGGER IF NOT EXISTS total_delete AFTER DELETE ON entries"
+                    " BEGIN UPDATE total SET bytes = bytes - old.size; END"
+                )
+                self._conn.execute(
+                    "CREATE TRIGGER IF NOT EXISTS total_update AFTER UPDATE OF size ON entries"
+                    " BEGIN UPDATE total SET bytes = bytes + new.size - old.size; END"
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _total_bytes(self) -> int:
+        return self._conn.execute("SELECT bytes FROM total").fetchone()[0]
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, bytes]:
+        """Returns the cached values for the keys that are present."""
+        keys = list(dict.fromkeys(keys))
+        found: Dict[str, bytes] = {}
+        with self._lock:
+            # Stay below SQLite's limit on bound parameters
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(f"SELECT key, value FROM entries WHERE key IN ({placeholders})", batch).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self._accessed.update((key, now) for key in found)
+                if len(self._accessed) >= ACCESS_FLUSH_ENTRIES or time.monotonic() - self._accessed_since >= ACCESS_FLUSH_SECONDS:
+                    self._write_accesses()
+                    self._conn.commit()
+        CACHE_REQUESTS_TOTAL.inc(len(found), cache=self.name, result="hit")
+        CACHE_REQUESTS_TOTAL.inc(len(keys) - len(found), cache=self.name, result="miss")
+        return found
+
+    def put(self, key: str, value: bytes) -> None:
+        self.put_many([(key, value)])
+
+    def put_many(self, items: Iterable[Tuple[str, bytes]]) -> None:
+        now = time.time()
+        rows = [(key, sqlite3.Binary(value), len(value), now) for key, value in items]
+        if not rows:
+            return
+        with self._lock:
+            # An upsert rather than INSERT OR REPLACE: a replaced row would not fire the delete trigger
+            self._conn.executemany(
+                "INSERT INTO entries (key, value, size, last_access) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT(key) DO UPDATE SET value = excluded.value, size = excluded.size, last_access = excluded.last_access",
+                rows,
+            )
+            self._write_accesses()
+            self._conn.commit()
+            if self.max_bytes is not None:
+                self._evict()
+
+    def _write_accesses(self) -> None:
+        """Writes the pending last-access times (without committing). Caller holds the lock."""
+        if self._accessed:
+            self._conn.executemany(
+                "UPDATE entries SET last_access = MAX(last_access, ?) WHERE key = ?",
+                [(accessed_at, key) for key, accessed_at in self._accessed.items()],
+            )
+            self._accessed.clear()
+        self._accessed_since = time.monotonic()
+
+    def _evict(self) -> None:
+        """Deletes least recently used entries until the cache fits in `max_bytes`. Caller holds the lock."""
+        total = self._total_bytes()
+        if total <= self.max_bytes:
+            return
+        to_delete: List[str] = []
+        for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY last_access ASC"):
+            if total <= self.max_bytes:
+                break
+            to_delete.append(key)
+            total -= size
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key in to_delete])
+        self._conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries, total = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0], self._total_bytes()
+        return {"entries": entries, "bytes": total, "max_bytes": self.max_bytes}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._accessed.clear()
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
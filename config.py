@@ -4,7 +4,6 @@ from passlib.context import CryptContext
 # Secret key for JWT. GENERATE A STRONG, RANDOM ONE!
 # You can generate one with: python -c "import secrets; print(secrets.token_hex(32))"
 # Store this in an environment variable for production!
-import secrets; print(secrets.token_hex(32))
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "b8cbfededb9eaf54d82858bc4f5e9103ba83d0598fecc4fe0db3115a01fc4510")
 ALGORITHM = "HS256" # Algorithm used for JWT signing
 
@@ -14,6 +14,11 @@ SOURCE_DIRECTORY = os.environ.get('SOURCE_DIRECTORY', 'source_documents') # Defa
 # Name of the embeddings model to use (e.g., 'all-MiniLM-L6-v2')
 EMBEDDINGS_MODEL_NAME = os.environ.get('EMBEDDINGS_MODEL_NAME', 'intfloat/multilingual-e5-large')
 
+# Maximum number of tokens the embedding model reads; longer chunks are truncated when embedded.
+# 0 (the default) reads it from the loaded model (`max_seq_length`, e.g. 256 for all-MiniLM-L6-v2);
+# set it only to override the model's own limit
+EMBEDDINGS_MAX_SEQ_LENGTH = int(os.environ.get('EMBEDDINGS_MAX_SEQ_LENGTH', 0))
+
 # --- LLM Settings (for Ollama) ---
 # Type of LLM (currently supports "Ollama")
 MODEL_TYPE = os.environ.get('MODEL_TYPE', 'Ollama')
@@ -37,22 +42,173 @@ MAX_NEW_TOKENS = int(os.environ.get('MAX_NEW_TOKENS', 512)) # Default to 512
 # Higher values (e.g., 0.7-1.0) make output more creative/diverse.
 TEMPERATURE = float(os.environ.get('TEMPERATURE', 0.2)) # Default to 0.2
 
+# Hugging Face repository whose tokenizer matches OLLAMA_MODEL_NAME, used to count prompt tokens
+# (e.g. 'microsoft/Phi-3-mini-4k-instruct'). Known models are mapped automatically (see tokenizer.py);
+# otherwise token counts are estimated.
+LLM_TOKENIZER_NAME = os.environ.get('LLM_TOKENIZER_NAME', '')
+
+# Base URL of the Ollama server
+OLLAMA_BASE_URL = os.environ.get('OLLAMA_BASE_URL', 'http://localhost:11434')
+
+# How long Ollama keeps the model loaded after a request (e.g. '30m', '2h', '-1' for forever).
+# Keeping it resident avoids paying the model load on the first query after an idle period.
+OLLAMA_KEEP_ALIVE = os.environ.get('OLLAMA_KEEP_ALIVE', '30m')
+
+# Interval in seconds between keep-warm pings that keep the model loaded (0 disables them)
+OLLAMA_KEEP_WARM_INTERVAL = float(os.environ.get('OLLAMA_KEEP_WARM_INTERVAL', 240))
+
+# Timeout in seconds for a single Ollama request (generation can be slow on CPU)
+OLLAMA_REQUEST_TIMEOUT = float(os.environ.get('OLLAMA_REQUEST_TIMEOUT', 300))
+
+# Maximum number of pooled keep-alive connections to Ollama
+OLLAMA_MAX_CONNECTIONS = int(os.environ.get('OLLAMA_MAX_CONNECTIONS', 8))
+
+# Retries on connection errors / 5xx responses before a request fails
+OLLAMA_MAX_RETRIES = int(os.environ.get('OLLAMA_MAX_RETRIES', 2))
+
+# After this many consecutive failed requests, stop calling Ollama for OLLAMA_CIRCUIT_BREAKER_RESET_SECONDS
+OLLAMA_CIRCUIT_BREAKER_THRESHOLD = int(os.environ.get('OLLAMA_CIRCUIT_BREAKER_THRESHOLD', 5))
+OLLAMA_CIRCUIT_BREAKER_RESET_SECONDS = float(os.environ.get('OLLAMA_CIRCUIT_BREAKER_RESET_SECONDS', 30))
+
+# --- LLM Scheduling ---
+# Maximum number of generations sent to Ollama at once. Match this to Ollama's OLLAMA_NUM_PARALLEL;
+# extra requests wait in the server's queue instead of piling up inside Ollama. With API_WORKERS > 1,
+# the slots are split between the workers.
+LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', os.environ.get('OLLAMA_NUM_PARALLEL', 1)))
+
+# Maximum number of those slots batch work (summarization, bulk queries) may use at once.
+# Defaults to leaving one slot free for interactive chat when there is more than one.
+LLM_BATCH_MAX_CONCURRENCY = int(os.environ.get('LLM_BATCH_MAX_CONCURRENCY', max(1, LLM_MAX_CONCURRENCY - 1)))
+
+# Seconds an interactive query may spend waiting for and running on the LLM before it is abandoned
+QUERY_DEADLINE_SECONDS = float(os.environ.get('QUERY_DEADLINE_SECONDS', 300))
+
+# --- Chat Sessions ---
+# Maximum number of concurrent chat sessions kept in memory (least recently used are evicted first)
+SESSION_MAX_COUNT = int(os.environ.get('SESSION_MAX_COUNT', 1000))
+
+# Seconds of inactivity after which a chat session expires
+SESSION_TTL_SECONDS = float(os.environ.get('SESSION_TTL_SECONDS', 1800))
+
+# Number of past question/answer turns kept per session for condensing follow-up questions
+SESSION_MAX_TURNS = int(os.environ.get('SESSION_MAX_TURNS', 6))
+
+# Answers are truncated to this many characters in the session history
+SESSION_MAX_ANSWER_CHARS = int(os.environ.get('SESSION_MAX_ANSWER_CHARS', 1000))
+
+# --- Caching ---
+# Folder for the persistent caches (chunk summaries, ...), stored as SQLite files
+CACHE_DIRECTORY = os.environ.get('CACHE_DIRECTORY', 'cache')
+
+# Maximum size of the on-disk cache of parsed document text, in megabytes (0 disables it).
+# Re-ingesting unchanged files (e.g. after changing CHUNK_SIZE or the embedding model) then skips parsing.
+PARSED_TEXT_CACHE_MAX_MB = float(os.environ.get('PARSED_TEXT_CACHE_MAX_MB', 1024))
+
+# Maximum size of the on-disk cache of chunk embeddings, in megabytes (0 disables it).
+# Keyed by embedding model and chunk text, so repeated boilerplate and unchanged chunks are embedded only once.
+EMBEDDING_CACHE_MAX_MB = float(os.environ.get('EMBEDDING_CACHE_MAX_MB', 2048))
+
+# --- Summarization ---
+# Maximum size of the on-disk cache of chunk and partial summaries, in megabytes
+SUMMARY_CACHE_MAX_MB = float(os.environ.get('SUMMARY_CACHE_MAX_MB', 256))
+
+# Maximum number of tokens generated for each chunk / partial summary
+SUMMARY_MAX_TOKENS = int(os.environ.get('SUMMARY_MAX_TOKENS', 256))
+
 # --- Document Processing Settings ---
-# Chunk size for text splitting (how many characters in each text chunk)
+# Chunk size for text splitting (how many CHUNK_SIZE_UNITs in each text chunk)
 CHUNK_SIZE = int(os.environ.get('CHUNK_SIZE', 500))
 
-# Chunk overlap for text splitting (how many characters overlap between chunks)
+# Chunk overlap for text splitting (how many CHUNK_SIZE_UNITs overlap between chunks)
 CHUNK_OVERLAP = int(os.environ.get('CHUNK_OVERLAP', 50))
 
+# Unit of CHUNK_SIZE and CHUNK_OVERLAP: 'characters', or 'tokens' of the embedding model's tokenizer.
+# With 'tokens', chunks are also capped at what the embedding model reads so no text is cut off at embedding time.
+CHUNK_SIZE_UNIT = os.environ.get('CHUNK_SIZE_UNIT', 'characters').lower()
+
 # Number of relevant chunks to retrieve from the vector store
 TARGET_SOURCE_CHUNKS = int(os.environ.get('TARGET_SOURCE_CHUNKS', 4))
 
+# What to do with near-duplicate chunks (repeated templates, versions of the same text) at ingestion:
+# 'link' stores them linked to a canonical chunk and retrieval returns only one chunk per group,
+# 'skip' does not store them at all, 'off' disables detection.
+DEDUP_MODE = os.environ.get('DEDUP_MODE', 'link').lower()
+
+# Estimated word-shingle Jaccard similarity above which two chunks count as near-duplicates
+DEDUP_THRESHOLD = float(os.environ.get('DEDUP_THRESHOLD', 0.85))
+
+# Set to True to search in two steps: first pick the DOCUMENT_CANDIDATES documents closest to the
+# query from the small document-level index, then search chunks only within those documents.
+# Keeps search cost proportional to the candidates instead of the whole corpus.
+TWO_TIER_RETRIEVAL = os.environ.get('TWO_TIER_RETRIEVAL', 'False').lower() == 'true'
+
+# Number of candidate documents picked in the first step of two-tier retrieval
+DOCUMENT_CANDIDATES = int(os.environ.get('DOCUMENT_CANDIDATES', 5))
+
+# Maximum number of chunks from a single document in the retrieved context (two-tier retrieval),
+# so one long document cannot crowd out all the others
+MAX_CHUNKS_PER_DOCUMENT = int(os.environ.get('MAX_CHUNKS_PER_DOCUMENT', 2))
+
+# --- CSV Ingestion ---
+# CSV files are streamed instead of loaded whole: rows are read this many at a time,
+# packed into chunks (each starting with the header row) and embedded batch by batch,
+# so memory use does not grow with the file size
+CSV_BATCH_ROWS = int(os.environ.get('CSV_BATCH_ROWS', 5000))
+
+# --- Large PDFs ---
+# PDFs with at least this many pages are split into page ranges that are parsed and chunked
+# in parallel by a process pool, each range embedded as soon as it is ready (0 disables)
+PDF_PARALLEL_MIN_PAGES = int(os.environ.get('PDF_PARALLEL_MIN_PAGES', 200))
+
+# Number of pages in each range of a large PDF
+PDF_PAGE_RANGE_SIZE = int(os.environ.get('PDF_PAGE_RANGE_SIZE', 50))
+
+# --- Reindexing ---
+# Number of batches embedded and written in parallel while a new store version is built
+REINDEX_WORKERS = int(os.environ.get('REINDEX_WORKERS', 2))
+
+# Approximate number of chunks per reindex batch (a document's chunks always stay in one batch)
+REINDEX_BATCH_SIZE = int(os.environ.get('REINDEX_BATCH_SIZE', 512))
+
+# --- Bulk Import/Export ---
+# Number of chunks per record batch when a store version is exported to or imported from Parquet/Arrow files
+TRANSFER_BATCH_SIZE = int(os.environ.get('TRANSFER_BATCH_SIZE', 5000))
+
 # --- ChromaDB Settings (if using a client) ---
 # For a persistent, embedded ChromaDB (default), these usually aren't strictly necessary,
 # but can be helpful for explicit configuration if you scale up.
 # If you run into issues, you might need to adjust or remove this if not strictly needed
 # by your ChromaDB version and usage.
 
+# Host of a Chroma server to use instead of opening PERSIST_DIRECTORY in-process (empty = embedded).
+# Set automatically for the workers when API_WORKERS > 1 (scripts find that server through PERSIST_DIRECTORY/chroma_server.json).
+CHROMA_SERVER_HOST = os.environ.get('CHROMA_SERVER_HOST', '')
+
+# Port of the Chroma server (the one started for API_WORKERS > 1 listens on it too)
+CHROMA_SERVER_PORT = int(os.environ.get('CHROMA_SERVER_PORT', 8001))
+
+# --- Serving ---
+# Number of API server processes. With more than one, queries use several CPU cores: a local
+# Chroma server owns PERSIST_DIRECTORY, and task status and chat sessions are shared through SQLite.
+API_WORKERS = int(os.environ.get('API_WORKERS', 1))
+
 # --- Flag to hide source documents in the final answer ---
 # Set to True to hide the source documents that contributed to the answer.
-HIDE_SOURCE_DOCUMENTS = os.environ.get('HIDE_SOURCE_DOCUMENTS', 'False').lower() == 'true'
\ No newline at end of file
+HIDE_SOURCE_DOCUMENTS = os.environ.get('HIDE_SOURCE_DOCUMENTS', 'False').lower() == 'true'
+
+# Length in characters of the source snippet sent with each answer (the full chunk is fetched from /chunk/{id})
+SOURCE_SNIPPET_CHARS = int(os.environ.get('SOURCE_SNIPPET_CHARS', 240))
+
+# --- Observability ---
+# Set to True to add a `Server-Timing` header (per-stage durations) to /query responses.
+# Browsers show it in the network panel; useful to see where a slow query spends its time.
+ENABLE_SERVER_TIMING = os.environ.get('ENABLE_SERVER_TIMING', 'False').lower() == 'true'
+
+# Folder where per-request profiles (requested by admins with the `X-Profile` header) are stored
+PROFILE_DIRECTORY = os.environ.get('PROFILE_DIRECTORY', 'profiles')
+
+# Sampling interval of the request profiler, in milliseconds. Lower values give more detail but more overhead.
+PROFILE_SAMPLE_INTERVAL_MS = float(os.environ.get('PROFILE_SAMPLE_INTERVAL_MS', 5))
+
+# Maximum number of profiles kept on disk (oldest are deleted first)
+PROFILE_MAX_STORED = int(os.environ.get('PROFILE_MAX_STORED', 50))
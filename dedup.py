@@ -0,0 +1,185 @@
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import mmh3
+import numpy as np
+
+from constants import PERSIST_DIRECTORY, DEDUP_THRESHOLD
+
+
+# --- MinHash Signatures ---
+# Near-duplicate chunks (repeated templates, versions of the same policy) are found by
+# comparing MinHash signatures of their word shingles; LSH banding finds candidate
+# pairs without comparing every chunk with every other one.
+
+NUM_PERMUTATIONS = 128
+LSH_BANDS = 16 # 16 bands of 8 rows: pairs above ~0.7 similarity become candidates
+LSH_ROWS = NUM_PERMUTATIONS // LSH_BANDS
+SHINGLE_SIZE = 5 # Words per shingle
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+# Fixed seed: signatures must stay comparable across runs and processes
+_random = np.random.RandomState(1)
+_PERM_A = _random.randint(1, 1 << 32, size=NUM_PERMUTATIONS, dtype=np.uint64)
+_PERM_B = _random.randint(0, 1 << 32, size=NUM_PERMUTATIONS, dtype=np.uint64)
+
+
+def shingles(text: str) -> List[str]:
+    """Overlapping word n-grams of the case- and whitespace-normalized text."""
+    words = text.lower().split()
+    if len(words) <= SHINGLE_SIZE:
+        return [" ".join(words)]
+    return [" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)]
+
+
+def minhash_signature(text: str) -> np.ndarray:
+    """MinHash signature (NUM_PERMUTATIONS uint32 values) of the text's shingles."""
+    hashes = np.array([mmh3.hash(shingle, signed=False) for shingle in set(shingles(text))], dtype=np.uint64)
+    permuted = (np.outer(hashes, _PERM_A) + _PERM_B) % _MERSENNE_PRIME & _MAX_HASH
+    return permuted.min(axis=0).astype(np.uint32)
+
+
+def estimated_similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+    return float(np.count_nonzero(a == b)) / NUM_PERMUTATIONS
+
+
+def band_buckets(signature: np.ndarray) -> List[int]:
+    """One LSH bucket per band; chunks sharing any bucket are candidate near-duplicates."""
+    return [mmh3.hash64(signature[band * LSH_ROWS:(band + 1) * LSH_ROWS].tobytes())[0] for band in range(LSH_BANDS)]
+
+
+class DuplicateIndex:
+    """
+    Persistent LSH index of the chunks in the vector store, stored in a SQLite file
+    next to it. Each chunk is recorded with its signature and the id of its canonical
+    chunk (itself, unless it is a near-duplicate of an earlier chunk).
+    Entries are scoped by collection name, so store versions do not mix.
+    """
+    def __init__(self, path: str = os.path.join(PERSIST_DIRECTORY, "dedup_index.sqlite3"), threshold: float = DEDUP_THRESHOLD):
+        self.threshold = threshold
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            " collection TEXT NOT NULL,"
+            " chunk_id TEXT NOT NULL,"
+            " canonical_id TEXT NOT NULL,"
+            " signature BLOB NOT NULL,"
+            " PRIMARY KEY (collection, chunk_id))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            " collection TEXT NOT NULL,"
+            " band INTEGER NOT NULL,"
+            " bucket INTEGER NOT NULL,"
+            " chunk_id TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS buckets_lookup ON buckets(collection, band, bucket)")
+        # For removing the entries of deleted chunks
+        self._conn.execute("CREATE INDEX IF NOT EXISTS buckets_chunk ON buckets(collection, chunk_id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS chunks_canonical ON chunks(collection, canonical_id)")
+        self._conn.commit()
+
+    def find_canonical(self, collection: str, signature: np.ndarray, buckets: List[int]) -> Optional[str]:
+        """Returns the canonical id of the most similar indexed chunk above the threshold, if any."""
+        best: Tuple[float, Optional[str]] = (0.0, None)
+        with self._lock:
+            candidates = set()
+            for band, bucket in enumerate(buckets):
+                rows = self._conn.execute(
+                    "SELECT chunk_id FROM buckets WHERE collection = ? AND band = ? AND bucket = ?", (collection, band, bucket)
+                )
+                candidates.update(row[0] for row in rows)
+            for chunk_id in candidates:
+                canonical_id, data = self._conn.execute(
+                    "SELECT canonical_id, signature FROM chunks WHERE collection = ? AND chunk_id = ?", (collection, chunk_id)
+                ).fetchone()
+                similarity = estimated_similarity(signature, np.frombuffer(data, dtype=np.uint32))
+                if similarity >= self.threshold and similarity > best[0]:
+                    best = (similarity, canonical_id)
+        return best[1]
+
+    def add(self, collection: str, chunk_id: str, canonical_id: str, signature: np.ndarray, buckets: List[int]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO chunks (collection, chunk_id, canonical_id, signature) VALUES (?, ?, ?, ?)",
+                (collection, chunk_id, canonical_id, signature.tobytes()),
+            )
+            self._conn.executemany(
+                "INSERT INTO buckets (collection, band, bucket, chunk_id) VALUES (?, ?, ?, ?)",
+                [(collection, band, bucket, chunk_id) for band, bucket in enumerate(buckets)],
+            )
+
+    def commit(self) -> None:
+        with self._lock:
+            self._conn.commit()
+
+    def remove(self, collection: str, chunk_ids: List[str]) -> int:
+        """
+        Forgets chunks deleted from the store (e.g. the chunks of a deleted or re-ingested
+        document), so new chunks are no longer matched against them. Chunks that were
+        near-duplicates of a removed chunk are regrouped under the earliest of them.
+        Returns the number of entries removed.
+        """
+        removed = 0
+        with self._lock:
+            for start in range(0, len(chunk_ids), 500): # Stay below SQLite's limit on query parameters
+                batch = chunk_ids[start:start + 500]
+                marks = ",".join("?" * len(batch))
+                orphans: Dict[str, List[str]] = {}
+                for chunk_id, canonical_id in self._conn.execute(
+                    f"SELECT chunk_id, canonical_id FROM chunks WHERE collection = ? AND canonical_id IN ({marks})"
+                    f" AND chunk_id NOT IN ({marks}) ORDER BY rowid",
+                    (collection, *batch, *batch),
+                ):
+                    orphans.setdefault(canonical_id, []).append(chunk_id)
+                removed += self._conn.execute(
+                    f"DELETE FROM chunks WHERE collection = ? AND chunk_id IN ({marks})", (collection, *batch)
+                ).rowcount
+                self._conn.execute(f"DELETE FROM buckets WHERE collection = ? AND chunk_id IN ({marks})", (collection, *batch))
+                for group in orphans.values():
+                    self._conn.executemany(
+                        "UPDATE chunks SET canonical_id = ? WHERE collection = ? AND chunk_id = ?",
+                        [(group[0], collection, chunk_id) for chunk_id in group],
+                    )
+            self._conn.commit()
+        return removed
+
+    def drop_collection(self, collection: str) -> None:
+        """Forgets every chunk of a collection (e.g. a deleted store version)."""
+        with self._lock:
+            self._conn.execute("DELETE FROM chunks WHERE collection = ?", (collection,))
+            self._conn.execute("DELETE FROM buckets WHERE collection = ?", (collection,))
+            self._conn.commit()
+
+    def assign(self, collection: str, chunk_ids: List[str], texts: List[str]) -> Dict[str, str]:
+        """
+        Indexes the chunks (in order, so duplicates within the batch are found too) and
+        returns the canonical id of every chunk: its own id, or the id of the earlier
+        chunk it nearly duplicates.
+        """
+        canonical: Dict[str, str] = {}
+        for chunk_id, text in zip(chunk_ids, texts):
+            signature = minhash_signature(text)
+            buckets = band_buckets(signature)
+            canonical_id = self.find_canonical(collection, signature, buckets) or chunk_id
+            self.add(collection, chunk_id, canonical_id, signature, buckets)
+            canonical[chunk_id] = canonical_id
+        self.commit()
+        return canonical
+
+
+_duplicate_index: Optional[DuplicateIndex] = None
+
+def get_duplicate_index() -> DuplicateIndex:
+    """Returns the shared duplicate index of the vector store at PERSIST_DIRECTORY."""
+    global _duplicate_index
+    if _duplicate_index is None:
+        _duplicate_index = DuplicateIndex()
+    return _duplicate_index
@@ -16,7 +16,7 @@ document.addEventListener('DOMContentLoaded', () => {
     const uploadArea = document.querySelector('.upload-area');
     const logoutButton = document.getElementById('logout-button'); // Assuming you add a logout button to admin.html
 
-    let pollingIntervalId = null;
+    let ingestionStreamController = null; // Aborts the open ingestion progress stream
     let adminAccessToken = localStorage.getItem('adminAccessToken'); // Retrieve token
 
     // --- Helper Functions ---
@@ -249,7 +249,7 @@ document.addEventListener('DOMContentLoaded', () => {
                 }
             });
 
-            startPollingIngestionStatus(taskId);
+            watchIngestionProgress(taskId);
 
         } catch (error) {
             console.error('Error during upload:', error);
@@ -264,123 +264,181 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
-    // --- Ingestion Status Polling Logic ---
-    async function startPollingIngestionStatus(taskId) {
-        if (pollingIntervalId) {
-            clearInterval(pollingIntervalId);
+    // --- Ingestion Progress Stream ---
+
+    /**
+     * Share of an ingestion task that is done, in percent: parsing counts for the first half,
+     * embedding the chunks produced so far for the second (pages instead of documents for large PDFs).
+     * @param {Object} progress - The `progress` object of an ingestion status.
+     * @returns {number} A percentage between 0 and 100.
+     */
+    function progressPercent(progress) {
+        const parsed = progress.pages_total
+            ? progress.pages_parsed / progress.pages_total
+            : (progress.documents_total ? progress.documents_parsed / progress.documents_total : 0);
+        const embedded = progress.chunks_produced ? progress.chunks_embedded / progress.chunks_produced : 0;
+        return Math.min(100, Math.round((parsed + embedded) * 50));
+    }
+
+    /**
+     * Describes an ingestion task's progress in one line, e.g.
+     * "embedding: 2/3 documents parsed, 120/400 chunks embedded, about 12s left".
+     * @param {string} status - The overall task status.
+     * @param {Object} progress - The `progress` object of an ingestion status.
+     * @returns {string} The status line.
+     */
+    function describeProgress(status, progress) {
+        if (!progress || !progress.stage) {
+            return `Ingestion status: ${status}...`;
+        }
+        const parts = [`${progress.documents_parsed || 0}/${progress.documents_total || 0} documents parsed`];
+        if (progress.pages_total) {
+            parts.push(`${progress.pages_parsed || 0}/${progress.pages_total} PDF pages`);
+        }
+        if (progress.rows_read) {
+            parts.push(`${progress.rows_read} CSV rows`);
         }
+        parts.push(`${progress.chunks_embedded || 0}/${progress.chunks_produced || 0} chunks embedded`);
+        if (progress.eta_seconds !== null && progress.eta_seconds !== undefined) {
+            parts.push(`about ${Math.ceil(progress.eta_seconds)}s left`);
+        }
+        return `Ingestion ${progress.stage.replace(/_/g, ' ')}: ${parts.join(', ')}`;
+    }
 
-        pollingIntervalId = setInterval(async () => {
-            try {
-                const response = await fetch(`${API_INGESTION_STATUS_URL}/${taskId}`, {
-                    method: 'GET',
-                    headers: createAuthHeader(), // Send authorization header
-                });
-
-                if (response.status === 401) {
-                    handleUnauthorized();
-                    clearInterval(pollingIntervalId); // Stop polling on auth error
-                    return;
+    /**
+     * Updates the file rows and the status line from an ingestion status.
+     * @param {string} taskId - The ID of the ingestion task.
+     * @param {Object} data - The ingestion status (same shape as `/ingestion_status/{task_id}`).
+     */
+    function renderIngestionStatus(taskId, data) {
+        const progress = data.progress || {};
+        setStatus(ingestionStatus, describeProgress(data.status, progress), 'info');
+
+        data.files.forEach(fileInfo => {
+            const rowId = `file-row-${taskId}-${btoa(fileInfo.filename)}`;
+            let fileRow = document.getElementById(rowId);
+
+            if (!fileRow) {
+                // This block handles files that might appear in the backend's task list
+                // but were not initially rendered by the frontend (e.g., if page reloaded).
+                // It ensures they are added to the table.
+                fileRow = document.createElement('tr');
+                fileRow.id = rowId;
+                const fileInfoDetails = getFileIconAndColor(fileInfo.filename);
+
+                fileRow.innerHTML = `
+                    <td class="file-name-cell"><i class="${fileInfoDetails.iconClass} file-icon ${fileInfoDetails.colorClass}"></i> ${fileInfo.filename}</td>
+                    <td class="file-status-cell"></td>
+                    <td>N/A</td>
+                    <td><button class="delete-button" data-filename="${fileInfo.filename}" title="Delete ${fileInfo.filename}"><i class="fas fa-trash-alt"></i></button></td>
+                `;
+                fileListTbody.appendChild(fileRow);
+            }
+
+            const statusCell = fileRow.querySelector('.file-status-cell');
+            if (statusCell) {
+                statusCell.innerHTML = ''; // Clear previous content
+                const statusBadge = createStatusBadge(fileInfo.status);
+                statusCell.appendChild(statusBadge);
+
+                if (fileInfo.status === 'IN_PROGRESS') {
+                    const progressContainer = document.createElement('div');
+                    progressContainer.classList.add('progress-container');
+                    const progressBar = document.createElement('div');
+                    progressBar.classList.add('progress-bar');
+                    progressBar.style.width = `${progressPercent(progress)}%`;
+                    progressContainer.appendChild(progressBar);
+                    statusCell.appendChild(progressContainer);
                 }
+            }
+        });
+    }
+
+    /**
+     * Resets the upload controls once an ingestion task has finished or its progress is no longer known.
+     */
+    function finishIngestion() {
+        ingestionStreamController = null;
+        fileUpload.disabled = false;
+        uploadButton.disabled = false;
+        fileUpload.value = ''; // Clear input
+        // Ensure "No files" message is shown if the list is empty
+        if (fileListTbody.children.length === 0 && noFilesRow) {
+            noFilesRow.style.display = '';
+        }
+    }
 
-                const data = await response.json();
+    /**
+     * Follows an ingestion task through the server's progress event stream
+     * (`/ingestion_status/{task_id}/events`, Server-Sent Events). The stream is read with
+     * fetch because EventSource cannot send the Authorization header.
+     * @param {string} taskId - The ID of the ingestion task to follow.
+     */
+    async function watchIngestionProgress(taskId) {
+        if (ingestionStreamController) {
+            ingestionStreamController.abort();
+        }
+        const controller = new AbortController();
+        ingestionStreamController = controller;
+        let finalStatus = null;
 
-                if (!response.ok) {
-                    throw new Error(data.detail || `HTTP error! status: ${response.status}`);
-                }
+        try {
+            const response = await fetch(`${API_INGESTION_STATUS_URL}/${taskId}/events`, {
+                method: 'GET',
+                headers: { ...createAuthHeader(), 'Accept': 'text/event-stream' }, // Send authorization header
+                signal: controller.signal,
+            });
 
-                setStatus(ingestionStatus, `Ingestion status: ${data.status}...`, 'info');
-
-                data.files.forEach(fileInfo => {
-                    const rowId = `file-row-${taskId}-${btoa(fileInfo.filename)}`;
-                    const fileRow = document.getElementById(rowId);
-
-                    if (fileRow) {
-                        const statusCell = fileRow.querySelector('.file-status-cell');
-                        if (statusCell) {
-                            statusCell.innerHTML = ''; // Clear previous content
-                            const statusBadge = createStatusBadge(fileInfo.status);
-                            statusCell.appendChild(statusBadge);
-
-                            if (fileInfo.status === 'IN_PROGRESS') {
-                                const progressContainer = document.createElement('div');
-                                progressContainer.classList.add('progress-container');
-                                const progressBar = document.createElement('div');
-                                progressBar.classList.add('progress-bar');
-                                progressBar.style.width = `${fileInfo.progress || 0}%`; // Assuming backend provides progress
-                                progressContainer.appendChild(progressBar);
-                                statusCell.appendChild(progressContainer);
-                            }
-                        }
-                    } else {
-                        // This block handles files that might appear in the backend's task list
-                        // but were not initially rendered by the frontend (e.g., if page reloaded).
-                        // It ensures they are added to the table.
-                        const newRow = document.createElement('tr');
-                        newRow.id = rowId;
-                        const fileInfoDetails = getFileIconAndColor(fileInfo.filename);
-
-                        newRow.innerHTML = `
-                            <td class="file-name-cell"><i class="${fileInfoDetails.iconClass} file-icon ${fileInfoDetails.colorClass}"></i> ${fileInfo.filename}</td>
-                            <td class="file-status-cell"></td>
-                            <td>N/A</td>
-                            <td><button class="delete-button" data-filename="${fileInfo.filename}" title="Delete ${fileInfo.filename}"><i class="fas fa-trash-alt"></i></button></td>
-                        `;
-                        fileListTbody.appendChild(newRow);
-
-                        const statusCell = newRow.querySelector('.file-status-cell');
-                        if (statusCell) {
-                            const statusBadge = createStatusBadge(fileInfo.status);
-                            statusCell.appendChild(statusBadge);
-                            if (fileInfo.status === 'IN_PROGRESS') {
-                                const progressContainer = document.createElement('div');
-                                progressContainer.classList.add('progress-container');
-                                const progressBar = document.createElement('div');
-                                progressBar.classList.add('progress-bar');
-                                progressBar.style.width = `${fileInfo.progress || 0}%`;
-                                progressContainer.appendChild(progressBar);
-                                statusCell.appendChild(progressContainer);
-                            }
-                        }
-                    }
-                });
-
-                if (data.status === 'COMPLETED') {
-                    clearInterval(pollingIntervalId);
-                    setStatus(ingestionStatus, 'Ingestion complete! Documents are ready for querying.', 'success');
-                    setStatus(uploadStatus, 'Upload & Ingestion successful!', 'success');
-                    fileUpload.disabled = false;
-                    uploadButton.disabled = false;
-                    fileUpload.value = ''; // Clear input
-                    pollingIntervalId = null;
-                    listFiles(); // Refresh the list to show all currently ingested documents
-                } else if (data.status === 'FAILED') {
-                    clearInterval(pollingIntervalId);
-                    setStatus(ingestionStatus, 'Ingestion failed! Please check server logs for details.', 'error');
-                    setStatus(uploadStatus, 'Upload & Ingestion failed!', 'error');
-                    fileUpload.disabled = false;
-                    uploadButton.disabled = false;
-                    fileUpload.value = ''; // Clear input
-                    pollingIntervalId = null;
-                    listFiles(); // Refresh to ensure status reflects failure
+            if (response.status === 401) {
+                handleUnauthorized();
+                return;
+            }
+            if (!response.ok) {
+                const data = await response.json().catch(() => ({}));
+                throw new Error(data.detail || `HTTP error! status: ${response.status}`);
+            }
+
+            const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+            let buffer = '';
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += value;
+                // Events are separated by a blank line; the last piece may be incomplete
+                const events = buffer.split('\n\n');
+                buffer = events.pop();
+                for (const rawEvent of events) {
+                    const dataLines = rawEvent.split('\n')
+                        .filter(line => line.startsWith('data:'))
+                        .map(line => line.slice(5).trimStart());
+                    if (dataLines.length === 0) continue; // Keep-alive comment
+                    const data = JSON.parse(dataLines.join('\n'));
+                    renderIngestionStatus(taskId, data);
+                    finalStatus = data.status;
                 }
+            }
 
-            } catch (error) {
-                console.error('Error during ingestion status polling:', error);
-                clearInterval(pollingIntervalId);
-                setStatus(ingestionStatus, `Ingestion status check failed: ${error.message}`, 'error');
+            if (finalStatus === 'COMPLETED') {
+                setStatus(ingestionStatus, 'Ingestion complete! Documents are ready for querying.', 'success');
+                setStatus(uploadStatus, 'Upload & Ingestion successful!', 'success');
+                finishIngestion();
+                listFiles(); // Refresh the list to show all currently ingested documents
+            } else if (finalStatus === 'FAILED') {
+                setStatus(ingestionStatus, 'Ingestion failed! Please check server logs for details.', 'error');
                 setStatus(uploadStatus, 'Upload & Ingestion failed!', 'error');
-                fileUpload.disabled = false;
-                uploadButton.disabled = false;
-                fileUpload.value = ''; // Clear input
-                pollingIntervalId = null;
-            } finally {
-                // Ensure "No files" message is shown if the list is empty after polling stops
-                if (fileListTbody.children.length === 0 && noFilesRow && pollingIntervalId === null) {
-                    noFilesRow.style.display = '';
-                }
+                finishIngestion();
+                listFiles(); // Refresh to ensure status reflects failure
+            } else {
+                throw new Error('the progress stream ended before the ingestion finished');
             }
-        }, 3000); // Poll every 3 seconds
+
+        } catch (error) {
+            if (controller.signal.aborted) return; // Replaced by a newer stream
+            console.error('Error while following ingestion progress:', error);
+            setStatus(ingestionStatus, `Ingestion status check failed: ${error.message}`, 'error');
+            setStatus(uploadStatus, 'Upload & Ingestion failed!', 'error');
+            finishIngestion();
+        }
     }
 
     // --- Document Listing & Deletion Logic ---
@@ -14,9 +14,39 @@ document.addEventListener('DOMContentLoaded', () => {
     // Define API endpoints. Ensure API_BASE_URL matches your FastAPI server's address.
     const API_BASE_URL = 'http://127.0.0.1:8000';
     const API_QUERY_URL = `${API_BASE_URL}/query`;
+    const API_SESSIONS_URL = `${API_BASE_URL}/sessions`;
+    const API_CHUNK_URL = `${API_BASE_URL}/chunk`;
+
+    // Full source chunks already fetched, by chunk id (a chunk id always refers to the same text)
+    const chunkCache = new Map();
+
+    // Conversation id sent with every query, so follow-up questions keep their context.
+    // A new id is created for every new chat.
+    let sessionId = createSessionId();
 
     // --- Helper Functions (specific to chat or generic) ---
 
+    /**
+     * Creates a random conversation id.
+     * @returns {string} A URL-safe random id.
+     */
+    function createSessionId() {
+        if (window.crypto && window.crypto.randomUUID) {
+            return window.crypto.randomUUID().replace(/-/g, '');
+        }
+        return Array.from({ length: 32 }, () => Math.floor(Math.random() * 16).toString(16)).join('');
+    }
+
+    /**
+     * Ends the current conversation on the server and starts a new one.
+     */
+    function resetSession() {
+        const oldSessionId = sessionId;
+        sessionId = createSessionId();
+        // Best effort: the server also expires idle sessions on its own
+        fetch(`${API_SESSIONS_URL}/${oldSessionId}`, { method: 'DELETE' }).catch(() => {});
+    }
+
     /**
      * Appends a new message (user or bot) to the chat window.
      * @param {string} sender - 'user' or 'bot'.
@@ -44,9 +74,48 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
+    /**
+     * Fills an element with the snippet text, wrapping the highlighted ranges in <mark>.
+     * Text is added as text nodes, never as HTML.
+     * @param {HTMLElement} element - The element to fill.
+     * @param {string} snippet - The snippet text.
+     * @param {Array<Array<number>>} highlights - [start, end) character ranges to highlight.
+     */
+    function renderSnippet(element, snippet, highlights = []) {
+        element.textContent = '';
+        let position = 0;
+        highlights.forEach(([start, end]) => {
+            element.appendChild(document.createTextNode(snippet.slice(position, start)));
+            const mark = document.createElement('mark');
+            mark.textContent = snippet.slice(start, end);
+            element.appendChild(mark);
+            position = end;
+        });
+        element.appendChild(document.createTextNode(snippet.slice(position)));
+    }
+
+    /**
+     * Returns the full text of a source chunk, fetching it from the server on first use.
+     * @param {string} chunkId - Id of the chunk.
+     * @returns {Promise<string>} The chunk text.
+     */
+    async function fetchChunkText(chunkId) {
+        if (!chunkCache.has(chunkId)) {
+            const response = await fetch(`${API_CHUNK_URL}/${encodeURIComponent(chunkId)}`);
+            if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+            const chunk = await response.json();
+            chunkCache.set(chunkId, chunk.page_content);
+        }
+        return chunkCache.get(chunkId);
+    }
+
     /**
      * Displays source documents in the dedicated sources sidebar.
-     * @param {Array<Object>} sources - Array of source documents.
+     * Each source shows its document, page, score and a highlighted snippet; clicking it
+     * loads the full chunk text (and clicking again collapses it back to the snippet).
+     * @param {Array<Object>} sources - Array of source references.
      */
     function displaySourcesInSidebar(sources) {
         sourcesList.innerHTML = ''; // Clear previous sources
@@ -59,14 +128,31 @@ document.addEventListener('DOMContentLoaded', () => {
             const sourceItem = document.createElement('div');
             sourceItem.classList.add('source-item');
 
-            const sourcePath = source.metadata && source.metadata.source ? source.metadata.source : 'Unknown Source';
-            const sourceFilename = sourcePath.split(/[\\/]/).pop(); // Handles both Unix (/) and Windows (\) paths
-            
-            const contentSnippet = source.page_content ?
-                source.page_content.substring(0, Math.min(source.page_content.length, 250)) + (source.page_content.length > 250 ? '...' : '')
-                : 'No content snippet available.';
-            
-            sourceItem.innerHTML = `<h4>${sourceFilename}</h4><p>${contentSnippet}</p>`;
+            const title = document.createElement('h4');
+            title.textContent = source.document || 'Unknown Source';
+            const details = document.createElement('span');
+            details.classList.add('source-details');
+            const page = Number.isInteger(source.page) ? `Page ${source.page + 1} · ` : '';
+            details.textContent = `${page}Score ${source.score.toFixed(2)}`;
+            const content = document.createElement('p');
+            renderSnippet(content, source.snippet, source.highlights);
+            sourceItem.append(title, details, content);
+
+            let expanded = false;
+            sourceItem.addEventListener('click', async () => {
+                if (expanded) {
+                    renderSnippet(content, source.snippet, source.highlights);
+                    expanded = false;
+                    return;
+                }
+                try {
+                    content.textContent = await fetchChunkText(source.id);
+                    expanded = true;
+                } catch (error) {
+                    console.error('Error fetching source chunk:', error);
+                    setStatus(queryStatus, `Could not load the full source: ${error.message}`, 'error');
+                }
+            });
             sourcesList.appendChild(sourceItem);
         });
     }
@@ -140,7 +226,7 @@ document.addEventListener('DOMContentLoaded', () => {
             const response = await fetch(API_QUERY_URL, {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ query: query }),
+                body: JSON.stringify({ query: query, session_id: sessionId }),
             });
 
             const data = await response.json(); // Parse the JSON response
@@ -183,6 +269,7 @@ document.addEventListener('DOMContentLoaded', () => {
         // This is a simple approach. For more complex apps, consider not replacing the entire innerHTML.
         document.getElementById('loading-indicator').style.display = 'none'; // Ensure it's hidden
         
+        resetSession();
         clearSourcesSidebar();
         setStatus(queryStatus, '', 'clear'); // Clear status message
         userInput.value = '';
@@ -202,6 +289,7 @@ document.addEventListener('DOMContentLoaded', () => {
                 </div>
             `;
             document.getElementById('loading-indicator').style.display = 'none';
+            resetSession();
             clearSourcesSidebar();
             setStatus(queryStatus, 'Chat history cleared.', 'info');
             userInput.value = '';
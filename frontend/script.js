@@ -34,15 +34,10 @@ document.addEventListener('DOMContentLoaded', () => {
             sourcesDiv.classList.add('source-documents');
             sourcesDiv.innerHTML = '<h4>Sources:</h4>';
             sources.forEach(source => {
-                // Safely extract source path and get just the filename
-                const sourcePath = source.metadata && source.metadata.source ? source.metadata.source : 'Unknown Source';
-                const sourceFilename = sourcePath.split(/[\\/]/).pop(); // Handles both Unix (/) and Windows (\) paths
-                
-                // Truncate content snippet for display to keep it concise
-                const contentSnippet = source.page_content ?
-                    source.page_content.substring(0, Math.min(source.page_content.length, 250)) + (source.page_content.length > 250 ? '...' : '')
-                    : 'No content snippet available.';
-                
+                // /query returns the document's filename and a snippet of the matching chunk
+                const sourceFilename = source.document || 'Unknown Source';
+                const contentSnippet = source.snippet || 'No content snippet available.';
+
                 sourcesDiv.innerHTML += `<p><strong>${sourceFilename}</strong>: ${contentSnippet}</p>`;
             });
             messageDiv.appendChild(sourcesDiv);
@@ -129,7 +124,7 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
     // --- Document Upload Logic ---
-    let pollingIntervalId = null; // Variable to store the interval ID for polling, allows clearing it later
+    let ingestionStreamController = null; // AbortController of the open progress stream, allows closing it later
 
     async function handleFileUpload() {
         console.log('DEBUG: handleFileUpload function triggered.'); // Debugging line 1
@@ -196,9 +191,9 @@ document.addEventListener('DOMContentLoaded', () => {
                 fileList.appendChild(listItem);
             });
 
-            // Start polling the backend for real-time ingestion status updates
-            startPollingIngestionStatus(taskId); 
-            console.log('DEBUG: Polling started.'); // Debugging line 11
+            // Follow the backend's progress event stream for real-time ingestion status updates
+            watchIngestionProgress(taskId);
+            console.log('DEBUG: Progress stream opened.'); // Debugging line 11
 
         } catch (error) {
             // Catch any errors during the upload process (network issues, server errors, etc.)
@@ -210,109 +205,129 @@ document.addEventListener('DOMContentLoaded', () => {
             fileUpload.value = ''; // Clear selected files in the input field
         }
         // The 'finally' block is intentionally omitted here because we want buttons to remain disabled
-        // until the polling process confirms ingestion completion or failure.
+        // until the progress stream confirms ingestion completion or failure.
+    }
+
+    /**
+     * Updates the status line and the file list from an ingestion status event.
+     * @param {string} taskId - The ID of the ingestion task.
+     * @param {Object} data - The ingestion status (same shape as `/ingestion_status/{task_id}`).
+     */
+    function renderIngestionStatus(taskId, data) {
+        // Update the overall ingestion status message in the UI, with the pipeline's live counters
+        const progress = data.progress || {};
+        let message = `Ingestion status: ${data.status}...`;
+        if (progress.stage) {
+            message = `Ingestion ${progress.stage.replace(/_/g, ' ')}: ${progress.documents_parsed || 0}/${progress.documents_total || 0} documents parsed, ` +
+                `${progress.chunks_embedded || 0}/${progress.chunks_produced || 0} chunks embedded`;
+            if (progress.eta_seconds !== null && progress.eta_seconds !== undefined) {
+                message += `, about ${Math.ceil(progress.eta_seconds)}s left`;
+            }
+        }
+        setStatus(ingestionStatus, message, 'info');
+
+        // Iterate through the 'files' array returned by the backend to update individual file statuses
+        data.files.forEach(fileInfo => {
+            // Sanitize filename for use in ID to match the one created during initial rendering
+            const safeFilename = fileInfo.filename.replace(/[^a-zA-Z0-9.\-_]/g, '-');
+            const listItemId = `file-${taskId}-${safeFilename}`;
+            let listItem = document.getElementById(listItemId);
+            if (!listItem) {
+                // Handles a file that is in the backend's task list but wasn't initially rendered by the frontend
+                listItem = document.createElement('li');
+                listItem.id = listItemId;
+                listItem.innerHTML = `<i class="fas fa-file-alt"></i> ${fileInfo.filename} <span class="ingestion-status-text"></span>`;
+                fileList.appendChild(listItem);
+            }
+            const fileStatusSpan = listItem.querySelector('.ingestion-status-text');
+            if (fileStatusSpan) {
+                // Update the text content with the individual file's status
+                fileStatusSpan.textContent = `(${fileInfo.status})`;
+                // Apply color based on the individual file's status
+                if (fileInfo.status === 'COMPLETED') {
+                    fileStatusSpan.style.color = '#5cb85c'; // Green for completed
+                } else if (fileInfo.status === 'FAILED') {
+                    fileStatusSpan.style.color = '#d9534f'; // Red for failed
+                } else {
+                    fileStatusSpan.style.color = '#555'; // Grey for pending/in-progress
+                }
+            }
+        });
     }
 
     /**
-     * Starts a polling mechanism to periodically check the status of an ingestion task.
+     * Follows an ingestion task through the server's progress event stream
+     * (`/ingestion_status/{task_id}/events`, Server-Sent Events) instead of polling.
+     * The stream is read with fetch, so headers can be added like on any other request.
      * @param {string} taskId - The ID of the ingestion task to monitor.
      */
-    async function startPollingIngestionStatus(taskId) {
-        console.log('DEBUG: Starting polling for task ID:', taskId); // Debugging line 13
-        // Clear any existing polling interval to prevent multiple intervals running simultaneously
-        if (pollingIntervalId) {
-            clearInterval(pollingIntervalId);
+    async function watchIngestionProgress(taskId) {
+        console.log('DEBUG: Opening progress stream for task ID:', taskId); // Debugging line 13
+        // Close any existing stream to prevent several streams running simultaneously
+        if (ingestionStreamController) {
+            ingestionStreamController.abort();
         }
+        const controller = new AbortController();
+        ingestionStreamController = controller;
+        let finalStatus = null;
 
-        // Set up a new interval to poll the status every 3 seconds
-        pollingIntervalId = setInterval(async () => {
-            console.log('DEBUG: Polling for status of task ID:', taskId); // Debugging line 14
-            try {
-                const response = await fetch(`${API_INGESTION_STATUS_URL}/${taskId}`);
-                const data = await response.json(); // Parse the JSON response
-                console.log('DEBUG: Polling response data:', data); // Debugging line 15
-
-                if (!response.ok) {
-                    // If the HTTP response status is not OK, log and throw an error
-                    console.error('DEBUG: API polling response not OK. Status:', response.status, 'Details:', data.detail); // Debugging line 16
-                    throw new Error(data.detail || `HTTP error! status: ${response.status}`);
-                }
+        try {
+            const response = await fetch(`${API_INGESTION_STATUS_URL}/${taskId}/events`, {
+                headers: { 'Accept': 'text/event-stream' },
+                signal: controller.signal,
+            });
+            if (!response.ok) {
+                // If the HTTP response status is not OK, log and throw an error
+                const data = await response.json().catch(() => ({}));
+                console.error('DEBUG: API progress stream response not OK. Status:', response.status, 'Details:', data.detail); // Debugging line 14
+                throw new Error(data.detail || `HTTP error! status: ${response.status}`);
+            }
 
-                // Update the overall ingestion status message in the UI
-                setStatus(ingestionStatus, `Ingestion status: ${data.status}...`, 'info');
-
-                // Iterate through the 'files' array returned by the backend to update individual file statuses
-                data.files.forEach(fileInfo => {
-                    // Sanitize filename for use in ID to match the one created during initial rendering
-                    const safeFilename = fileInfo.filename.replace(/[^a-zA-Z0-9.\-_]/g, '-');
-                    const listItemId = `file-${taskId}-${safeFilename}`;
-                    // Find the specific list item's status span
-                    const fileStatusSpan = document.querySelector(`#${listItemId} .ingestion-status-text`);
-                    
-                    if (fileStatusSpan) {
-                        // Update the text content with the individual file's status
-                        fileStatusSpan.textContent = `(${fileInfo.status})`; 
-                        // Apply color based on the individual file's status
-                        if (fileInfo.status === 'COMPLETED') {
-                            fileStatusSpan.style.color = '#5cb85c'; // Green for completed
-                        } else if (fileInfo.status === 'FAILED') {
-                            fileStatusSpan.style.color = '#d9534f'; // Red for failed
-                        } else {
-                            fileStatusSpan.style.color = '#555'; // Grey for pending/in-progress
-                        }
-                    } else {
-                        // This 'else' block handles a scenario where a file might be in the backend's task list
-                        // but wasn't initially rendered by the frontend (unlikely with current logic, but robust).
-                        const newListItem = document.createElement('li');
-                        newListItem.id = listItemId;
-                        newListItem.innerHTML = `<i class="fas fa-file-alt"></i> ${fileInfo.filename} <span class="ingestion-status-text">(${fileInfo.status})</span>`;
-                        fileList.appendChild(newListItem);
-                        const newFileStatusSpan = newListItem.querySelector('.ingestion-status-text');
-                        if (newFileStatusSpan) {
-                            if (fileInfo.status === 'COMPLETED') {
-                                newFileStatusSpan.style.color = '#5cb85c';
-                            } else if (fileInfo.status === 'FAILED') {
-                                newFileStatusSpan.style.color = '#d9534f';
-                            } else {
-                                newFileStatusSpan.style.color = '#555';
-                            }
-                        }
-                    }
-                });
-
-                // Check the overall task status to determine if polling should stop
-                if (data.status === 'COMPLETED') {
-                    clearInterval(pollingIntervalId); // Stop polling
-                    setStatus(ingestionStatus, 'Ingestion complete! Documents are ready for querying.', 'success');
-                    setStatus(uploadStatus, 'Upload & Ingestion successful!', 'success');
-                    sendButton.disabled = false; // Re-enable chat button
-                    fileUpload.disabled = false; // Re-enable upload button
-                    fileUpload.value = ''; // Clear selected files in the input field
-                    pollingIntervalId = null; // Clear the stored interval ID
-                    console.log('DEBUG: Polling stopped: COMPLETED'); // Debugging line 17
-                } else if (data.status === 'FAILED') {
-                    clearInterval(pollingIntervalId); // Stop polling
-                    setStatus(ingestionStatus, 'Ingestion failed! Please check server logs for details.', 'error');
-                    setStatus(uploadStatus, 'Upload & Ingestion failed!', 'error');
-                    sendButton.disabled = false; // Re-enable chat button
-                    fileUpload.disabled = false; // Re-enable upload button
-                    fileUpload.value = ''; // Clear selected files in the input field
-                    pollingIntervalId = null; // Clear the stored interval ID
-                    console.log('DEBUG: Polling stopped: FAILED'); // Debugging line 18
+            // Read the stream as it arrives; events are separated by a blank line
+            const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+            let buffer = '';
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += value;
+                const events = buffer.split('\n\n');
+                buffer = events.pop(); // The last piece may be an incomplete event
+                for (const rawEvent of events) {
+                    const dataLines = rawEvent.split('\n')
+                        .filter(line => line.startsWith('data:'))
+                        .map(line => line.slice(5).trimStart());
+                    if (dataLines.length === 0) continue; // Keep-alive comment
+                    const data = JSON.parse(dataLines.join('\n'));
+                    console.log('DEBUG: Progress event data:', data); // Debugging line 15
+                    renderIngestionStatus(taskId, data);
+                    finalStatus = data.status;
                 }
+            }
 
-            } catch (error) {
-                // Catch any errors during the polling process (network issues, API errors)
-                console.error('Error during ingestion status polling (caught in startPollingIngestionStatus catch block):', error); // Debugging line 19
-                clearInterval(pollingIntervalId); // Stop polling on error
-                setStatus(ingestionStatus, `Ingestion status check failed: ${error.message}`, 'error');
+            // The stream ends after the event with the final status
+            if (finalStatus === 'COMPLETED') {
+                setStatus(ingestionStatus, 'Ingestion complete! Documents are ready for querying.', 'success');
+                setStatus(uploadStatus, 'Upload & Ingestion successful!', 'success');
+                console.log('DEBUG: Progress stream closed: COMPLETED'); // Debugging line 17
+            } else if (finalStatus === 'FAILED') {
+                setStatus(ingestionStatus, 'Ingestion failed! Please check server logs for details.', 'error');
                 setStatus(uploadStatus, 'Upload & Ingestion failed!', 'error');
-                sendButton.disabled = false; // Re-enable chat button
-                fileUpload.disabled = false; // Re-enable upload button
-                fileUpload.value = ''; // Clear selected files in input
-                pollingIntervalId = null; // Clear the stored interval ID
+                console.log('DEBUG: Progress stream closed: FAILED'); // Debugging line 18
+            } else {
+                throw new Error('the progress stream ended before the ingestion finished');
             }
-        }, 3000); // Poll every 3 seconds (adjust as needed)
+
+        } catch (error) {
+            if (controller.signal.aborted) return; // Replaced by a newer stream
+            // Catch any errors while following the stream (network issues, API errors)
+            console.error('Error while following ingestion progress (caught in watchIngestionProgress catch block):', error); // Debugging line 19
+            setStatus(ingestionStatus, `Ingestion status check failed: ${error.message}`, 'error');
+            setStatus(uploadStatus, 'Upload & Ingestion failed!', 'error');
+        }
+        ingestionStreamController = null; // Clear the stored stream controller
+        sendButton.disabled = false; // Re-enable chat button
+        fileUpload.disabled = false; // Re-enable upload button
+        fileUpload.value = ''; // Clear selected files in the input field
     }
 
     // --- Event Listeners ---
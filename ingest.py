@@ -1,7 +1,15 @@
 #!/usr/bin/env python3
 import os
+import re
+import csv
 import glob
-from typing import List, Dict, Any
+import time
+import uuid
+import codecs
+import importlib
+from html.parser import HTMLParser
+from functools import lru_cache
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
 from multiprocessing import Pool
 from tqdm import tqdm
 
@@ -9,45 +17,48 @@ from tqdm import tqdm
 from constants import (
     PERSIST_DIRECTORY,
     SOURCE_DIRECTORY,
-    EMBEDDINGS_MODEL_NAME,
     CHUNK_SIZE,
     CHUNK_OVERLAP,
+    CHUNK_SIZE_UNIT,
+    PARSED_TEXT_CACHE_MAX_MB,
+    EMBEDDING_CACHE_MAX_MB,
+    EMBEDDINGS_MODEL_NAME,
+    DEDUP_MODE,
+    CSV_BATCH_ROWS,
+    PDF_PARALLEL_MIN_PAGES,
+    PDF_PAGE_RANGE_SIZE,
     # Import CHROMA_SETTINGS
 )
 
-# LangChain Document Loaders
-from langchain_community.document_loaders import (
-    CSVLoader,
-    EverNoteLoader,
-    PyMuPDFLoader, # Prefer PyMuPDFLoader for PDFs
-    TextLoader,
-    UnstructuredEmailLoader,
-    UnstructuredEPubLoader,
-    UnstructuredHTMLLoader,
-    UnstructuredMarkdownLoader,
-    UnstructuredODTLoader,
-    UnstructuredPowerPointLoader,
-    UnstructuredWordDocumentLoader,
-    UnstructuredFileLoader, # General fallback loader
-)
+# Heavy dependencies (document loaders, text splitter, Chroma, HuggingFace embeddings)
+# are imported lazily, so importing this module stays fast. Each document loader is
+# only imported the first time a file with its extension is seen.
+from langchain_core.documents import Document # For type hinting
 
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_chroma.vectorstores import Chroma
-from langchain_huggingface.embeddings import HuggingFaceEmbeddings
-from langchain.docstore.document import Document # For type hinting
+from metrics import stage_timer, CHUNKS_INGESTED_TOTAL, DOCUMENTS_LOADED_TOTAL, DUPLICATE_CHUNKS_TOTAL, CSV_ROWS_INGESTED_TOTAL
+from vectorstore import (
+    get_vectorstore, get_document_index, store_write_lock, embeddings_max_seq_length, delete_documents,
+    get_chroma_client, active_version, embeddings_model_of,
+)
+from tokenizer import count_tokens, count_tokens_batch, EMBEDDING
 
 
 # Custom document loaders (Keep if you need custom logic for certain file types)
-class MyElmLoader(UnstructuredEmailLoader):
-    """Wrapper to fallback to text/plain when default does not work"""
+class MyElmLoader:
+    """Wrapper around UnstructuredEmailLoader to fallback to text/plain when default does not work"""
+    def __init__(self, file_path: str, **unstructured_kwargs: Any):
+        self.file_path = file_path
+        self.unstructured_kwargs = unstructured_kwargs
+
     def load(self) -> List[Document]:
+        UnstructuredEmailLoader = get_loader_class("UnstructuredEmailLoader")
         try:
             try:
-                doc = UnstructuredEmailLoader.load(self)
+                doc = UnstructuredEmailLoader(self.file_path, **self.unstructured_kwargs).load()
             except ValueError as e:
                 if 'text/html content not found in email' in str(e):
                     self.unstructured_kwargs["content_source"]="text/plain"
-                    doc = UnstructuredEmailLoader.load(self)
+                    doc = UnstructuredEmailLoader(self.file_path, **self.unstructured_kwargs).load()
                 else:
                     raise
         except Exception as e:
@@ -56,50 +67,429 @@ class MyElmLoader(UnstructuredEmailLoader):
         return doc
 
 
+# --- Fast-Path Loaders ---
+# Plain text, Markdown, HTML and email are read with the standard library instead of
+# Unstructured, which is slow to import and slow per file. When one of these loaders
+# fails or finds no text, the Unstructured loader in LOADER_FALLBACKS is tried.
+
+def _read_text(file_path: str) -> str:
+    """Reads a text file as UTF-8 (with or without BOM), falling back to Windows-1252 for legacy files."""
+    with open(file_path, "rb") as f:
+        data = f.read()
+    try:
+        return data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        return data.decode("cp1252", errors="replace")
+
+def _text_document(file_path: str, text: str, **metadata: Any) -> List[Document]:
+    if not text.strip() and os.path.getsize(file_path) > 0:
+        raise ValueError("no text found")
+    return [Document(page_content=text, metadata={"source": file_path, **metadata})]
+
+def looks_like_text(file_path: str, sample_size: int = 8192) -> bool:
+    """True if the start of the file is UTF-8 text without NUL bytes (a cheap check before trying Unstructured)."""
+    with open(file_path, "rb") as f:
+        sample = f.read(sample_size)
+    if b"\0" in sample:
+        return False
+    try:
+        sample.decode("utf-8")
+    except UnicodeDecodeError as e:
+        return e.start >= len(sample) - 3 # A multi-byte character cut off by the sample
+    return True
+
+
+class PlainTextLoader:
+    """Loads a text file as one Document."""
+    def __init__(self, file_path: str, **kwargs: Any):
+        self.file_path = file_path
+
+    def load(self) -> List[Document]:
+        return _text_document(self.file_path, _read_text(self.file_path))
+
+
+class MarkdownTextLoader:
+    """Loads a Markdown file as plain text: markup is removed line by line, the text of links, images and code is kept."""
+    _FENCE = re.compile(r"^\s*(```|~~~)")
+    _HEADING = re.compile(r"^\s{0,3}#{1,6}\s+|\s+#+\s*$")
+    _QUOTE = re.compile(r"^\s{0,3}(>\s?)+")
+    _REFERENCE = re.compile(r"^\s{0,3}\[[^\]]+\]:\s+\S+")
+    _RULE = re.compile(r"^\s{0,3}([-*_]\s*){3,}$")
+    _IMAGE_OR_LINK = re.compile(r"!?\[([^\]]*)\]\([^)]*\)|!?\[([^\]]*)\]\[[^\]]*\]")
+    _EMPHASIS = re.compile(r"(\*\*|__|~~)(?=\S)(.+?)(?<=\S)\1|(?<![\w*])\*(?=\S)([^*]+?)(?<=\S)\*(?![\w*])|(?<!\w)_(?=\S)([^_]+?)(?<=\S)_(?!\w)")
+    _INLINE_CODE = re.compile(r"`+([^`]*)`+")
+    _TAG = re.compile(r"</?[A-Za-z][^>]*>")
+
+    def __init__(self, file_path: str, **kwargs: Any):
+        self.file_path = file_path
+
+    def _clean(self, line: str) -> str:
+        line = self._INLINE_CODE.sub(r"\1", line)
+        line = self._IMAGE_OR_LINK.sub(lambda m: m.group(1) if m.group(1) is not None else m.group(2), line)
+        line = self._EMPHASIS.sub(lambda m: next(group for group in m.groups()[1:] if group is not None), line)
+        return self._TAG.sub("", line)
+
+    def load(self) -> List[Document]:
+        lines = []
+        in_code = False
+        for line in _read_text(self.file_path).splitlines():
+            if self._FENCE.match(line):
+                in_code = not in_code
+                continue
+            if in_code:
+                lines.append(line) # Code is kept verbatim
+                continue
+            if self._REFERENCE.match(line) or self._RULE.match(line):
+                continue
+            line = self._QUOTE.sub("", self._HEADING.sub("", line))
+            lines.append(self._clean(line).rstrip())
+        return _text_document(self.file_path, re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip())
+
+
+class _HTMLTextExtractor(HTMLParser):
+    """Collects the visible text of an HTML document, one line per block element."""
+    BLOCK_TAGS = {
+        "address", "article", "aside", "blockquote", "br", "dd", "div", "dl", "dt", "figcaption", "footer",
+        "form", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li", "main", "nav", "ol", "p", "pre",
+        "section", "table", "td", "th", "title", "tr", "ul",
+    }
+    # Not visible
+    SKIPPED_TAGS = {"script", "style", "noscript", "template", "svg"}
+    # Elements allowed in <head>; any other element (or text) starts the body, since </head> and <body> may be omitted
+    HEAD_TAGS = {"base", "link", "meta", "noscript", "script", "style", "template", "title"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self._parts: List[str] = []
+        self._skip_depth = 0
+        self._in_head = False
+        self._in_title = False
+
+    def _track_head(self, tag: str) -> None:
+        if tag == "head":
+            self._in_head = True
+        elif self._in_head and tag not in self.HEAD_TAGS:
+            self._in_head = False
+
+    def handle_starttag(self, tag, attrs):
+        self._track_head(tag)
+        if tag in self.SKIPPED_TAGS:
+            self._skip_depth += 1
+        self._in_title = self._in_title or tag == "title"
+        if tag in self.BLOCK_TAGS:
+            self._parts.append("\n")
+
+    def handle_startendtag(self, tag, attrs):
+        self._track_head(tag)
+        if tag in self.BLOCK_TAGS:
+            self._parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag == "head":
+            self._in_head = False
+        if tag in self.SKIPPED_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+        if tag == "title":
+            self._in_title = False
+        if tag in self.BLOCK_TAGS:
+            self._parts.append("\n")
+
+    def handle_data(self, data):
+        if self._in_title: # The only visible part of <head>
+            self._parts.append(data)
+        elif self._skip_depth:
+            return
+        elif self._in_head:
+            if data.strip(): # Text implicitly ends <head>
+                self._in_head = False
+                self._parts.append(data)
+        else:
+            self._parts.append(data)
+
+    def text(self) -> str:
+        self.close()
+        lines = (" ".join(line.split()) for line in "".join(self._parts).splitlines())
+        return "\n".join(line for line in lines if line)
+
+def html_to_text(html: str) -> str:
+    extractor = _HTMLTextExtractor()
+    extractor.feed(html)
+    return extractor.text()
+
+
+class HTMLTextLoader:
+    """Loads the visible text of an HTML file, parsed in blocks with the standard library's HTML parser."""
+    def __init__(self, file_path: str, **kwargs: Any):
+        self.file_path = file_path
+
+    def load(self) -> List[Document]:
+        extractor = _HTMLTextExtractor()
+        with open(self.file_path, "rb") as f:
+            match = re.search(rb"""<meta[^>]+charset=["']?([\w-]+)""", f.read(4096), re.IGNORECASE)
+            encoding = match.group(1).decode("ascii") if match else "utf-8"
+            try:
+                codecs.lookup(encoding)
+            except LookupError:
+                encoding = "utf-8"
+            f.seek(0)
+            decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                extractor.feed(decoder.decode(block))
+            extractor.feed(decoder.decode(b"", final=True))
+        return _text_document(self.file_path, extractor.text())
+
+
+class EmailTextLoader:
+    """Loads the body of an .eml message (the text/plain part, else the text of the HTML part) with the standard library."""
+    def __init__(self, file_path: str, **kwargs: Any):
+        self.file_path = file_path
+
+    def load(self) -> List[Document]:
+        from email import policy
+        from email.parser import BytesParser
+        with open(self.file_path, "rb") as f:
+            message = BytesParser(policy=policy.default).parse(f)
+        body = message.get_body(preferencelist=("plain", "html"))
+        if body is None:
+            raise ValueError("no text/plain or text/html part")
+        text = body.get_content()
+        if body.get_content_subtype() == "html":
+            text = html_to_text(text)
+        metadata = {key: str(message[header]) for key, header in (("subject", "Subject"), ("from", "From"), ("date", "Date")) if message[header]}
+        return _text_document(self.file_path, text.strip(), **metadata)
+
+
+# Loaders defined in this module; everything else is looked up in langchain_community
+CUSTOM_LOADERS = {
+    "MyElmLoader": MyElmLoader,
+    "PlainTextLoader": PlainTextLoader,
+    "MarkdownTextLoader": MarkdownTextLoader,
+    "HTMLTextLoader": HTMLTextLoader,
+    "EmailTextLoader": EmailTextLoader,
+}
+
+# Loader tried when a fast-path loader fails, before the generic UnstructuredFileLoader
+LOADER_FALLBACKS = {
+    "PlainTextLoader": ("TextLoader", {"autodetect_encoding": True}),
+    "MarkdownTextLoader": ("UnstructuredMarkdownLoader", {}),
+    "HTMLTextLoader": ("UnstructuredHTMLLoader", {}),
+    "EmailTextLoader": ("MyElmLoader", {}),
+}
+
+_loader_classes: Dict[str, type] = {}
+
+def get_loader_class(loader_name: str) -> type:
+    """
+    Resolves a loader class by name, importing it on first use.
+    `langchain_community.document_loaders` imports each loader module lazily, so
+    only the loaders that are actually needed get imported.
+    """
+    if loader_name not in _loader_classes:
+        if loader_name in CUSTOM_LOADERS:
+            _loader_classes[loader_name] = CUSTOM_LOADERS[loader_name]
+        else:
+            with stage_timer("ingest", f"import_loader:{loader_name}"):
+                document_loaders = importlib.import_module("langchain_community.document_loaders")
+                _loader_classes[loader_name] = getattr(document_loaders, loader_name)
+    return _loader_classes[loader_name]
+
+
 # Map file extensions to document loaders and their arguments
 # Prefer PyMuPDFLoader for PDFs
+# Loaders are referenced by name and resolved with `get_loader_class` on first use
+# (ingestion streams CSV files with `iter_csv_chunks` instead of loading them)
 LOADER_MAPPING = {
-    ".csv": (CSVLoader, {}),
-    ".doc": (UnstructuredWordDocumentLoader, {}),
-    ".docx": (UnstructuredWordDocumentLoader, {}),
-    ".enex": (EverNoteLoader, {}),
-    ".eml": (MyElmLoader, {}),
-    ".epub": (UnstructuredEPubLoader, {}),
-    ".html": (UnstructuredHTMLLoader, {}),
-    ".htm": (UnstructuredHTMLLoader, {}), # Added .htm for consistency
-    ".md": (UnstructuredMarkdownLoader, {}),
-    ".odt": (UnstructuredODTLoader, {}),
-    ".pdf": (PyMuPDFLoader, {}), # Changed to PyMuPDFLoader
-    ".ppt": (UnstructuredPowerPointLoader, {}),
-    ".pptx": (UnstructuredPowerPointLoader, {}),
-    ".txt": (TextLoader, {"encoding": "utf8"}),
+    ".csv": ("CSVLoader", {}),
+    ".doc": ("UnstructuredWordDocumentLoader", {}),
+    ".docx": ("UnstructuredWordDocumentLoader", {}),
+    ".enex": ("EverNoteLoader", {}),
+    ".eml": ("EmailTextLoader", {}),
+    ".epub": ("UnstructuredEPubLoader", {}),
+    ".html": ("HTMLTextLoader", {}),
+    ".htm": ("HTMLTextLoader", {}), # Added .htm for consistency
+    ".md": ("MarkdownTextLoader", {}),
+    ".odt": ("UnstructuredODTLoader", {}),
+    ".pdf": ("PyMuPDFLoader", {}), # Changed to PyMuPDFLoader
+    ".ppt": ("UnstructuredPowerPointLoader", {}),
+    ".pptx": ("UnstructuredPowerPointLoader", {}),
+    ".txt": ("PlainTextLoader", {}),
     # Add more mappings for other file extensions and loaders as needed
 }
 
-def load_single_document(file_path: str) -> Document:
+def load_single_document(file_path: str) -> List[Document]:
+    """
+    Loads one file into Documents (one per page for paged formats such as PDF).
+    Parsed text is cached by file content and loader (see `parsed_text_cache_key`), so
+    re-ingesting an unchanged file skips the loader entirely.
+    """
     ext = "." + file_path.rsplit(".", 1)[-1].lower() # Ensure lowercase extension
+    loader_name, loader_args = get_loader_for(file_path, ext)
+    cache = get_parsed_text_cache()
+    cache_key = parsed_text_cache_key(file_path, loader_name, loader_args) if cache is not None else None
+    if cache_key is not None:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return decode_parsed_documents(cached, file_path)
+
+    documents = _parse_document(file_path, loader_name, loader_args)
+    if cache_key is not None:
+        cache.put(cache_key, encode_parsed_documents(documents, file_path))
+    return documents
+
+def get_loader_for(file_path: str, ext: str):
+    """The loader name and arguments for a file: from LOADER_MAPPING, else plain text for text files, else Unstructured."""
     if ext in LOADER_MAPPING:
-        loader_class, loader_args = LOADER_MAPPING[ext]
-        try:
-            loader = loader_class(file_path, **loader_args)
-            return loader.load()[0]
-        except Exception as e:
-            print(f"Warning: Could not load {file_path} with {loader_class.__name__}: {e}. Trying UnstructuredFileLoader as fallback.")
-            # Fallback to UnstructuredFileLoader if specific loader fails
-            try:
-                return UnstructuredFileLoader(file_path).load()[0]
-            except Exception as fe:
-                raise ValueError(f"Failed to load {file_path} even with fallback UnstructuredFileLoader: {fe}") from fe
-    else:
+        return LOADER_MAPPING[ext]
+    try:
+        if looks_like_text(file_path):
+            return "PlainTextLoader", {}
+    except OSError:
+        pass
+    return "UnstructuredFileLoader", {}
+
+def _parse_document(file_path: str, loader_name: str, loader_args: Dict[str, Any]) -> List[Document]:
+    if loader_name == "UnstructuredFileLoader":
         # Fallback to UnstructuredFileLoader for unknown types or if no specific loader
-        print(f"Warning: No specific loader for {ext}. Trying UnstructuredFileLoader for {file_path}.")
+        print(f"Warning: No specific loader for {file_path}. Trying UnstructuredFileLoader.")
         try:
-            return UnstructuredFileLoader(file_path).load()[0]
+            return get_loader_class("UnstructuredFileLoader")(file_path).load()
         except Exception as fe:
             raise ValueError(f"Failed to load {file_path} with UnstructuredFileLoader: {fe}") from fe
 
+    # The loader, then its Unstructured counterpart for fast-path loaders, then UnstructuredFileLoader
+    attempts = [(loader_name, loader_args)]
+    if loader_name in LOADER_FALLBACKS:
+        attempts.append(LOADER_FALLBACKS[loader_name])
+    attempts.append(("UnstructuredFileLoader", {}))
+    for (name, args), (next_name, _) in zip(attempts, attempts[1:]):
+        try:
+            return get_loader_class(name)(file_path, **args).load()
+        except Exception as e:
+            print(f"Warning: Could not load {file_path} with {name}: {e}. Trying {next_name} as fallback.")
+    try:
+        return get_loader_class("UnstructuredFileLoader")(file_path).load()
+    except Exception as fe:
+        raise ValueError(f"Failed to load {file_path} even with fallback UnstructuredFileLoader: {fe}") from fe
+
 
-def load_documents(source_dir: str, ignored_files: List[str] = []) -> List[Document]:
+def benchmark_loaders(paths: List[str], repeat: int = 3) -> List[Dict[str, Any]]:
+    """
+    Times each fast-path loader against its Unstructured fallback on the given files
+    (or all files in the given directories), grouped by extension, and prints files/s
+    and MB/s per loader. The parsed-text cache is bypassed. A loader's first import is
+    timed separately, since it is paid once per process. Loaders that cannot be
+    imported are reported as unavailable.
+    """
+    files_by_ext: Dict[str, List[str]] = {}
+    for path in paths:
+        candidates = glob.glob(os.path.join(path, "**/*"), recursive=True) if os.path.isdir(path) else [path]
+        for file_path in candidates:
+            ext = os.path.splitext(file_path)[1].lower()
+            if os.path.isfile(file_path) and LOADER_MAPPING.get(ext, ("",))[0] in LOADER_FALLBACKS:
+                files_by_ext.setdefault(ext, []).append(file_path)
+
+    results = []
+    for ext, files in sorted(files_by_ext.items()):
+        megabytes = sum(os.path.getsize(file_path) for file_path in files) / (1024 * 1024)
+        loader_name, loader_args = LOADER_MAPPING[ext]
+        for name, args in (LOADER_MAPPING[ext], LOADER_FALLBACKS[loader_name]):
+            result = {"extension": ext, "loader": name, "files": len(files), "megabytes": round(megabytes, 3)}
+            try:
+                started = time.perf_counter()
+                loader_class = get_loader_class(name)
+                result["import_seconds"] = round(time.perf_counter() - started, 3)
+                characters = 0
+                started = time.perf_counter()
+                for _ in range(repeat):
+                    characters = sum(len(document.page_content) for file_path in files for document in loader_class(file_path, **args).load())
+                seconds = (time.perf_counter() - started) / repeat
+            except Exception as e:
+                result["error"] = f"{type(e).__name__}: {e}"
+                print(f"{ext:6} {name:28} unavailable ({result['error'][:60]})")
+                results.append(result)
+                continue
+            result.update({
+                "seconds": round(seconds, 4),
+                "files_per_second": round(len(files) / seconds, 1) if seconds else None,
+                "megabytes_per_second": round(megabytes / seconds, 2) if seconds else None,
+                "characters": characters,
+            })
+            print(f"{ext:6} {name:28} {result['files_per_second'] or 0:10.1f} files/s {result['megabytes_per_second'] or 0:9.2f} MB/s "
+                  f"(import {result['import_seconds']:.2f}s, {characters} characters)")
+            results.append(result)
+    return results
+
+
+# --- Parsed Text Cache ---
+# Bump when a change here alters what the loaders produce, to invalidate cached text
+PARSED_TEXT_CACHE_VERSION = "1"
+
+# Stands for the file's path in cached metadata: the same content may be uploaded again under another name
+_PATH_PLACEHOLDER = "\0source_path"
+
+_parsed_text_cache = None
+_parsed_text_cache_pid = None
+
+def get_parsed_text_cache():
+    """
+    Returns the on-disk cache of parsed documents, or None if disabled
+    (PARSED_TEXT_CACHE_MAX_MB=0). Opened once per process: documents are loaded in a
+    multiprocessing pool, and SQLite connections must not be shared across a fork.
+    """
+    global _parsed_text_cache, _parsed_text_cache_pid
+    if PARSED_TEXT_CACHE_MAX_MB <= 0:
+        return None
+    if _parsed_text_cache is None or _parsed_text_cache_pid != os.getpid():
+        from cache import DiskCache
+        _parsed_text_cache = DiskCache("parsed_text", max_bytes=int(PARSED_TEXT_CACHE_MAX_MB * 1024 * 1024))
+        _parsed_text_cache_pid = os.getpid()
+    return _parsed_text_cache
+
+def file_hash(file_path: str) -> str:
+    """SHA-256 of the file's content, read in blocks."""
+    import hashlib
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def parsed_text_cache_key(file_path: str, loader_name: str, loader_args: Dict[str, Any]) -> str:
+    """Cache key of a file's parsed text: its content hash plus the loader and loader library versions."""
+    from cache import content_hash
+    from importlib.metadata import version
+    return content_hash(
+        file_hash(file_path), loader_name, repr(sorted(loader_args.items())),
+        PARSED_TEXT_CACHE_VERSION, version("langchain-community"),
+    )
+
+def encode_parsed_documents(documents: List[Document], file_path: str) -> bytes:
+    """Serializes documents (text and metadata, one entry per page/section) as zstd-compressed JSON."""
+    import json
+    import zstandard
+    records = [
+        {
+            "page_content": document.page_content,
+            "metadata": {key: _PATH_PLACEHOLDER if value == file_path else value for key, value in document.metadata.items()},
+        }
+        for document in documents
+    ]
+    return zstandard.ZstdCompressor(level=10).compress(json.dumps(records, ensure_ascii=False, default=str).encode("utf8"))
+
+def decode_parsed_documents(data: bytes, file_path: str) -> List[Document]:
+    import json
+    import zstandard
+    records = json.loads(zstandard.ZstdDecompressor().decompress(data))
+    return [
+        Document(
+            page_content=record["page_content"],
+            metadata={key: file_path if value == _PATH_PLACEHOLDER else value for key, value in record["metadata"].items()},
+        )
+        for record in records
+    ]
+
+
+def load_documents(source_dir: str, ignored_files: List[str] = [], progress: Dict[str, Any] = None) -> List[Document]:
     """
     Loads all documents from the source documents directory, ignoring specified files
     """
@@ -115,9 +505,10 @@ def load_documents(source_dir: str, ignored_files: List[str] = []) -> List[Docum
     # If you want to allow all files, use:
     # all_files = glob.glob(os.path.join(source_dir, f"**/*"), recursive=True)
 
-    filtered_files = [file_path for file_path in all_files if file_path not in ignored_files]
+    filtered_files = [file_path for file_path in all_files if file_path not in ignored_files and not is_streamed_file(file_path)]
 
     documents = []
+    count_progress(progress, documents_total=len(filtered_files))
     if not filtered_files:
         print("No new documents to load from source directory.")
         return []
@@ -128,96 +519,673 @@ def load_documents(source_dir: str, ignored_files: List[str] = []) -> List[Docum
     # For now, keep Pool as it's in your original code.
     with Pool(processes=os.cpu_count()) as pool:
         with tqdm(total=len(filtered_files), desc='Loading documents', ncols=80) as pbar:
-            for i, doc in enumerate(pool.imap_unordered(load_single_document, filtered_files)):
-                if doc: # Only append if document was successfully loaded
-                    documents.append(doc)
+            for i, docs in enumerate(pool.imap_unordered(load_single_document, filtered_files)):
+                if docs: # Only extend if the document was successfully loaded
+                    documents.extend(docs)
                 pbar.update()
+                count_progress(progress, documents_parsed=1)
 
-    print(f"Loaded {len(documents)} documents.")
+    print(f"Loaded {len(documents)} pages/sections from {len(filtered_files)} documents.")
     return documents
 
 
-def process_documents(document_paths: List[str] = None) -> List[Document]:
+def process_documents(document_paths: List[str] = None, progress: Dict[str, Any] = None) -> List[Document]:
     """
     Load specific documents (if paths are provided) or all from SOURCE_DIRECTORY,
-    then split them into chunks.
+    then split them into chunks. `progress` (if given) is updated in place.
     """
     if document_paths:
-        # Load only the specified documents
+        # Load only the specified documents; CSV files and large PDFs are streamed separately (see `is_streamed_file`)
+        document_paths = [path for path in document_paths if not is_streamed_file(path)]
+        if not document_paths:
+            return []
         print(f"Processing {len(document_paths)} new document(s)...")
+        update_progress(progress, stage="loading")
         documents = []
-        for path in tqdm(document_paths, desc='Loading new documents', ncols=80):
-            try:
-                documents.append(load_single_document(path))
-            except ValueError as e:
-                print(f"Error loading {path}: {e}")
-                # Optionally remove the problematic file or log extensively
-                os.remove(path) # Delete problematic file to prevent re-attempts
-                print(f"Removed problematic file: {path}")
+        with stage_timer("ingest", "load"):
+            for path in tqdm(document_paths, desc='Loading new documents', ncols=80):
+                try:
+                    documents.extend(load_single_document(path))
+                except ValueError as e:
+                    print(f"Error loading {path}: {e}")
+                    # Optionally remove the problematic file or log extensively
+                    os.remove(path) # Delete problematic file to prevent re-attempts
+                    print(f"Removed problematic file: {path}")
+                count_progress(progress, documents_parsed=1)
         if not documents:
             print("No documents successfully loaded for processing.")
             return []
     else:
         # Load all documents from source directory (original ingest.py behavior)
         print(f"Loading documents from {SOURCE_DIRECTORY}")
-        documents = load_documents(SOURCE_DIRECTORY)
+        update_progress(progress, stage="loading")
+        with stage_timer("ingest", "load"):
+            documents = load_documents(SOURCE_DIRECTORY, progress=progress)
         if not documents:
             print("No documents to load from source directory.")
             return []
+    DOCUMENTS_LOADED_TOTAL.inc(len({document.metadata.get("source") for document in documents}))
 
-    print(f"Splitting {len(documents)} document(s) into chunks...")
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
-    texts = text_splitter.split_documents(documents)
-    print(f"Split into {len(texts)} chunks of text (max. {CHUNK_SIZE} tokens each)")
+    print(f"Splitting {len(documents)} page(s)/section(s) into chunks...")
+    update_progress(progress, stage="splitting")
+    with stage_timer("ingest", "split"):
+        texts = get_text_splitter().split_documents(documents)
+    count_progress(progress, chunks_produced=len(texts))
+    print(f"Split into {len(texts)} chunks of text (max. {CHUNK_SIZE} {CHUNK_SIZE_UNIT} each)")
+    if CHUNK_SIZE_UNIT != "tokens":
+        warn_about_truncated_chunks(texts)
     return texts
 
+# Special tokens ([CLS]/[SEP] or <s>/</s>) the embedding model adds to every input
+EMBEDDING_SPECIAL_TOKENS = 2
+
+def embedding_token_limit(max_seq_length: Optional[int] = None) -> int:
+    """
+    Tokens of chunk text the embedding model reads: `max_seq_length` (by default that of
+    the active store version's model, see `embeddings_max_seq_length`) less its special tokens.
+    """
+    return (max_seq_length or embeddings_max_seq_length()) - EMBEDDING_SPECIAL_TOKENS
+
+def embedding_model_name(model_name: Optional[str] = None) -> str:
+    """`model_name`, or by default the embedding model of the active store version."""
+    return model_name or embeddings_model_of(active_version())
+
+def get_text_splitter(max_seq_length: Optional[int] = None, model_name: Optional[str] = None):
+    """
+    Returns the text splitter for CHUNK_SIZE_UNIT. With 'tokens', chunk lengths are
+    measured with the tokenizer of the embedding model `model_name` and capped at what
+    the model reads (`max_seq_length` tokens); both default to the active version's model.
+    """
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    if CHUNK_SIZE_UNIT == "tokens":
+        chunk_size = min(CHUNK_SIZE, embedding_token_limit(max_seq_length))
+        if chunk_size < CHUNK_SIZE:
+            print(f"CHUNK_SIZE of {CHUNK_SIZE} tokens exceeds what the embedding model reads; using {chunk_size}.")
+        model_name = embedding_model_name(model_name)
+        return RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=min(CHUNK_OVERLAP, chunk_size // 2),
+            length_function=lambda text: count_tokens(text, EMBEDDING, model_name),
+        )
+    if CHUNK_SIZE_UNIT != "characters":
+        raise ValueError(f"Unknown CHUNK_SIZE_UNIT '{CHUNK_SIZE_UNIT}', expected 'characters' or 'tokens'.")
+    return RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+
+def warn_about_truncated_chunks(chunks: List[Document], max_seq_length: Optional[int] = None, model_name: Optional[str] = None) -> int:
+    """Warns about chunks longer than the embedding model reads (their end would be ignored). Returns their number."""
+    with stage_timer("ingest", "count_tokens"):
+        counts = count_tokens_batch([chunk.page_content for chunk in chunks], EMBEDDING, embedding_model_name(model_name))
+    limit = embedding_token_limit(max_seq_length)
+    too_long = sum(1 for count in counts if count > limit)
+    if too_long:
+        print(f"Warning: {too_long} of {len(chunks)} chunks exceed the embedding model's {limit} tokens and will be truncated "
+              f"when embedded (longest: {max(counts)} tokens). Lower CHUNK_SIZE or set CHUNK_SIZE_UNIT=tokens.")
+    return too_long
+
 def does_vectorstore_exist() -> bool:
     """
-    Checks if vectorstore exists at PERSIST_DIRECTORY.
+    Checks if the active vector store version already holds chunks.
+    """
+    return get_vectorstore()._collection.count() > 0
+
+# --- Embedding Cache ---
+_embedding_cache = None
+
+def get_embedding_cache():
+    """Returns the on-disk cache of chunk embeddings, or None if disabled (EMBEDDING_CACHE_MAX_MB=0)."""
+    global _embedding_cache
+    if EMBEDDING_CACHE_MAX_MB <= 0:
+        return None
+    if _embedding_cache is None:
+        from cache import DiskCache
+        _embedding_cache = DiskCache("embeddings", max_bytes=int(EMBEDDING_CACHE_MAX_MB * 1024 * 1024))
+    return _embedding_cache
+
+def embedding_cache_key(text: str, model_name: str = EMBEDDINGS_MODEL_NAME) -> str:
+    """Cache key of a chunk's embedding: the embedding model and the chunk text with whitespace normalized."""
+    from cache import content_hash
+    return content_hash(model_name, " ".join(text.split()))
+
+def embed_texts(embeddings, texts: List[str], stats: Dict[str, int] = None) -> List[List[float]]:
+    """
+    Embeds the texts, reusing cached embeddings. Only texts not in the cache are sent to
+    the model, each distinct text once, so repeated boilerplate and unchanged chunks of
+    re-uploaded documents cost nothing. Hits and misses are counted in `stats` if given.
+    """
+    cache = get_embedding_cache()
+    if cache is None:
+        return embeddings.embed_documents(texts)
+
+    import numpy as np
+    model_name = getattr(embeddings, "model_name", EMBEDDINGS_MODEL_NAME)
+    keys = [embedding_cache_key(text, model_name) for text in texts]
+    cached = cache.get_many(keys)
+    missing: Dict[str, str] = {}
+    for key, text in zip(keys, texts):
+        if key not in cached and key not in missing:
+            missing[key] = text
+
+    vectors_by_key: Dict[str, List[float]] = {}
+    if missing:
+        new_vectors = embeddings.embed_documents(list(missing.values()))
+        vectors_by_key = dict(zip(missing, new_vectors))
+        cache.put_many((key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in vectors_by_key.items())
+    for key, data in cached.items():
+        vectors_by_key[key] = np.frombuffer(data, dtype=np.float32).tolist()
+
+    if stats is not None:
+        stats["embedding_cache_hits"] = stats.get("embedding_cache_hits", 0) + len(texts) - len(missing)
+        stats["embedding_cache_misses"] = stats.get("embedding_cache_misses", 0) + len(missing)
+    return [vectors_by_key[key] for key in keys]
+
+def link_near_duplicates(collection_name: str, texts: List[str], metadatas: List[Dict[str, Any]], ids: List[str], stats: Dict[str, int] = None):
+    """
+    Finds chunks that nearly duplicate an already stored chunk (or an earlier one in
+    this batch). With DEDUP_MODE 'skip' they are dropped; with 'link' they are kept and
+    every chunk records its canonical chunk in the `dedup_group` metadata, which
+    retrieval uses to collapse duplicates. Returns the (possibly filtered) texts, metadatas and ids.
+    """
+    from dedup import get_duplicate_index
+    canonical = get_duplicate_index().assign(collection_name, ids, texts)
+    duplicates = sum(1 for chunk_id in ids if canonical[chunk_id] != chunk_id)
+    DUPLICATE_CHUNKS_TOTAL.inc(duplicates, action=DEDUP_MODE)
+    if stats is not None:
+        stats["near_duplicates"] = stats.get("near_duplicates", 0) + duplicates
+
+    if DEDUP_MODE == "skip":
+        kept = [i for i, chunk_id in enumerate(ids) if canonical[chunk_id] == chunk_id]
+        return [texts[i] for i in kept], [metadatas[i] for i in kept], [ids[i] for i in kept]
+    if DEDUP_MODE != "link":
+        raise ValueError(f"Unknown DEDUP_MODE '{DEDUP_MODE}', expected 'off', 'skip' or 'link'.")
+    metadatas = [{**(metadata or {}), "dedup_group": canonical[chunk_id]} for metadata, chunk_id in zip(metadatas, ids)]
+    return texts, metadatas, ids
+
+def add_chunks_to_vectorstore(db, embeddings, chunks: List[Document], stats: Dict[str, int] = None, progress: Dict[str, Any] = None) -> int:
+    """
+    Embeds the chunks and upserts them into the vector store.
+    Embedding and upserting are done as two separate steps (instead of
+    `db.add_documents`) so that each stage can be timed on its own.
+    Near-duplicate chunks are skipped or linked to their canonical chunk (DEDUP_MODE).
+    Embedding cache hits/misses and near-duplicates are counted in `stats` if given.
+    Returns the number of chunks written.
+    """
+    if not chunks:
+        return 0
+    metadatas, vectors = _write_chunks(db._collection, embeddings, chunks, stats, progress)
+    if metadatas:
+        with stage_timer("ingest", "document_index"):
+            update_document_index(metadatas, vectors, db._collection.name)
+    return len(metadatas) # Fewer than the chunks if DEDUP_MODE=skip dropped some
+
+def add_chunk_batches_to_vectorstore(db, embeddings, batches: Iterable[List[Document]], stats: Dict[str, int] = None, progress: Dict[str, Any] = None) -> int:
+    """
+    Like `add_chunks_to_vectorstore`, but embeds and upserts the chunks one batch at a
+    time, so only one batch is held in memory. Each document's index entry is computed
+    from all of its chunks, even when they span batches. Returns the number of chunks written.
+    """
+    collection = db._collection
+    centroids = DocumentCentroids()
+    written = 0
+    for chunks in batches:
+        if chunks:
+            metadatas, vectors = _write_chunks(collection, embeddings, chunks, stats, progress)
+            centroids.add(metadatas, vectors)
+            written += len(metadatas)
+    with stage_timer("ingest", "document_index"):
+        centroids.write(collection.name)
+    return written
+
+def _write_chunks(collection, embeddings, chunks: List[Document], stats: Dict[str, int] = None, progress: Dict[str, Any] = None):
+    """Dedups, embeds and upserts the chunks. Returns the metadatas and embeddings of the chunks stored."""
+    if progress is not None:
+        progress.setdefault("embedding_started_at", time.time())
+    texts = [chunk.page_content for chunk in chunks]
+    metadatas = [chunk.metadata or None for chunk in chunks] # Chroma rejects empty metadata dicts
+    ids = [str(uuid.uuid4()) for _ in chunks]
+
+    if DEDUP_MODE != "off":
+        with stage_timer("ingest", "dedup"):
+            texts, metadatas, ids = link_near_duplicates(collection.name, texts, metadatas, ids, stats)
+        if not ids:
+            count_progress(progress, chunks_embedded=len(chunks))
+            return [], []
+
+    with stage_timer("ingest", "embed"):
+        vectors = embed_texts(embeddings, texts, stats)
+
+    with stage_timer("ingest", "upsert"):
+        from chromadb.utils.batch_utils import create_batches
+        # Respect Chroma's maximum batch size for large ingestions
+        for batch_ids, batch_vectors, batch_metadatas, batch_texts in create_batches(
+            api=collection._client, ids=ids, embeddings=vectors, metadatas=metadatas, documents=texts
+        ):
+            collection.upsert(ids=batch_ids, embeddings=batch_vectors, metadatas=batch_metadatas, documents=batch_texts)
+
+    CHUNKS_INGESTED_TOTAL.inc(len(ids))
+    count_progress(progress, chunks_embedded=len(chunks))
+    return metadatas, vectors
+
+def update_document_index(metadatas: List[Dict[str, Any]], vectors: List[List[float]], version: str = None) -> int:
+    """
+    Writes one entry per source document to the document-level index: the centroid of
+    the document's chunk embeddings, rescaled to their average length so it stays
+    comparable to chunk and query embeddings. Returns the number of documents written.
+    """
+    centroids = DocumentCentroids()
+    centroids.add(metadatas, vectors)
+    return centroids.write(version)
+
+class DocumentCentroids:
+    """
+    Running sums of chunk embeddings per source document, so a document's index entry
+    can be computed from chunks that are embedded batch by batch (see `ingest_csv_file`).
+    """
+    def __init__(self):
+        # source -> [sum of embeddings, sum of their lengths, number of chunks]
+        self._sums: Dict[str, list] = {}
+
+    def add(self, metadatas: List[Dict[str, Any]], vectors: List[List[float]]) -> None:
+        import numpy as np
+        rows_by_source: Dict[str, List[int]] = {}
+        for i, metadata in enumerate(metadatas):
+            source = (metadata or {}).get("source")
+            if source:
+                rows_by_source.setdefault(source, []).append(i)
+        if not rows_by_source:
+            return
+        matrix = np.asarray(vectors, dtype=np.float32)
+        for source, rows in rows_by_source.items():
+            source_matrix = matrix[rows]
+            sums = self._sums.setdefault(source, [0.0, 0.0, 0])
+            sums[0] = sums[0] + source_matrix.sum(axis=0)
+            sums[1] += float(np.linalg.norm(source_matrix, axis=1).sum())
+            sums[2] += len(rows)
+
+    def discard(self, source: str) -> None:
+        self._sums.pop(source, None)
+
+    def write(self, version: str = None) -> int:
+        """Upserts the index entries of the documents seen so far. Returns their number."""
+        import numpy as np
+        if not self._sums:
+            return 0
+        sources, centroids, index_metadatas = [], [], []
+        for source, (vector_sum, norm_sum, count) in self._sums.items():
+            centroid = vector_sum / count
+            norm = np.linalg.norm(centroid)
+            if norm > 0:
+                centroid *= (norm_sum / count) / norm
+            sources.append(source)
+            centroids.append(centroid.tolist())
+            index_metadatas.append({"source": source, "chunks": count})
+        # Keyed by source, so re-ingesting a document replaces its entry
+        get_document_index(version).upsert(ids=sources, embeddings=centroids, metadatas=index_metadatas)
+        return len(sources)
+
+def rebuild_document_index(version: str = None) -> int:
+    """
+    Rebuilds the document-level index of a store version (the active one by default)
+    from the chunk embeddings already in it, e.g. for documents ingested before the
+    index existed. Only stored embeddings are read, so the embedding model is not loaded.
+    """
+    collection = get_chroma_client().get_collection(version or active_version())
+    document_index = get_document_index(collection.name)
+    stale_ids = document_index.get(include=[])["ids"]
+    if stale_ids:
+        document_index.delete(ids=stale_ids)
+    sources = {metadata.get("source") for metadata in collection.get(include=["metadatas"])["metadatas"] if metadata}
+    # One document's embeddings at a time, so large corpora do not have to fit in memory at once
+    rebuilt = 0
+    for source in tqdm(sorted(source for source in sources if source), desc='Rebuilding document index', ncols=80):
+        stored = collection.get(where={"source": source}, include=["metadatas", "embeddings"])
+        rebuilt += update_document_index(stored["metadatas"], stored["embeddings"], collection.name)
+    return rebuilt
+
+# --- Streaming CSV Ingestion ---
+def is_csv_file(file_path: str) -> bool:
+    return file_path.lower().endswith(".csv")
+
+def _csv_dialect(f) -> Any:
+    """Detects the delimiter from the start of the file, defaulting to plain comma-separated values."""
+    sample = f.read(64 * 1024)
+    f.seek(0)
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=",;\t|")
+    except csv.Error:
+        return csv.excel
+
+def _csv_line(row: List[str]) -> str:
+    """A row written back as one CSV line (cells quoted where needed)."""
+    import io
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="").writerow(row)
+    return buffer.getvalue()
+
+def iter_csv_chunks(
+    file_path: str, batch_rows: int = CSV_BATCH_ROWS, max_seq_length: Optional[int] = None, model_name: Optional[str] = None,
+) -> Iterator[Tuple[List[Document], int]]:
+    """
+    Reads a CSV file `batch_rows` rows at a time and packs consecutive rows into chunks
+    of up to CHUNK_SIZE (in CHUNK_SIZE_UNIT), each starting with the header row so every
+    chunk can be read on its own. Rows are never split; a row longer than CHUNK_SIZE
+    becomes a chunk by itself. Chunk metadata records the source and the range of data
+    rows (1-based, header excluded). Yields the chunks completed in each batch with the
+    number of rows read, so only one batch is ever held in memory. In token mode, chunks
+    are capped as in `get_text_splitter`.
     """
-    if os.path.exists(os.path.join(PERSIST_DIRECTORY, 'index')):
-        # Check for specific ChromaDB files (might vary by ChromaDB version)
-        if os.path.exists(os.path.join(PERSIST_DIRECTORY, 'chroma-collections.parquet')) and \
-           os.path.exists(os.path.join(PERSIST_DIRECTORY, 'chroma-embeddings.parquet')):
-            # Check if there are some index files indicating a non-empty DB
-            list_index_files = glob.glob(os.path.join(PERSIST_DIRECTORY, 'index/*.bin'))
-            list_index_files += glob.glob(os.path.join(PERSIST_DIRECTORY, 'index/*.pkl'))
-            if len(list_index_files) > 0: # At least some files should exist
-                return True
-    return False
+    if CHUNK_SIZE_UNIT == "tokens":
+        chunk_size = min(CHUNK_SIZE, embedding_token_limit(max_seq_length))
+        model_name = embedding_model_name(model_name)
+        measure = lambda lines: count_tokens_batch(lines, EMBEDDING, model_name)
+    elif CHUNK_SIZE_UNIT == "characters":
+        chunk_size = CHUNK_SIZE
+        measure = lambda lines: [len(line) for line in lines]
+    else:
+        raise ValueError(f"Unknown CHUNK_SIZE_UNIT '{CHUNK_SIZE_UNIT}', expected 'characters' or 'tokens'.")
+
+    csv.field_size_limit(2**31 - 1) # Cells with long free text exceed the default limit of 128 KiB
+    with open(file_path, newline="", encoding="utf-8-sig", errors="replace") as f:
+        reader = csv.reader(f, _csv_dialect(f))
+        header = next(reader, None)
+        if not header:
+            return
+        header_line = _csv_line(header)
+        header_size = measure([header_line])[0]
+
+        row_number = 0
+        pending: List[str] = [] # Rows of the chunk being filled
+        pending_size = header_size
+        pending_start = 1
+
+        def make_chunk() -> Document:
+            return Document(
+                page_content="\n".join([header_line, *pending]),
+                metadata={"source": file_path, "row_start": pending_start, "row_end": pending_start + len(pending) - 1},
+            )
+
+        while True:
+            lines = []
+            for row in reader:
+                if any(cell.strip() for cell in row):
+                    lines.append(_csv_line(row))
+                    if len(lines) >= batch_rows:
+                        break
+            if not lines:
+                break
+            chunks = []
+            for line, size in zip(lines, measure(lines)):
+                row_number += 1
+                if pending and pending_size + 1 + size > chunk_size:
+                    chunks.append(make_chunk())
+                    pending, pending_size, pending_start = [], header_size, row_number
+                pending.append(line)
+                pending_size += 1 + size # Rows are joined by newlines
+            yield chunks, len(lines)
+        if pending:
+            yield [make_chunk()], 0
+
+def ingest_csv_file(
+    db, embeddings, file_path: str, stats: Dict[str, int] = None, progress: Dict[str, Any] = None, model_name: Optional[str] = None,
+) -> Tuple[int, int]:
+    """
+    Streams a CSV file into the vector store: each batch of rows is chunked, embedded and
+    upserted before the next one is read, so memory use stays flat however large the
+    file is. The document-level index entry is built from running sums over all batches.
+    If reading, embedding or writing any batch fails, the file is removed from the store
+    again and counted in `stats["failed_files"]`. `model_name` is the embedding model of
+    `db` (by default the active version's). Returns the number of chunks written and of rows read.
+    """
+    collection = db._collection
+    centroids = DocumentCentroids()
+    max_seq_length = embeddings_max_seq_length(model_name) if CHUNK_SIZE_UNIT == "tokens" else None
+    chunks_written = rows = 0
+    started = time.perf_counter()
+    try:
+        with stage_timer("ingest", "csv"), tqdm(desc=f"Streaming {os.path.basename(file_path)}", unit=" rows", ncols=80) as pbar:
+            for chunks, batch_rows in iter_csv_chunks(file_path, max_seq_length=max_seq_length, model_name=model_name):
+                count_progress(progress, chunks_produced=len(chunks), rows_read=batch_rows)
+                if chunks:
+                    metadatas, vectors = _write_chunks(collection, embeddings, chunks, stats, progress)
+                    centroids.add(metadatas, vectors)
+                    chunks_written += len(metadatas)
+                rows += batch_rows
+                pbar.update(batch_rows)
+    except Exception as e:
+        print(f"Error streaming {file_path}: {type(e).__name__}: {e}")
+        # Do not leave a partly ingested file behind: it would count as already ingested
+        delete_documents([file_path], collection.name)
+        if stats is not None:
+            stats["failed_files"] = stats.get("failed_files", 0) + 1
+        return 0, rows
+    finally:
+        CSV_ROWS_INGESTED_TOTAL.inc(rows)
+    with stage_timer("ingest", "document_index"):
+        centroids.write(collection.name)
+    DOCUMENTS_LOADED_TOTAL.inc()
+    count_progress(progress, documents_parsed=1)
+
+    elapsed = time.perf_counter() - started
+    print(f"Streamed {rows} rows of {file_path} into {chunks_written} chunks in {elapsed:.1f}s "
+          f"({rows / elapsed if elapsed > 0 else 0:.0f} rows/s).")
+    return chunks_written, rows
+
+# --- Page-Parallel PDF Parsing ---
+@lru_cache(maxsize=1024)
+def _pdf_page_count(file_path: str, mtime: float, size: int) -> int:
+    import pymupdf
+    with pymupdf.open(file_path) as document:
+        return document.page_count
+
+def pdf_page_count(file_path: str) -> int:
+    """Number of pages of a PDF (read from its page tree only), or 0 if it cannot be opened."""
+    try:
+        stat = os.stat(file_path)
+        return _pdf_page_count(file_path, stat.st_mtime, stat.st_size)
+    except Exception:
+        return 0
+
+def is_large_pdf(file_path: str) -> bool:
+    return (
+        PDF_PARALLEL_MIN_PAGES > 0
+        and file_path.lower().endswith(".pdf")
+        and LOADER_MAPPING[".pdf"][0] == "PyMuPDFLoader"
+        and pdf_page_count(file_path) >= PDF_PARALLEL_MIN_PAGES
+    )
+
+def is_streamed_file(file_path: str) -> bool:
+    """CSV files and large PDFs bypass `process_documents` and are embedded batch by batch while they are read."""
+    return is_csv_file(file_path) or is_large_pdf(file_path)
+
+def load_pdf_pages(file_path: str, start: int, end: int) -> List[Document]:
+    """
+    Parses pages [start, end) of a PDF into one Document per page, with the same
+    metadata as PyMuPDFLoader (`page` is 0-based).
+    """
+    import pymupdf
+    with pymupdf.open(file_path) as pdf:
+        metadata = {
+            "source": file_path,
+            "file_path": file_path,
+            "total_pages": pdf.page_count,
+            **{key: value for key, value in pdf.metadata.items() if isinstance(value, (str, int)) and value != ""},
+        }
+        return [
+            Document(page_content=pdf[page].get_text(), metadata={**metadata, "page": page})
+            for page in range(start, min(end, pdf.page_count))
+        ]
+
+def _parse_pdf_page_range(task: Tuple[str, str, int, int, Optional[int], Optional[str]]):
+    """
+    Pool worker: parses (or reads from the parsed-text cache) one page range and splits
+    it into chunks. Returns the file, the range and its chunks, or the error message.
+    """
+    file_path, start, end = task[0], task[2], task[3]
+    try:
+        return file_path, start, end, _page_range_chunks(*task), None
+    except Exception as e:
+        return file_path, start, end, [], f"{type(e).__name__}: {e}"
+
+def _page_range_chunks(
+    file_path: str, digest: str, start: int, end: int, max_seq_length: Optional[int] = None, model_name: Optional[str] = None,
+) -> List[Document]:
+    cache = get_parsed_text_cache()
+    cache_key = None
+    if cache is not None:
+        from cache import content_hash
+        from importlib.metadata import version
+        cache_key = content_hash(digest, "pymupdf_pages", str(start), str(end), PARSED_TEXT_CACHE_VERSION, version("pymupdf"))
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return get_text_splitter(max_seq_length, model_name).split_documents(decode_parsed_documents(cached, file_path))
+    pages = load_pdf_pages(file_path, start, end)
+    if cache_key is not None:
+        cache.put(cache_key, encode_parsed_documents(pages, file_path))
+    return get_text_splitter(max_seq_length, model_name).split_documents(pages)
+
+def _page_range_tasks(
+    file_path: str, max_seq_length: Optional[int], model_name: Optional[str] = None,
+) -> List[Tuple[str, str, int, int, Optional[int], Optional[str]]]:
+    digest = file_hash(file_path)
+    return [(file_path, digest, start, start + PDF_PAGE_RANGE_SIZE, max_seq_length, model_name)
+            for start in range(0, pdf_page_count(file_path), PDF_PAGE_RANGE_SIZE)]
+
+def ingest_large_pdfs(
+    db, embeddings, file_paths: List[str], stats: Dict[str, int] = None, progress: Dict[str, Any] = None, model_name: Optional[str] = None,
+) -> Tuple[int, int]:
+    """
+    Ingests large PDFs in ranges of PDF_PAGE_RANGE_SIZE pages. The ranges of all files
+    are parsed and chunked in parallel by a process pool; each range is embedded and
+    upserted as soon as it is ready, in whatever order ranges finish, so the embedding
+    model is kept busy while the remaining pages are still being parsed. A file with a
+    range that fails is removed from the store again. `model_name` is the embedding model
+    of `db` (by default the active version's). Returns the number of chunks written and
+    of pages parsed.
+    """
+    collection = db._collection
+    centroids = DocumentCentroids()
+    # Pool workers do not load the embedding model, so its limit and name are passed along
+    max_seq_length = embeddings_max_seq_length(model_name) if CHUNK_SIZE_UNIT == "tokens" else None
+    model_name = embedding_model_name(model_name)
+    tasks = [task for file_path in file_paths for task in _page_range_tasks(file_path, max_seq_length, model_name)]
+    count_progress(progress, pages_total=sum(pdf_page_count(file_path) for file_path in file_paths))
+
+    chunks_by_source: Dict[str, int] = {}
+    failed = set()
+    pages = 0
+    started = time.perf_counter()
+    with stage_timer("ingest", "pdf_pages"), Pool(processes=min(os.cpu_count() or 1, len(tasks))) as pool, \
+            tqdm(total=len(tasks), desc="Parsing PDF page ranges", ncols=80) as pbar:
+        for file_path, start, end, chunks, error in pool.imap_unordered(_parse_pdf_page_range, tasks):
+            pbar.update()
+            if error is None:
+                pages += min(end, pdf_page_count(file_path)) - start
+                count_progress(progress, pages_parsed=min(end, pdf_page_count(file_path)) - start, chunks_produced=len(chunks))
+                if file_path in failed or not chunks:
+                    continue
+                try:
+                    metadatas, vectors = _write_chunks(collection, embeddings, chunks, stats, progress)
+                    centroids.add(metadatas, vectors)
+                    chunks_by_source[file_path] = chunks_by_source.get(file_path, 0) + len(metadatas)
+                    continue
+                except Exception as e:
+                    error = f"{type(e).__name__}: {e}"
+            print(f"Error ingesting pages {start + 1}-{end} of {file_path}: {error}")
+            failed.add(file_path)
+
+    # Do not leave a partly ingested file behind: it would count as already ingested
+    delete_documents(sorted(failed), collection.name)
+    for file_path in failed:
+        centroids.discard(file_path)
+        chunks_by_source.pop(file_path, None)
+    if failed and stats is not None:
+        stats["failed_files"] = stats.get("failed_files", 0) + len(failed)
+    with stage_timer("ingest", "document_index"):
+        centroids.write(collection.name)
+    DOCUMENTS_LOADED_TOTAL.inc(len(chunks_by_source))
+    count_progress(progress, documents_parsed=len(file_paths))
+
+    elapsed = time.perf_counter() - started
+    chunks_written = sum(chunks_by_source.values())
+    print(f"Parsed {pages} pages of {len(file_paths)} large PDF(s) into {chunks_written} chunks in {elapsed:.1f}s "
+          f"({pages / elapsed if elapsed > 0 else 0:.0f} pages/s).")
+    return chunks_written, pages
+
+# --- Ingestion Progress ---
+def update_progress(progress: Dict[str, Any], **changes: Any) -> None:
+    """
+    Applies `changes` to an ingestion progress dict (see `ingest_documents`) and
+    re-estimates the seconds left from the embedding rate so far. No-op without a dict.
+    """
+    if progress is None:
+        return
+    progress.update(changes)
+    now = time.time()
+    progress["elapsed_seconds"] = round(now - progress.setdefault("started_at", now), 1)
+    embedded = progress.get("chunks_embedded", 0)
+    remaining = progress.get("chunks_produced", 0) - embedded
+    if embedded and "embedding_started_at" in progress:
+        rate = embedded / max(now - progress["embedding_started_at"], 1e-6)
+        seconds = remaining / rate
+        if progress.get("pages_total") and progress.get("pages_parsed"):
+            # Large PDFs produce chunks as their pages are parsed: extrapolate from the pages left
+            pages_left = progress["pages_total"] - progress["pages_parsed"]
+            seconds += pages_left * (progress["chunks_produced"] / progress["pages_parsed"]) / rate
+        progress["eta_seconds"] = round(seconds, 1)
+
+def count_progress(progress: Dict[str, Any], **increments: int) -> None:
+    """Adds `increments` to counters of an ingestion progress dict."""
+    if progress is not None:
+        update_progress(progress, **{key: progress.get(key, 0) + value for key, value in increments.items()})
+
+def new_progress(documents_total: int = 0) -> Dict[str, Any]:
+    """A fresh ingestion progress dict."""
+    return {"stage": "pending", "documents_total": documents_total, "documents_parsed": 0, "chunks_produced": 0, "chunks_embedded": 0, "eta_seconds": None}
+
 
 # --- Core Ingestion Function for API ---
-def ingest_documents(new_document_paths: List[str] = None) -> Dict[str, Any]:
+def ingest_documents(new_document_paths: List[str] = None, progress: Dict[str, Any] = None) -> Dict[str, Any]:
     """
-    Main ingestion function. Creates or updates the vector store.
+    Main ingestion function. Creates or updates the active vector store version.
     Args:
         new_document_paths (List[str], optional): List of paths to new documents
                                                 to ingest. If None, all documents
                                                 in SOURCE_DIRECTORY are ingested
                                                 (or updated).
+        progress (Dict, optional): Updated in place as ingestion runs (stage, documents
+                                   parsed, chunks produced and embedded, estimated
+                                   seconds left); start from `new_progress()`.
     Returns:
         Dict: A dictionary containing success/error message and number of chunks.
     """
+    # A running reindex waits for this ingestion before it copies the last documents and swaps versions
+    update_progress(progress, stage="waiting_for_store")
+    with store_write_lock:
+        try:
+            return _ingest_documents(new_document_paths, progress)
+        finally:
+            update_progress(progress, stage="done")
+
+def _ingest_documents(new_document_paths: List[str] = None, progress: Dict[str, Any] = None) -> Dict[str, Any]:
     try:
-        # Create embeddings
-        print(f"Initializing embeddings with {EMBEDDINGS_MODEL_NAME}...")
-        embeddings = HuggingFaceEmbeddings(model_name=EMBEDDINGS_MODEL_NAME, model_kwargs={'device': 'cpu'})
-        print("Embeddings initialized.")
+        # Shared embeddings of the active version's model (loaded once per process, usually during server warm-up)
+        embeddings = get_vectorstore().embeddings
 
         db = None
         texts_to_add = []
+        streamed_files = []
         ingested_count = 0
+        stats = {"embedding_cache_hits": 0, "embedding_cache_misses": 0, "near_duplicates": 0}
 
         # Check if vectorstore exists
         if does_vectorstore_exist():
             print(f"Appending to existing vectorstore at {PERSIST_DIRECTORY}")
-            db = Chroma(persist_directory=PERSIST_DIRECTORY, embedding_function=embeddings)
+            db = get_vectorstore()
             # Retrieve existing sources to avoid re-ingesting
             existing_sources = set()
             try:
                 collection = db.get(ids=None, where={}, include=['metadatas']) # Fetch all metadatas
                 if collection and 'metadatas' in collection:
-                    existing_sources = {metadata.get('source') for metadata in collection['metadatas'] if 'source' in metadata}
+                    existing_sources = {metadata.get('source') for metadata in collection['metadatas'] if metadata and 'source' in metadata}
             except Exception as e:
                 print(f"Warning: Could not retrieve existing documents from ChromaDB: {e}. Proceeding as if new DB.")
                 # If cannot retrieve existing, treat as new DB or force re-ingestion
@@ -229,7 +1197,10 @@ def ingest_documents(new_document_paths: List[str] = None) -> Dict[str, Any]:
                 if not files_to_process:
                     print("All provided documents already in vectorstore. Nothing to ingest.")
                     return {"message": "All provided documents already in vectorstore.", "chunks_ingested": 0}
-                texts_to_add = process_documents(files_to_process)
+                update_progress(progress, documents_total=len(files_to_process))
+                delete_documents(files_to_process) # Not in the store, but drop index entries a failed earlier attempt left behind
+                streamed_files = [p for p in files_to_process if is_streamed_file(p)]
+                texts_to_add = process_documents(files_to_process, progress)
             else:
                 # If no specific paths, process all new documents from SOURCE_DIRECTORY
                 all_source_files = []
@@ -241,29 +1212,77 @@ def ingest_documents(new_document_paths: List[str] = None) -> Dict[str, Any]:
                 if not files_to_process:
                     print("No new documents found in source directory to ingest.")
                     return {"message": "No new documents to ingest.", "chunks_ingested": 0}
-                texts_to_add = process_documents(files_to_process)
+                update_progress(progress, documents_total=len(files_to_process))
+                delete_documents(files_to_process) # Not in the store, but drop index entries a failed earlier attempt left behind
+                streamed_files = [p for p in files_to_process if is_streamed_file(p)]
+                texts_to_add = process_documents(files_to_process, progress)
 
             if texts_to_add:
                 print(f"Adding {len(texts_to_add)} new chunks to vectorstore...")
-                db.add_documents(texts_to_add)
-                ingested_count = len(texts_to_add)
+                update_progress(progress, stage="embedding")
+                ingested_count = add_chunks_to_vectorstore(db, embeddings, texts_to_add, stats, progress)
         else:
             # Create new vectorstore
             print("Creating new vectorstore...")
             # If new_document_paths are provided, only process those.
             # Otherwise, process all from SOURCE_DIRECTORY.
-            texts_to_add = process_documents(new_document_paths)
-            if not texts_to_add:
+            if new_document_paths:
+                update_progress(progress, documents_total=len(new_document_paths))
+                streamed_files = [p for p in new_document_paths if is_streamed_file(p)]
+            else:
+                streamed_files = [
+                    p for ext in (".csv", ".pdf") for p in glob.glob(os.path.join(SOURCE_DIRECTORY, f"**/*{ext}"), recursive=True)
+                    if is_streamed_file(p)
+                ]
+                update_progress(progress, documents_total=len(streamed_files)) # load_documents adds the others
+            texts_to_add = process_documents(new_document_paths, progress)
+            if not texts_to_add and not streamed_files:
                 return {"message": "No documents found to create a new vectorstore.", "chunks_ingested": 0}
-            print(f"Adding {len(texts_to_add)} chunks to new vectorstore...")
-            db = Chroma.from_documents(texts_to_add, embeddings, persist_directory=PERSIST_DIRECTORY)
-            ingested_count = len(texts_to_add)
+            db = get_vectorstore()
+            if texts_to_add:
+                print(f"Adding {len(texts_to_add)} chunks to new vectorstore...")
+                update_progress(progress, stage="embedding")
+                ingested_count = add_chunks_to_vectorstore(db, embeddings, texts_to_add, stats, progress)
+
+        chunks_total = len(texts_to_add)
+        # Streamed batch by batch instead of being loaded and split like other documents
+        csv_files = [p for p in streamed_files if is_csv_file(p)]
+        if csv_files:
+            print(f"Streaming {len(csv_files)} CSV file(s) into the vectorstore...")
+            update_progress(progress, stage="streaming_csv")
+            for path in csv_files:
+                csv_chunks, csv_rows = ingest_csv_file(db, embeddings, path, stats, progress)
+                ingested_count += csv_chunks
+                chunks_total += csv_chunks
+                stats["csv_rows"] = stats.get("csv_rows", 0) + csv_rows
+        large_pdfs = [p for p in streamed_files if not is_csv_file(p)]
+        if large_pdfs:
+            print(f"Parsing {len(large_pdfs)} large PDF(s) in ranges of {PDF_PAGE_RANGE_SIZE} pages...")
+            update_progress(progress, stage="streaming_pdf")
+            pdf_chunks, stats["pdf_pages"] = ingest_large_pdfs(db, embeddings, large_pdfs, stats, progress)
+            ingested_count += pdf_chunks
+            chunks_total += pdf_chunks
 
         if db:
            
             db = None # Clear DB from memory
             print(f"Ingestion complete! {ingested_count} chunks added.")
-            return {"message": "Ingestion successful!", "chunks_ingested": ingested_count}
+            embedded = stats["embedding_cache_hits"] + stats["embedding_cache_misses"]
+            hit_rate = stats["embedding_cache_hits"] / embedded if embedded else 0.0
+            print(f"Embedding cache: {stats['embedding_cache_hits']} of {embedded} chunks reused ({hit_rate:.0%}).")
+            if DEDUP_MODE != "off":
+                action = "skipped" if DEDUP_MODE == "skip" else "linked to a canonical chunk"
+                print(f"Near-duplicates: {stats['near_duplicates']} of {chunks_total} chunks {action}.")
+            if stats.get("failed_files"):
+                print(f"Warning: {stats['failed_files']} streamed file(s) failed and were removed from the store again.")
+            return {
+                "message": "Ingestion successful!",
+                "chunks_ingested": ingested_count,
+                "embedding_cache_hits": stats["embedding_cache_hits"],
+                "embedding_cache_hit_rate": round(hit_rate, 4),
+                "near_duplicates": stats["near_duplicates"],
+                **{key: stats[key] for key in ("csv_rows", "pdf_pages", "failed_files") if key in stats},
+            }
         else:
             return {"message": "No database operation performed.", "chunks_ingested": 0}
 
@@ -281,6 +1300,24 @@ if __name__ == "__main__":
     # This block will only run if ingest.py is executed directly.
     # It provides a simple command-line interface for testing the function.
     print("Running ingest.py in standalone mode.")
+    from argparse import ArgumentParser # Import locally for this block
+
+    parser = ArgumentParser(description='ingest: Ingest documents from the source directory into the vector store.')
+    parser.add_argument("--rebuild-document-index", action='store_true',
+                        help='Only rebuild the document-level index (used by two-tier retrieval) from the stored chunks.')
+    parser.add_argument("--benchmark-loaders", nargs='+', metavar="PATH",
+                        help='Compare the fast-path loaders with their Unstructured fallbacks on these files or directories.')
+    parser.add_argument("--repeat", type=int, default=3, help='Runs per loader with --benchmark-loaders (default: 3).')
+    args = parser.parse_args()
+
+    if args.benchmark_loaders:
+        benchmark_loaders(args.benchmark_loaders, args.repeat)
+        raise SystemExit(0)
+
+    if args.rebuild_document_index:
+        print(f"Document index rebuilt: {rebuild_document_index()} document(s).")
+        raise SystemExit(0)
+
     result = ingest_documents()
     if "error" in result:
         print(f"Ingestion failed: {result['error']}")
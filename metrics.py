@@ -0,0 +1,225 @@
+import threading
+import time
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+# --- Metric Types ---
+# A tiny, dependency-free subset of the Prometheus client: enough to expose
+# counters, gauges and histograms in the text exposition format on /metrics.
+
+def _format_labels(labelnames: Sequence[str], labelvalues: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape_label(value)}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _escape_label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    """Base class holding one value per label combination."""
+    metric_type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], float] = {}
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Metric {self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def get(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter."""
+    metric_type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        if amount < 0:
+            raise ValueError("Counters can only be incremented by non-negative amounts.")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    """Value that can go up and down (queue depth, in-flight requests, ...)."""
+    metric_type = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, float("inf"))
+
+class Histogram(_Metric):
+    """Cumulative histogram with fixed upper bounds."""
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        buckets = sorted(buckets)
+        if buckets[-1] != float("inf"):
+            buckets.append(float("inf"))
+        self.buckets = tuple(buckets)
+        # key -> [bucket counts..., sum, count]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.setdefault(key, [0.0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def get(self, **labels) -> float:
+        """Returns the number of observations for the given labels."""
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            return series[-1] if series else 0.0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    le = f'le="{_format_value(bound)}"'
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {_format_value(count)}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(series[-2])}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {_format_value(series[-1])}")
+        return lines
+
+
+REGISTRY: List[_Metric] = []
+
+def render_metrics() -> str:
+    """Renders every registered metric in the Prometheus text exposition format."""
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# --- Application Metrics ---
+STAGE_DURATION_SECONDS = Histogram(
+    "privategpt_stage_duration_seconds",
+    "Time spent in each stage of the query and ingestion pipelines.",
+    ["pipeline", "stage"],
+)
+QUERIES_TOTAL = Counter("privategpt_queries_total", "Queries processed, by outcome.", ["outcome"])
+QUERIES_IN_FLIGHT = Gauge("privategpt_queries_in_flight", "Queries currently being processed.")
+INGESTION_TASKS = Gauge("privategpt_ingestion_tasks", "Ingestion tasks known to the server, by status.", ["status"])
+CACHE_REQUESTS_TOTAL = Counter("privategpt_cache_requests_total", "Cache lookups, by cache and result (hit/miss).", ["cache", "result"])
+CHUNKS_INGESTED_TOTAL = Counter("privategpt_chunks_ingested_total", "Chunks written to the vector store.")
+DOCUMENTS_LOADED_TOTAL = Counter("privategpt_documents_loaded_total", "Documents loaded by the ingestion pipeline.")
+CSV_ROWS_INGESTED_TOTAL = Counter("privategpt_csv_rows_ingested_total", "CSV rows read by the streaming CSV ingestion.")
+LLM_TOKENS_TOTAL = Counter("privategpt_llm_tokens_total", "Tokens processed by the LLM, by kind (prompt/completion).", ["kind"])
+OLLAMA_REQUESTS_TOTAL = Counter("privategpt_ollama_requests_total", "HTTP requests to Ollama, by endpoint and outcome.", ["endpoint", "outcome"])
+OLLAMA_CIRCUIT_OPEN = Gauge("privategpt_ollama_circuit_open", "1 while the Ollama circuit breaker is open, 0 otherwise.")
+LLM_QUEUE_DEPTH = Gauge("privategpt_llm_queue_depth", "Requests waiting for an LLM slot, by priority class.", ["priority"])
+LLM_ACTIVE_REQUESTS = Gauge("privategpt_llm_active_requests", "Requests currently holding an LLM slot, by priority class.", ["priority"])
+LLM_QUEUE_WAIT_SECONDS = Histogram("privategpt_llm_queue_wait_seconds", "Time spent waiting for an LLM slot, by priority class.", ["priority"])
+LLM_SCHEDULED_TOTAL = Counter("privategpt_llm_scheduled_total", "LLM requests handled by the scheduler, by priority class and outcome.", ["priority", "outcome"])
+CHAT_SESSIONS = Gauge("privategpt_chat_sessions", "Chat sessions currently held in memory.")
+DUPLICATE_CHUNKS_TOTAL = Counter("privategpt_duplicate_chunks_total", "Near-duplicate chunks found at ingestion, by action (skip/link).", ["action"])
+LLM_TOKENS_PER_SECOND = Histogram(
+    "privategpt_llm_tokens_per_second",
+    "LLM generation throughput as reported by Ollama.",
+    buckets=(1, 2, 5, 10, 20, 30, 50, 75, 100, 200, float("inf")),
+)
+
+
+# --- Stage Timing ---
+# Timings collected for the current request, used to build the Server-Timing header.
+_request_timings: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar(
+    "request_timings", default=None
+)
+
+@contextmanager
+def collect_timings():
+    """
+    Collects every stage timed inside the block (in this context) into a list of
+    (stage, seconds) tuples, e.g. to report them in a Server-Timing header.
+    """
+    timings: List[Tuple[str, float]] = []
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
+
+def record_stage(pipeline: str, stage: str, seconds: float) -> None:
+    """Records the duration of a pipeline stage that was measured elsewhere."""
+    STAGE_DURATION_SECONDS.observe(seconds, pipeline=pipeline, stage=stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+@contextmanager
+def stage_timer(pipeline: str, stage: str):
+    """Times the enclosed block and records it as `stage` of `pipeline`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(pipeline, stage, time.perf_counter() - start)
+
+def record_ollama_stats(generation_info: Dict, pipeline: str = "query") -> None:
+    """
+    Records the load / prompt-eval / eval split that Ollama reports with the final
+    response of a generation. Durations are reported in nanoseconds.
+    """
+    if not generation_info:
+        return
+    for key, stage in (("load_duration", "llm_load"),
+                       ("prompt_eval_duration", "llm_prompt_eval"),
+                       ("eval_duration", "llm_generation")):
+        if generation_info.get(key):
+            record_stage(pipeline, stage, generation_info[key] / 1e9)
+
+    prompt_tokens = generation_info.get("prompt_eval_count") or 0
+    completion_tokens = generation_info.get("eval_count") or 0
+    LLM_TOKENS_TOTAL.inc(prompt_tokens, kind="prompt")
+    LLM_TOKENS_TOTAL.inc(completion_tokens, kind="completion")
+    if completion_tokens and generation_info.get("eval_duration"):
+        LLM_TOKENS_PER_SECOND.observe(completion_tokens / (generation_info["eval_duration"] / 1e9))
+
+def server_timing_header(timings: List[Tuple[str, float]]) -> str:
+    """Formats collected timings as a Server-Timing header value (durations in ms)."""
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings)
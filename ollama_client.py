@@ -0,0 +1,200 @@
+import sys
+import time
+import asyncio
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from constants import (
+    OLLAMA_BASE_URL,
+    OLLAMA_MODEL_NAME,
+    OLLAMA_KEEP_ALIVE,
+    OLLAMA_KEEP_WARM_INTERVAL,
+    OLLAMA_REQUEST_TIMEOUT,
+    OLLAMA_MAX_CONNECTIONS,
+    OLLAMA_MAX_RETRIES,
+    OLLAMA_CIRCUIT_BREAKER_THRESHOLD,
+    OLLAMA_CIRCUIT_BREAKER_RESET_SECONDS,
+    MODEL_N_CTX,
+    MAX_NEW_TOKENS,
+    TEMPERATURE,
+)
+from metrics import stage_timer, record_ollama_stats, OLLAMA_REQUESTS_TOTAL, OLLAMA_CIRCUIT_OPEN
+
+
+class OllamaError(Exception):
+    """Raised when Ollama returns an error or cannot be reached after retries."""
+
+class OllamaUnavailableError(OllamaError):
+    """Raised without contacting Ollama while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures and rejects calls for `reset_seconds`.
+    After that, a single trial call is let through (half-open) while the others are
+    still rejected: success closes the circuit again, failure re-opens it. A trial that
+    ends without either (e.g. it was cancelled) lets the next call try instead.
+    """
+    def __init__(self, threshold: int, reset_seconds: float):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_running = False
+
+    @property
+    def is_open(self) -> bool:
+        """Whether calls are rejected: during `reset_seconds` after opening, then while the trial call runs."""
+        if self.opened_at is None:
+            return False
+        return self.trial_running or time.monotonic() - self.opened_at < self.reset_seconds
+
+    def before_call(self) -> bool:
+        """Raises OllamaUnavailableError while the circuit is open. Returns whether the call is the half-open trial."""
+        if self.is_open:
+            if self.trial_running:
+                raise OllamaUnavailableError(f"Ollama circuit breaker is open after {self.failures} consecutive failures; a trial request is running.")
+            retry_in = self.reset_seconds - (time.monotonic() - self.opened_at)
+            raise OllamaUnavailableError(f"Ollama circuit breaker is open after {self.failures} consecutive failures; retrying in {retry_in:.0f}s.")
+        self.trial_running = self.opened_at is not None
+        return self.trial_running
+
+    def end_trial(self) -> None:
+        self.trial_running = False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        OLLAMA_CIRCUIT_OPEN.set(0)
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.trial_running = False
+        if self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+            OLLAMA_CIRCUIT_OPEN.set(1)
+
+
+class OllamaClient:
+    """
+    Shared async client for the Ollama HTTP API.
+    One pooled `httpx.AsyncClient` keeps connections to Ollama alive between
+    requests, and every request asks Ollama to keep the model resident for
+    OLLAMA_KEEP_ALIVE so that users after an idle period do not pay the model load.
+    """
+    def __init__(self, base_url: str = OLLAMA_BASE_URL, model: str = OLLAMA_MODEL_NAME, keep_alive: str = OLLAMA_KEEP_ALIVE):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.keep_alive = keep_alive
+        self.breaker = CircuitBreaker(OLLAMA_CIRCUIT_BREAKER_THRESHOLD, OLLAMA_CIRCUIT_BREAKER_RESET_SECONDS)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # An AsyncClient is bound to the event loop it was first used on. The API server
+        # has a single loop; the CLI may run several `asyncio.run` calls in sequence.
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=httpx.Timeout(OLLAMA_REQUEST_TIMEOUT, connect=10.0),
+                limits=httpx.Limits(
+                    max_connections=OLLAMA_MAX_CONNECTIONS,
+                    max_keepalive_connections=OLLAMA_MAX_CONNECTIONS,
+                    keepalive_expiry=300,
+                ),
+            )
+            self._client_loop = loop
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._client_loop = None
+
+    async def _post(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """POSTs to Ollama with retries on connection errors and 5xx responses."""
+        trial = self.breaker.before_call()
+        try:
+            return await self._post_with_retries(path, payload)
+        finally:
+            if trial: # Cancelled or a client error: the next call tries instead
+                self.breaker.end_trial()
+
+    async def _post_with_retries(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        last_error: Optional[Exception] = None
+        for attempt in range(OLLAMA_MAX_RETRIES + 1):
+            if attempt:
+                await asyncio.sleep(min(0.5 * 2 ** (attempt - 1), 8.0))
+            try:
+                response = await self._get_client().post(path, json=payload)
+            except httpx.TransportError as e:
+                last_error = e
+                OLLAMA_REQUESTS_TOTAL.inc(endpoint=path, outcome="retryable_error")
+                continue
+            if response.status_code >= 500:
+                last_error = OllamaError(f"Ollama returned {response.status_code}: {response.text}")
+                OLLAMA_REQUESTS_TOTAL.inc(endpoint=path, outcome="retryable_error")
+                continue
+            if response.status_code >= 400:
+                # Client errors (unknown model, bad options) are not retried and do not trip the breaker
+                OLLAMA_REQUESTS_TOTAL.inc(endpoint=path, outcome="error")
+                raise OllamaError(f"Ollama returned {response.status_code}: {response.text}")
+            self.breaker.record_success()
+            OLLAMA_REQUESTS_TOTAL.inc(endpoint=path, outcome="success")
+            return response.json()
+
+        self.breaker.record_failure()
+        raise OllamaError(f"Ollama request to {path} failed after {OLLAMA_MAX_RETRIES + 1} attempt(s): {last_error}")
+
+    async def generate(
+        self,
+        prompt: str,
+        context: Optional[List[int]] = None,
+        options: Optional[Dict[str, Any]] = None,
+        pipeline: str = "query",
+    ) -> Dict[str, Any]:
+        """
+        Runs a (non-streaming) generation and returns Ollama's response, including
+        `response`, `context` and the load / prompt-eval / eval durations, which are
+        also recorded as stages of `pipeline`.
+        """
+        payload: Dict[str, Any] = {
+            "model": self.model,
+            "prompt": prompt,
+            "stream": False,
+            "keep_alive": self.keep_alive,
+            "options": {
+                "temperature": TEMPERATURE,
+                "num_ctx": MODEL_N_CTX,
+                "num_predict": MAX_NEW_TOKENS,
+                **(options or {}),
+            },
+        }
+        if context:
+            payload["context"] = context
+        with stage_timer(pipeline, "llm_total"):
+            result = await self._post("/api/generate", payload)
+        record_ollama_stats(result, pipeline=pipeline)
+        return result
+
+    async def keep_warm(self) -> None:
+        """Loads the model (if needed) and resets its keep-alive timer without generating anything."""
+        with stage_timer("ollama", "keep_warm"):
+            await self._post("/api/generate", {"model": self.model, "keep_alive": self.keep_alive})
+
+    async def keep_warm_loop(self, interval: float = OLLAMA_KEEP_WARM_INTERVAL) -> None:
+        """Pings Ollama every `interval` seconds so the model stays resident. Runs until cancelled."""
+        while True:
+            try:
+                await self.keep_warm()
+            except OllamaError as e:
+                print(f"Ollama: Keep-warm ping failed: {e}", file=sys.stderr)
+            await asyncio.sleep(interval)
+
+
+# Shared client used by the query path and the API server
+ollama_client = OllamaClient()
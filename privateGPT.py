@@ -1,134 +1,409 @@
 #!/usr/bin/env python3
 import os
 import sys
+import json
+import time
+import re
+import asyncio
+import argparse
+from collections import Counter
+from typing import Any, Dict, List, Optional, Set, Tuple
 from dotenv import load_dotenv
 
 # Import constants from our new constants.py
 from constants import (
-    EMBEDDINGS_MODEL_NAME,
-    PERSIST_DIRECTORY,
     MODEL_TYPE,
     OLLAMA_MODEL_NAME,
     MODEL_N_CTX,
     MAX_NEW_TOKENS,
-    TEMPERATURE,
     TARGET_SOURCE_CHUNKS,
+    TWO_TIER_RETRIEVAL,
+    DOCUMENT_CANDIDATES,
+    MAX_CHUNKS_PER_DOCUMENT,
+    DEDUP_MODE,
     HIDE_SOURCE_DOCUMENTS,
+    SOURCE_SNIPPET_CHARS,
     # Assuming CHROMA_SETTINGS is defined there
 )
 
-from langchain.chains import RetrievalQA
-from langchain_huggingface.embeddings import HuggingFaceEmbeddings
-from langchain_chroma.vectorstores import Chroma
-from langchain_community.llms import Ollama
+# Embeddings and Chroma are imported lazily (see vectorstore.py),
+# so importing this module from the API server stays fast.
 from langchain_core.prompts import PromptTemplate
-from langchain.docstore.document import Document # For type hinting source documents
+from langchain_core.documents import Document # For type hinting source documents
+
+from metrics import stage_timer, collect_timings
+from vectorstore import get_embeddings, get_vectorstore, get_document_index, get_chroma_client, list_versions
+from ollama_client import ollama_client, OllamaError, OllamaUnavailableError
+from scheduler import llm_scheduler, DeadlineExceeded, PRIORITY_INTERACTIVE
+from sessions import session_store, ChatSession
+from tokenizer import count_tokens
 
 
 # Load environment variables (ensure .env is loaded for current execution, though constants.py handles it)
 load_dotenv()
 
 
+# --- Prompt Template ---
+custom_template = """Use the following pieces of context to answer the user's question.
+    If you don't know the answer, just say that you don't know, don't try to make up an answer.
+
+    {context}
+
+    Question: {question}
+    Helpful Answer:"""
+
+custom_prompt = PromptTemplate(
+    template=custom_template,
+    input_variables=["context", "question"]
+)
+
+# Prompts for chat sessions. The instructions and the conversation history come first
+# and only grow at the end from turn to turn, so Ollama can reuse the evaluated prefix.
+session_template = """Use the following pieces of context to answer the user's question.
+    If you don't know the answer, just say that you don't know, don't try to make up an answer.
+
+    Conversation so far:
+    {history}
+
+    {context}
+
+    Question: {question}
+    Helpful Answer:"""
+
+session_prompt = PromptTemplate(
+    template=session_template,
+    input_variables=["history", "context", "question"]
+)
+
+# Continues a conversation on top of the `context` Ollama returned for the previous
+# turn: only the new sources and question are sent and evaluated.
+followup_template = """
+
+    Additional context:
+    {context}
+
+    Question: {question}
+    Helpful Answer:"""
+
+followup_prompt = PromptTemplate(
+    template=followup_template,
+    input_variables=["context", "question"]
+)
+
+condense_template = """Given the following conversation and a follow up question, rephrase the follow up question to be a standalone question, in its original language.
+
+    Chat History:
+    {history}
+    Follow Up Input: {question}
+    Standalone question:"""
+
+condense_prompt = PromptTemplate(
+    template=condense_template,
+    input_variables=["history", "question"]
+)
+
+
+# With linked near-duplicates, extra chunks are fetched so that `k` remain after collapsing them
+DEDUP_OVERFETCH = 3
+
+def collapse_duplicates(hits: List[Tuple[Document, float]]) -> List[Tuple[Document, float]]:
+    """Keeps the first (closest) chunk of each near-duplicate group (see DEDUP_MODE 'link')."""
+    seen = set()
+    collapsed = []
+    for document, distance in hits:
+        group = document.metadata.get("dedup_group")
+        if group is not None:
+            if group in seen:
+                continue
+            seen.add(group)
+        collapsed.append((document, distance))
+    return collapsed
+
+
+def query_chunks(db, query_vector: List[float], n_results: int, where: Optional[Dict[str, Any]] = None) -> List[Tuple[Document, float]]:
+    """The `n_results` chunks closest to `query_vector` (optionally filtered by `where`) with their ids and distances."""
+    results = db._collection.query(
+        query_embeddings=[query_vector], n_results=n_results, where=where,
+        include=["documents", "metadatas", "distances"],
+    )
+    return [
+        (Document(id=chunk_id, page_content=text, metadata=metadata or {}), distance)
+        for chunk_id, text, metadata, distance in zip(results["ids"][0], results["documents"][0], results["metadatas"][0], results["distances"][0])
+    ]
+
+
+def retrieve_chunks(db, query_vector: List[float], k: int = TARGET_SOURCE_CHUNKS) -> List[Tuple[Document, float]]:
+    """
+    Returns the `k` chunks closest to `query_vector` with their distances (closest
+    first), with linked near-duplicates collapsed so the LLM sees diverse context.
+    With TWO_TIER_RETRIEVAL, the DOCUMENT_CANDIDATES closest documents are picked from
+    the document-level index first, and only their chunks are searched (in one query),
+    keeping at most MAX_CHUNKS_PER_DOCUMENT chunks per document. Falls back to a flat
+    search over all chunks while the document index is empty.
+    """
+    overfetch = DEDUP_OVERFETCH if DEDUP_MODE == "link" else 1
+    sources = []
+    if TWO_TIER_RETRIEVAL:
+        with stage_timer("query", "document_search"):
+            document_index = get_document_index(db._collection.name)
+            candidates = document_index.query(query_embeddings=[query_vector], n_results=DOCUMENT_CANDIDATES, include=["metadatas"])
+            sources = [metadata["source"] for metadata in candidates["metadatas"][0] if metadata and metadata.get("source")]
+
+    if not sources:
+        with stage_timer("query", "vector_search"):
+            return collapse_duplicates(query_chunks(db, query_vector, k * overfetch))[:k]
+
+    with stage_timer("query", "vector_search"):
+        # One search over the chunks of all candidates; the cap is applied to its results
+        n_results = len(sources) * MAX_CHUNKS_PER_DOCUMENT * overfetch
+        hits = query_chunks(db, query_vector, n_results, where={"source": {"$in": sources}})
+        capped = cap_per_document(hits)
+        if len(capped) < k and len(hits) == n_results:
+            # A few documents took most of the results; search the others once more
+            counts = Counter(chunk.metadata.get("source") for chunk, _ in capped)
+            others = [source for source in sources if counts[source] < MAX_CHUNKS_PER_DOCUMENT]
+            if others:
+                seen = {chunk.id for chunk, _ in hits}
+                more = query_chunks(db, query_vector, len(others) * MAX_CHUNKS_PER_DOCUMENT * overfetch, where={"source": {"$in": others}})
+                hits = sorted(hits + [hit for hit in more if hit[0].id not in seen], key=lambda hit: hit[1])
+                capped = cap_per_document(hits)
+    return capped[:k]
+
+
+def cap_per_document(hits: List[Tuple[Document, float]]) -> List[Tuple[Document, float]]:
+    """Collapses near-duplicates and keeps the MAX_CHUNKS_PER_DOCUMENT closest chunks of each document (`hits` closest first)."""
+    per_source = Counter()
+    capped = []
+    for chunk, distance in collapse_duplicates(hits):
+        source = chunk.metadata.get("source")
+        per_source[source] += 1
+        if per_source[source] <= MAX_CHUNKS_PER_DOCUMENT:
+            capped.append((chunk, distance))
+    return capped
+
+
+# --- Source References ---
+# Responses carry a compact reference per source chunk instead of its full text and
+# metadata; the full chunk is fetched by id (`get_chunk`) only when a user expands it.
+
+# Frequent question words that would otherwise be highlighted everywhere
+SNIPPET_STOP_WORDS = {
+    "the", "and", "for", "are", "was", "were", "what", "which", "who", "whom", "how", "why", "when", "where",
+    "does", "did", "has", "have", "had", "with", "this", "that", "these", "those", "from", "about", "into", "not", "can",
+}
+
+def _query_terms(query: str) -> List[str]:
+    """Lower-cased words of the query worth highlighting (any script, at least 3 characters)."""
+    terms = {term for term in re.findall(r"\w{3,}", query.lower()) if term not in SNIPPET_STOP_WORDS}
+    return sorted(terms, key=len, reverse=True)
+
+def make_snippet(text: str, query: str, length: int = SOURCE_SNIPPET_CHARS) -> Tuple[str, List[Tuple[int, int]]]:
+    """
+    Returns the window of `text` (about `length` characters) with the most query term
+    matches, and the [start, end) offsets of those matches within the snippet.
+    """
+    lowered = text.lower()
+    matches = []
+    for term in _query_terms(query):
+        # Matches at word starts, so "revenue" also marks "revenues" but "the" never marks "other"
+        matches.extend((m.start(), m.end()) for m in re.finditer(r"\b" + re.escape(term), lowered))
+    matches.sort()
+    start = 0
+    if matches and len(text) > length:
+        # Start a little before the match that begins the densest window
+        best = max(range(len(matches)), key=lambda i: sum(1 for m in matches[i:] if m[1] <= matches[i][0] + length))
+        start = max(0, matches[best][0] - length // 5)
+        space = text.rfind(" ", 0, start)
+        start = space + 1 if space != -1 and start - space < 20 else start
+    end = min(len(text), start + length)
+    snippet = text[start:end]
+    highlights = []
+    for match_start, match_end in matches:
+        if match_start >= start and match_end <= end and (not highlights or match_start - start >= highlights[-1][1]):
+            highlights.append((match_start - start, match_end - start))
+    prefix = "…" if start > 0 else ""
+    if prefix:
+        highlights = [(a + 1, b + 1) for a, b in highlights]
+    return prefix + snippet + ("…" if end < len(text) else ""), highlights
+
+def source_reference(document: Document, distance: float, query: str) -> Dict[str, Any]:
+    """Compact description of a source chunk for responses; the full text is served by `/chunk/{id}`."""
+    source = document.metadata.get("source", "")
+    snippet, highlights = make_snippet(document.page_content, query)
+    return {
+        "id": document.id,
+        "source": source,
+        "document": os.path.basename(source),
+        "page": document.metadata.get("page"),
+        # Higher is closer: 1 for an exact match, towards 0 as the distance grows
+        "score": round(1.0 / (1.0 + distance), 4),
+        "snippet": snippet,
+        "highlights": highlights,
+    }
+
+
+def _load_chunk(version: str, chunk_id: str) -> Optional[Dict[str, Any]]:
+    # The bare collection: looking up an id needs no embedding model
+    try:
+        collection = get_chroma_client().get_collection(version)
+    except Exception: # Not created yet, or deleted meanwhile
+        return None
+    stored = collection.get(ids=[chunk_id], include=["documents", "metadatas"])
+    if not stored["ids"]:
+        return None
+    return {"id": chunk_id, "page_content": stored["documents"][0], "metadata": stored["metadatas"][0] or {}}
+
+def get_chunk(chunk_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Full text and metadata of a source chunk, looked up in the active store version
+    first and then in the others (an answer may predate a reindex). Nothing is cached,
+    so the chunks of a deleted document are gone at once (in every worker).
+    """
+    versions = list_versions()
+    names = [versions["active"]] + [name for name, details in versions["versions"].items()
+                                     if name != versions["active"] and details.get("status", "ready") == "ready"]
+    for version in names:
+        chunk = _load_chunk(version, chunk_id)
+        if chunk is not None:
+            return chunk
+    return None
+
+
+async def condense_question(session: ChatSession, query: str, user: str, priority: str, deadline: Optional[float]) -> str:
+    """Rewrites a follow-up question into a standalone question suitable for retrieval."""
+    prompt = condense_prompt.format(history=session.history_text(), question=query)
+    with stage_timer("query", "condense_question"):
+        result = await llm_scheduler.run(
+            lambda: ollama_client.generate(prompt, options={"temperature": 0, "num_predict": 128}),
+            priority=priority, user=user, deadline=deadline,
+        )
+    standalone = (result.get("response") or "").strip()
+    return standalone or query
+
+
 # --- Core QA Function for API ---
-def get_answer_from_privateGPT(query: str):
+async def aget_answer_from_privateGPT(
+    query: str,
+    user: str = "anonymous",
+    priority: str = PRIORITY_INTERACTIVE,
+    deadline: Optional[float] = None,
+    session_id: Optional[str] = None,
+):
     """
     Processes a user query against the loaded documents using a private LLM.
     Returns the answer and source documents.
+    Embedding and vector search run in a worker thread, and the LLM is called through
+    the shared, pooled Ollama client, so the event loop is never blocked.
+    The LLM call waits for a slot from the scheduler under `priority`, counted
+    against `user` for fairness, and is abandoned once `deadline` (a
+    `time.monotonic()` value) has passed.
+    With a `session_id`, the query is answered as the next turn of that conversation
+    and the response includes the `session_id`.
     """
+    if not session_id:
+        return await _answer_query(query, user, priority, deadline, session=None)
+
+    session = session_store.get_or_create(session_id)
+    async with session.lock:
+        response = await _answer_query(query, user, priority, deadline, session=session)
+        if session_store.shared:
+            await asyncio.to_thread(session_store.save, session)
+    if "error" not in response:
+        response["session_id"] = session.session_id
+    return response
+
+async def _answer_query(
+    query: str,
+    user: str,
+    priority: str,
+    deadline: Optional[float],
+    session: Optional[ChatSession],
+):
+    if MODEL_TYPE != "Ollama":
+        return {"error": f"Model type '{MODEL_TYPE}' not supported for API integration."}
+
     # 1. Initialize Embeddings
     try:
-        # Force device to 'cpu' as specified in your original code
-        embeddings = HuggingFaceEmbeddings(
-            model_name=EMBEDDINGS_MODEL_NAME,
-            model_kwargs={'device': 'cpu'
-            }
-        )
+        with stage_timer("query", "init_embeddings"):
+            # Shared instance of the active store version's model, loaded once (normally during server warm-up)
+            await asyncio.to_thread(get_embeddings)
     except Exception as e:
         print(f"\n--- ERROR: Failed to initialize HuggingFaceEmbeddings: {e}", file=sys.stderr)
         return {"error": f"Failed to initialize embeddings: {e}. Check EMBEDDINGS_MODEL_NAME or internet connection."}
 
     # 2. Load Chroma DB
     try:
-        db = Chroma(
-            persist_directory=PERSIST_DIRECTORY,
-            embedding_function=embeddings,
-            # Use CHROMA_SETTINGS from constants
-        )
-        retriever = db.as_retriever(search_kwargs={"k": TARGET_SOURCE_CHUNKS})
+        with stage_timer("query", "load_vectorstore"):
+            db = await asyncio.to_thread(get_vectorstore)
+        # The store's own embeddings: the query stays on one version even if a reindex swaps versions meanwhile
+        embeddings = db.embeddings
     except Exception as e:
         print(f"\n--- ERROR: Failed to load Chroma DB or initialize retriever: {e}", file=sys.stderr)
         return {"error": f"Failed to load document database: {e}. Ensure documents are ingested."}
 
+    # 3. Retrieve, assemble the prompt and generate. These are the same steps the
+    # "stuff" RetrievalQA chain performs, run one by one so each stage can be timed.
+    try:
+        # Follow-up questions ("and what about 2023?") are made standalone before retrieval
+        retrieval_query = query
+        if session is not None and session.turns:
+            retrieval_query = await condense_question(session, query, user, priority, deadline)
 
-    # 3. Initialize LLM (Ollama)
-    llm = None
-    if MODEL_TYPE == "Ollama":
-        try:
-            llm = Ollama(
-                model=OLLAMA_MODEL_NAME,
-                temperature=TEMPERATURE,
-                num_ctx=MODEL_N_CTX,
-                num_predict=MAX_NEW_TOKENS
-            )
-        except Exception as e:
-            print(f"\n--- ERROR: Failed to initialize Ollama LLM: {e}", file=sys.stderr)
-            return {"error": f"Failed to load Ollama model '{OLLAMA_MODEL_NAME}': {e}. Is Ollama server running and model pulled?"}
-    else:
-        return {"error": f"Model type '{MODEL_TYPE}' not supported for API integration."}
-
-    if llm is None:
-        return {"error": "LLM failed to initialize."}
-
-    # 4. Define Prompt Template
-    custom_template = """Use the following pieces of context to answer the user's question.
-    If you don't know the answer, just say that you don't know, don't try to make up an answer.
-
-    {context}
-
-    Question: {question}
-    Helpful Answer:"""
-
-    custom_prompt = PromptTemplate(
-        template=custom_template,
-        input_variables=["context", "question"]
-    )
-
-    # 5. Create RetrievalQA Chain
-    qa = RetrievalQA.from_chain_type(
-        llm=llm,
-        chain_type="stuff",
-        retriever=retriever,
-        return_source_documents=not HIDE_SOURCE_DOCUMENTS, # Use HIDE_SOURCE_DOCUMENTS from constants
-        chain_type_kwargs={"prompt": custom_prompt}
-    )
+        with stage_timer("query", "embed_query"):
+            query_vector = await asyncio.to_thread(embeddings.embed_query, retrieval_query)
+        source_hits = await asyncio.to_thread(retrieve_chunks, db, query_vector)
+        with stage_timer("query", "prompt_assembly"):
+            context = "\n\n".join(doc.page_content for doc, _ in source_hits)
+            llm_context = None
+            if session is None:
+                prompt = custom_prompt.format(context=context, question=query)
+            else:
+                prompt = followup_prompt.format(context=context, question=query)
+                # Reuse the previous turn's evaluated context while it still fits the window
+                if session.ollama_context and len(session.ollama_context) + count_tokens(prompt) + MAX_NEW_TOKENS <= MODEL_N_CTX:
+                    llm_context = session.ollama_context.tolist()
+                else:
+                    # Start over from the compact history, dropping the oldest turns until it fits
+                    max_turns = len(session.turns)
+                    while True:
+                        prompt = session_prompt.format(history=session.history_text(max_turns) or "(none)", context=context, question=query)
+                        if max_turns == 0 or count_tokens(prompt) + MAX_NEW_TOKENS <= MODEL_N_CTX:
+                            break
+                        max_turns -= 1
 
-    # 6. Invoke QA Chain and Process Result
-    try:
-        res = qa.invoke({"query": query})
-        answer = res.get('result', "No answer found.")
-        source_documents = res.get('source_documents', [])
+        # Ollama reports load / prompt-eval / eval durations, recorded by the client
+        llm_result = await llm_scheduler.run(
+            lambda: ollama_client.generate(prompt, context=llm_context), priority=priority, user=user, deadline=deadline
+        )
+        answer = llm_result.get("response") or "No answer found."
+        if session is not None:
+            session.add_turn(query, answer, llm_result.get("context"))
 
-        # Format source documents for easier frontend consumption
+        # Compact source references; the frontend fetches a chunk's full text from /chunk/{id} on demand
         formatted_sources = []
         if not HIDE_SOURCE_DOCUMENTS:
-            for doc in source_documents:
-                # Ensure doc is a Document object and has metadata/page_content
-                if isinstance(doc, Document):
-                    formatted_sources.append({
-                        "page_content": doc.page_content,
-                        "metadata": doc.metadata
-                    })
-                else:
-                    # Handle cases where `doc` might not be a Document object (unlikely if LangChain works)
-                    print(f"Warning: Unexpected source document type: {type(doc)}", file=sys.stderr)
-                    formatted_sources.append({"page_content": str(doc), "metadata": {}})
+            with stage_timer("query", "format_sources"):
+                formatted_sources = [source_reference(doc, distance, query) for doc, distance in source_hits]
 
 
         return {
             "answer": answer,
-            "source_documents": formatted_sources
+            "source_documents": formatted_sources,
+            # Token counts reported by Ollama (the prompt count excludes a reused session context)
+            "usage": {"prompt_tokens": llm_result.get("prompt_eval_count"), "completion_tokens": llm_result.get("eval_count")},
         }
 
+    except DeadlineExceeded as e:
+        print(f"\n--- ERROR: {e}", file=sys.stderr)
+        return {"error": f"The server is busy and the query could not be answered in time: {e}"}
+    except OllamaUnavailableError as e:
+        print(f"\n--- ERROR: {e}", file=sys.stderr)
+        return {"error": f"Ollama is currently unavailable: {e}"}
+    except OllamaError as e:
+        print(f"\n--- ERROR: Ollama request failed: {e}", file=sys.stderr)
+        if "llama runner process has terminated" in str(e) or "context window" in str(e).lower():
+            return {"error": f"Ollama model might have crashed or exceeded context window. Try a shorter query or increase MODEL_N_CTX/reduce MAX_NEW_TOKENS in .env. Original error: {e}"}
+        return {"error": f"Failed to get an answer from Ollama model '{OLLAMA_MODEL_NAME}': {e}. Is Ollama server running and model pulled?"}
     except Exception as e:
         # Catch specific Ollama crash error if it occurs frequently
         error_message = str(e)
@@ -138,51 +413,171 @@ def get_answer_from_privateGPT(query: str):
         print(f"\n--- ERROR: An unexpected error occurred during query processing: {e}", file=sys.stderr)
         return {"error": f"An unexpected error occurred during query processing: {e}"}
 
+def get_answer_from_privateGPT(query: str):
+    """Synchronous wrapper around `aget_answer_from_privateGPT` for scripts and the command line."""
+    return asyncio.run(aget_answer_from_privateGPT(query))
 
-# --- Original command-line main function (optional, removed for API) ---
-# Removed the `main()` function with `argparse` and `while True` loop
-# This file now acts as a module providing `get_answer_from_privateGPT`
 
-# If you still want a CLI entry point for testing, you can add a simplified one:
-if __name__ == "__main__":
-    # This block will only run if privateGPT.py is executed directly.
-    # It provides a simple command-line interface for testing the function.
+# --- Bulk Queries ---
+def read_batch_queries(input_path: str) -> List[Dict[str, Any]]:
+    """
+    Reads a JSONL file of queries: one JSON object per line with a "query" (and an
+    optional "id"), or a bare JSON string. Blank lines are skipped; every query keeps
+    its line number, which identifies it when a run is resumed.
+    """
+    queries = []
+    with open(input_path, "r", encoding="utf8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if isinstance(item, str):
+                item = {"query": item}
+            if not isinstance(item, dict) or not item.get("query"):
+                raise ValueError(f"{input_path}:{line_number}: expected a JSON object with a 'query' or a JSON string.")
+            queries.append({"line": line_number, "id": item.get("id"), "query": item["query"]})
+    return queries
+
+def completed_batch_lines(output_path: str) -> Set[int]:
+    """
+    Line numbers of the queries already answered in an earlier run's output. Failed
+    queries are not counted, so they run again; lines that are not answer records are
+    ignored. A last line cut off by an interruption is removed from the file, and a
+    complete last line without its newline gets one, so appended answers start on a
+    line of their own.
+    """
+    if not os.path.exists(output_path):
+        return set()
+    completed = set()
+    valid_length = 0
+    ends_with_newline = True
+    with open(output_path, "rb") as f:
+        for line in f:
+            if line.strip():
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                if isinstance(record, dict) and isinstance(record.get("line"), int) and "error" not in record:
+                    completed.add(record["line"])
+            valid_length += len(line)
+            ends_with_newline = line.endswith(b"\n")
+    with open(output_path, "r+b") as f:
+        f.truncate(valid_length)
+        if not ends_with_newline:
+            f.seek(valid_length)
+            f.write(b"\n")
+    return completed
+
+async def run_batch(input_path: str, output_path: str, concurrency: int = 4, resume: bool = False, hide_source: bool = False) -> Dict[str, int]:
+    """
+    Answers every query of `input_path` with the engine loaded once, `concurrency`
+    queries at a time (LLM calls are further limited by LLM_MAX_CONCURRENCY). Results
+    are appended to `output_path` as JSONL as soon as each query finishes, so with
+    `resume` an interrupted run continues with the queries that have no answer yet.
+    """
+    queries = read_batch_queries(input_path)
+    completed = completed_batch_lines(output_path) if resume else set()
+    pending = [item for item in queries if item["line"] not in completed]
+    print(f"Batch: {len(queries)} queries, {len(queries) - len(pending)} already answered, {len(pending)} to run with concurrency {concurrency}.")
+
+    # The embedding model and the vector store are loaded once, before the first query
+    await asyncio.to_thread(lambda: get_vectorstore().embeddings.embed_query("warm-up"))
+
+    counts = {"answered": 0, "failed": 0}
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    started = time.perf_counter()
+    with open(output_path, "a" if resume else "w", encoding="utf8") as output:
+        async def answer(item: Dict[str, Any]) -> None:
+            async with semaphore:
+                query_started = time.perf_counter()
+                with collect_timings() as timings:
+                    # Nothing else runs in this process, so the queries may use every LLM slot
+                    result = await aget_answer_from_privateGPT(item["query"], user="batch")
+                record = {**item, "seconds": round(time.perf_counter() - query_started, 4)}
+                stage_seconds: Dict[str, float] = {}
+                for stage, seconds in timings:
+                    stage_seconds[stage] = round(stage_seconds.get(stage, 0.0) + seconds, 4)
+                record["timings"] = stage_seconds
+                if "error" in result:
+                    record["error"] = result["error"]
+                    counts["failed"] += 1
+                else:
+                    record["answer"] = result["answer"]
+                    record["source_documents"] = [] if hide_source else result["source_documents"]
+                    record["usage"] = result.get("usage")
+                    counts["answered"] += 1
+                # Whole lines, flushed at once: an interruption loses at most the queries in flight
+                output.write(json.dumps(record, ensure_ascii=False) + "\n")
+                output.flush()
+                done = counts["answered"] + counts["failed"]
+                if done % 10 == 0 or done == len(pending):
+                    print(f"Batch: {done}/{len(pending)} done ({counts['failed']} failed), {time.perf_counter() - started:.1f}s elapsed.")
+
+        try:
+            await asyncio.gather(*(answer(item) for item in pending))
+        finally:
+            await ollama_client.aclose()
+    return {"queries": len(queries), "skipped": len(queries) - len(pending), **counts}
+
+
+# --- Command-line Interface ---
+async def interactive(hide_source: bool) -> None:
+    """Question/answer loop on one event loop, so the models and connections stay warm between questions."""
     print("Running privateGPT in standalone query mode. Type 'exit' to quit.")
-    from argparse import ArgumentParser # Import locally for this block
+    try:
+        while True:
+            query = await asyncio.to_thread(input, "\nEnter a query (exit to quit): ")
+            if query.lower() == "exit":
+                print("Exiting privateGPT standalone query mode.")
+                break
 
-    parser = ArgumentParser(description='privateGPT: Query documents via command line for testing.')
-    parser.add_argument("--hide-source", "-S", action='store_true',
-                            help='Use this flag to disable printing of source documents used for answers.')
-    args = parser.parse_args()
+            print("Processing your query... Please wait.")
+            result = await aget_answer_from_privateGPT(query)
+
+            if "error" in result:
+                print(f"\nError: {result['error']}")
+            else:
+                print("\n\n> Question:")
+                print(query)
+                print("\n> Answer:")
+                print(result['answer'])
+
+                if not hide_source and result.get('source_documents'):
+                    print("\n> Sources:")
+                    for i, source in enumerate(result['source_documents']):
+                        source_filename = source["document"] or "Unknown Source"
+                        page = f", page {source['page'] + 1}" if isinstance(source.get("page"), int) else ""
+                        print(f"\n  Source {i+1} ({source_filename}{page}, score {source['score']}):")
+                        print(source['snippet'])
+    finally:
+        await ollama_client.aclose()
 
-    # Temporarily override HIDE_SOURCE_DOCUMENTS for CLI testing if flag is used
-    if args.hide_source:
-        HIDE_SOURCE_DOCUMENTS_CLI = True # Create a local override
+
+def main():
+    args = parse_arguments()
+    hide_source = args.hide_source or HIDE_SOURCE_DOCUMENTS
+    if args.batch:
+        result = asyncio.run(run_batch(args.batch, args.output, args.concurrency, args.resume, hide_source))
+        print(f"Batch result: {result}")
     else:
-        HIDE_SOURCE_DOCUMENTS_CLI = HIDE_SOURCE_DOCUMENTS # Use global constant
-
-    while True:
-        query = input("\nEnter a query (exit to quit): ")
-        if query.lower() == "exit":
-            print("Exiting privateGPT standalone query mode.")
-            break
-
-        print("Processing your query... Please wait.")
-        result = get_answer_from_privateGPT(query)
-
-        if "error" in result:
-            print(f"\nError: {result['error']}")
-        else:
-            print("\n\n> Question:")
-            print(query)
-            print("\n> Answer:")
-            print(result['answer'])
-
-            if not HIDE_SOURCE_DOCUMENTS_CLI and result.get('source_documents'):
-                print("\n> Sources:")
-                for i, doc in enumerate(result['source_documents']):
-                    source_path = doc['metadata'].get("source", "Unknown Source")
-                    # Clean up path to show just the filename if it's a long path
-                    source_filename = os.path.basename(source_path)
-                    print(f"\n  Source {i+1} ({source_filename}):")
-                    print(doc['page_content'])
\ No newline at end of file
+        asyncio.run(interactive(hide_source))
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='privateGPT: Query documents via command line, interactively or in bulk.')
+    parser.add_argument("--hide-source", "-S", action='store_true',
+                        help='Use this flag to disable printing of source documents used for answers.')
+    parser.add_argument("--batch", metavar="QUERIES.jsonl",
+                        help='Answer the queries of a JSONL file (one {"id": ..., "query": ...} object per line) instead of asking interactively.')
+    parser.add_argument("--output", "-o", default="answers.jsonl",
+                        help='JSONL file the batch answers, sources, timings and token counts are written to (default: answers.jsonl).')
+    parser.add_argument("--concurrency", "-c", type=int, default=4,
+                        help='Number of batch queries processed at once (default: 4).')
+    parser.add_argument("--resume", action='store_true',
+                        help='Keep the answers already in --output and only run the queries without one.')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main()
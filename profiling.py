@@ -0,0 +1,200 @@
+import os
+import sys
+import json
+import time
+import uuid
+import threading
+import datetime
+import sysconfig
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from constants import PROFILE_DIRECTORY, PROFILE_SAMPLE_INTERVAL_MS, PROFILE_MAX_STORED
+
+
+# Library groups reported in the per-profile breakdown. A sample counts towards a
+# group when any frame of its stack lives in one of the listed packages.
+LIBRARY_GROUPS = {
+    "langchain": ("langchain", "langchain_core", "langchain_community", "langchain_chroma", "langchain_huggingface", "langchain_text_splitters"),
+    "embedding_model": ("sentence_transformers", "transformers", "torch", "tokenizers"),
+    "chroma": ("chromadb",),
+    "http": ("httpx", "httpcore", "requests", "urllib3", "http"),
+    "document_loaders": ("unstructured", "fitz", "pymupdf", "pypdf"),
+}
+
+# Innermost frames that mean a thread is idle (waiting for work or I/O readiness)
+_IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+}
+
+
+_STDLIB_PREFIX = sysconfig.get_paths()["stdlib"] + os.sep
+
+def _frame_module(filename: str) -> str:
+    """Turns a source path into a short module-like label (site-packages / stdlib prefix stripped)."""
+    marker = "site-packages" + os.sep
+    if marker in filename:
+        filename = filename.split(marker, 1)[1]
+    elif filename.startswith(_STDLIB_PREFIX):
+        filename = filename[len(_STDLIB_PREFIX):]
+    elif not filename.startswith("<"):
+        filename = os.path.relpath(filename)
+    return filename.replace(os.sep, "/")
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    # ';' separates frames in the folded format, so it must not appear in labels
+    return f"{code.co_name} ({_frame_module(code.co_filename)})".replace(";", ":")
+
+
+class SamplingProfiler:
+    """
+    Wall-clock sampling profiler. A background thread periodically captures the
+    stack of every other thread and aggregates them as "folded" stacks, the input
+    format of flamegraph.pl, speedscope and inferno.
+    Profiles cover the whole process, not one request: async requests share the event
+    loop thread and the worker thread pools, so their work cannot be told apart by
+    thread. Every stack starts with its thread's name, and work of other requests
+    running at the same time is included.
+    """
+    def __init__(self, interval_ms: float = PROFILE_SAMPLE_INTERVAL_MS):
+        self.interval = interval_ms / 1000.0
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started_at: Optional[float] = None
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="privategpt-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.perf_counter() - self.started_at
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.is_set():
+            thread_names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in _IDLE_FRAMES:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(thread_names.get(thread_id, f"thread-{thread_id}"))
+                self.stacks[";".join(reversed(stack))] += 1
+                self.samples += 1
+            self._stop.wait(self.interval)
+
+    def folded(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + "\n"
+
+    def breakdown(self) -> Dict[str, float]:
+        """Share of samples (0-1) that were inside each library group."""
+        totals = {group: 0 for group in LIBRARY_GROUPS}
+        for stack, count in self.stacks.items():
+            modules = {label.rsplit("(", 1)[-1].split("/", 1)[0] for label in stack.split(";")}
+            for group, packages in LIBRARY_GROUPS.items():
+                if modules.intersection(packages):
+                    totals[group] += count
+        return {group: round(total / self.samples, 4) if self.samples else 0.0 for group, total in totals.items()}
+
+
+# --- Profile Storage ---
+def new_profile_id() -> str:
+    return uuid.uuid4().hex
+
+def _profile_paths(profile_id: str):
+    return (os.path.join(PROFILE_DIRECTORY, f"{profile_id}.folded"),
+            os.path.join(PROFILE_DIRECTORY, f"{profile_id}.json"))
+
+def is_valid_profile_id(profile_id: str) -> bool:
+    return len(profile_id) == 32 and all(c in "0123456789abcdef" for c in profile_id)
+
+def save_profile(profile_id: str, profiler: SamplingProfiler, kind: str, description: str) -> Dict:
+    """Stores the folded stacks and a JSON summary under `profile_id`."""
+    os.makedirs(PROFILE_DIRECTORY, exist_ok=True)
+    folded_path, meta_path = _profile_paths(profile_id)
+    with open(folded_path, "w", encoding="utf8") as f:
+        f.write(profiler.folded())
+    summary = {
+        "profile_id": profile_id,
+        "kind": kind,
+        "description": description,
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "duration_seconds": round(profiler.duration, 4),
+        "samples": profiler.samples,
+        "sample_interval_ms": profiler.interval * 1000,
+        "scope": "process", # Every thread of the process, including other concurrent requests
+        "breakdown": profiler.breakdown(),
+    }
+    with open(meta_path, "w", encoding="utf8") as f:
+        json.dump(summary, f)
+    _prune_profiles()
+    return summary
+
+def _prune_profiles() -> None:
+    """Keeps only the newest PROFILE_MAX_STORED profiles on disk."""
+    metas = sorted(
+        (os.path.join(PROFILE_DIRECTORY, name) for name in os.listdir(PROFILE_DIRECTORY) if name.endswith(".json")),
+        key=os.path.getmtime,
+        reverse=True,
+    )
+    for meta_path in metas[PROFILE_MAX_STORED:]:
+        for path in _profile_paths(os.path.basename(meta_path)[:-len(".json")]):
+            if os.path.exists(path):
+                os.remove(path)
+
+def list_profiles() -> List[Dict]:
+    if not os.path.exists(PROFILE_DIRECTORY):
+        return []
+    profiles = []
+    for name in os.listdir(PROFILE_DIRECTORY):
+        if name.endswith(".json"):
+            with open(os.path.join(PROFILE_DIRECTORY, name), encoding="utf8") as f:
+                profiles.append(json.load(f))
+    return sorted(profiles, key=lambda p: p["created_at"], reverse=True)
+
+def get_profile_path(profile_id: str) -> Optional[str]:
+    """Returns the path of the folded-stacks file, or None if the profile does not exist."""
+    if not is_valid_profile_id(profile_id):
+        return None
+    folded_path, _ = _profile_paths(profile_id)
+    return folded_path if os.path.exists(folded_path) else None
+
+@contextmanager
+def profile_request(profile_id: Optional[str], kind: str, description: str = ""):
+    """
+    Profiles the process while the enclosed block runs when `profile_id` is set, and
+    stores the result under that id (see SamplingProfiler on what is sampled).
+    With `profile_id=None` this is a no-op.
+    """
+    if profile_id is None:
+        yield
+        return
+    profiler = SamplingProfiler()
+    profiler.start()
+    try:
+        yield
+    finally:
+        profiler.stop()
+        try:
+            summary = save_profile(profile_id, profiler, kind, description)
+            print(f"Profiling: Stored {kind} profile {profile_id} ({summary['samples']} samples, {summary['duration_seconds']}s).")
+        except OSError as e:
+            print(f"Profiling: Failed to store profile {profile_id}: {e}", file=sys.stderr)
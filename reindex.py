@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+import os
+import sys
+import glob
+import datetime
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from constants import EMBEDDINGS_MODEL_NAME, SOURCE_DIRECTORY, REINDEX_WORKERS, REINDEX_BATCH_SIZE, CHUNK_SIZE, CHUNK_OVERLAP, CHUNK_SIZE_UNIT
+
+from langchain_core.documents import Document
+
+from metrics import stage_timer
+from vectorstore import (
+    get_vectorstore,
+    get_embeddings,
+    embeddings_max_seq_length,
+    active_version,
+    list_versions,
+    register_version,
+    activate_version,
+    rollback_version,
+    delete_version,
+    delete_documents,
+    store_write_lock,
+)
+from ingest import (
+    add_chunks_to_vectorstore, add_chunk_batches_to_vectorstore, load_single_document, get_text_splitter,
+    is_csv_file, ingest_csv_file, is_large_pdf, ingest_large_pdfs, LOADER_MAPPING,
+)
+
+
+# --- Blue-Green Reindexing ---
+# A reindex builds a complete new store version next to the live one, then activates
+# it by swapping the active-version pointer. Queries keep using the live version until
+# the swap and are never served from a half-built store. The old version is kept for
+# rollback until it is deleted.
+
+def new_version_name() -> str:
+    """A new, unused version name from the current UTC time (e.g. 'v20250101120000')."""
+    name = "v" + datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%d%H%M%S")
+    existing = list_versions()["versions"]
+    candidate, suffix = name, 1
+    while candidate in existing: # Two reindexes within the same second
+        suffix += 1
+        candidate = f"{name}_{suffix}"
+    return candidate
+
+
+def _stored_chunk_counts(version: str) -> Dict[str, int]:
+    """Number of chunks per source document in a store version (reads metadata only)."""
+    collection = get_vectorstore(version)._collection
+    counts: Dict[str, int] = {}
+    offset = 0
+    while True:
+        page = collection.get(include=["metadatas"], limit=10000, offset=offset)
+        if not page["ids"]:
+            return counts
+        for metadata in page["metadatas"]:
+            source = (metadata or {}).get("source")
+            counts[source] = counts.get(source, 0) + 1
+        offset += len(page["ids"])
+
+def _source_files() -> List[str]:
+    files: List[str] = []
+    for ext in LOADER_MAPPING:
+        files.extend(glob.glob(os.path.join(SOURCE_DIRECTORY, f"**/*{ext}"), recursive=True))
+    return sorted(set(files))
+
+def _batches(sources: List[str], counts: Dict[str, int]) -> List[List[str]]:
+    """
+    Groups sources into batches of about REINDEX_BATCH_SIZE chunks, never splitting a
+    source; a source with more chunks is a batch by itself (and is written page by page).
+    """
+    batches: List[List[str]] = []
+    current: List[str] = []
+    current_size = 0
+    for source in sources:
+        if current and current_size + counts.get(source, 1) > REINDEX_BATCH_SIZE:
+            batches.append(current)
+            current, current_size = [], 0
+        current.append(source)
+        current_size += counts.get(source, 1)
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _chunks_from_store(live_version: str, sources: List[str]) -> Iterator[List[Document]]:
+    """
+    The stored chunk text and metadata of these sources, without re-parsing or re-splitting,
+    REINDEX_BATCH_SIZE chunks at a time so a document with many chunks is never read at once.
+    """
+    collection = get_vectorstore(live_version)._collection
+    where = {"source": sources[0]} if len(sources) == 1 else {"source": {"$in": sources}}
+    offset = 0
+    while True:
+        stored = collection.get(where=where, include=["documents", "metadatas"], limit=REINDEX_BATCH_SIZE, offset=offset)
+        if not stored["ids"]:
+            return
+        chunks = []
+        for text, metadata in zip(stored["documents"], stored["metadatas"]):
+            # Near-duplicate links are recomputed for the new version
+            metadata = {key: value for key, value in (metadata or {}).items() if key != "dedup_group"}
+            chunks.append(Document(page_content=text, metadata=metadata))
+        yield chunks
+        offset += len(stored["ids"])
+
+def _rechunk_files(target, embeddings, file_paths: List[str], stats: Dict[str, int], model_name: str) -> int:
+    """
+    Re-splits the files into `target` with the current chunking settings, counting tokens
+    with the tokenizer of its embedding model `model_name` and capping chunks at what that
+    model reads; parsed text comes from the parsed-text cache. CSV files and large PDFs are
+    streamed batch by batch as at ingestion; a file that fails is skipped (a streamed one is
+    also removed from `target` again). Returns the number of chunks written.
+    """
+    written = 0
+    documents: List[Document] = []
+    large_pdfs: List[str] = []
+    for path in file_paths:
+        try:
+            if is_csv_file(path): # Chunked by rows, as at ingestion
+                written += ingest_csv_file(target, embeddings, path, stats, model_name=model_name)[0]
+            elif is_large_pdf(path): # Parsed in page ranges, as at ingestion
+                large_pdfs.append(path)
+            else:
+                documents.extend(load_single_document(path))
+        except Exception as e:
+            print(f"Reindex: Skipping {path}: {type(e).__name__}: {e}", file=sys.stderr)
+            stats["failed_files"] = stats.get("failed_files", 0) + 1
+    if large_pdfs:
+        written += ingest_large_pdfs(target, embeddings, large_pdfs, stats, model_name=model_name)[0]
+    if documents:
+        splitter = get_text_splitter(embeddings_max_seq_length(model_name), model_name)
+        written += add_chunks_to_vectorstore(target, embeddings, splitter.split_documents(documents), stats)
+    return written
+
+
+def reindex(
+    embeddings_model: Optional[str] = None,
+    rechunk: bool = False,
+    activate: bool = True,
+    progress: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Builds a new store version with `embeddings_model` (EMBEDDINGS_MODEL_NAME by default).
+    Without `rechunk`, the live version's chunks are re-embedded as they are; with it,
+    the source files are split again with the current CHUNK_SIZE settings (their parsed
+    text is reused, so nothing is parsed again). Large documents are read and written in
+    batches of REINDEX_BATCH_SIZE chunks, CSV files of CSV_BATCH_ROWS rows and large PDFs
+    of PDF_PAGE_RANGE_SIZE pages, as at ingestion. Batches are embedded and written by
+    REINDEX_WORKERS threads. Documents ingested while the reindex runs are copied before
+    the swap. With `activate`, the new version becomes active once it is complete.
+    `progress` (if given) is updated in place.
+    """
+    progress = progress if progress is not None else {}
+    embeddings_model = embeddings_model or EMBEDDINGS_MODEL_NAME
+    live_version = active_version()
+    version = new_version_name()
+    register_version(
+        version, embeddings_model, status="building", built_from=live_version,
+        chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, chunk_size_unit=CHUNK_SIZE_UNIT if rechunk else None,
+    )
+    progress.update({"stage": "preparing", "version": version, "sources_done": 0, "chunks": 0})
+    print(f"Reindex: Building store version '{version}' from '{live_version}' with {embeddings_model} (rechunk={rechunk}).")
+
+    target = get_vectorstore(version)
+    embeddings = get_embeddings(embeddings_model)
+    stats: Dict[str, int] = {}
+    done_sources: Set[str] = set()
+
+    def build_batch(sources: List[str]) -> Tuple[int, Dict[str, int], List[str]]:
+        batch_stats: Dict[str, int] = {}
+        if rechunk:
+            written = _rechunk_files(target, embeddings, sources, batch_stats, embeddings_model)
+        else:
+            written = add_chunk_batches_to_vectorstore(target, embeddings, _chunks_from_store(live_version, sources), batch_stats)
+        # Batches finish one at a time on the calling thread (see `run_batches`), so no lock is needed
+        return written, batch_stats, sources
+
+    def run_batches(sources: List[str], counts: Dict[str, int]) -> None:
+        with ThreadPoolExecutor(max_workers=max(1, REINDEX_WORKERS)) as executor:
+            for written, batch_stats, batch_sources in executor.map(build_batch, _batches(sources, counts)):
+                progress["chunks"] += written
+                progress["sources_done"] += len(batch_sources)
+                done_sources.update(batch_sources)
+                for key, value in batch_stats.items():
+                    stats[key] = stats.get(key, 0) + value
+
+    def pending_sources():
+        counts = {path: 1 for path in _source_files()} if rechunk else _stored_chunk_counts(live_version)
+        return [source for source in counts if source and source not in done_sources], counts
+
+    try:
+        with stage_timer("reindex", "build"):
+            sources, counts = pending_sources()
+            progress.update({"stage": "building", "sources_total": len(sources)})
+            run_batches(sources, counts)
+
+        # Ingestion is held off only while the documents added during the build are copied
+        with stage_timer("reindex", "catch_up"), store_write_lock:
+            sources, counts = pending_sources()
+            progress.update({"stage": "catching_up", "sources_total": progress["sources_total"] + len(sources)})
+            run_batches(sources, counts)
+            # Documents deleted during the build must not come back with the new version
+            removed = sorted(done_sources - set(counts))
+            if removed:
+                delete_documents(removed, version)
+                done_sources.difference_update(removed)
+                progress["chunks"] = target._collection.count()
+            register_version(version, embeddings_model, status="ready", documents=len(done_sources), chunks=progress["chunks"], **stats)
+            if activate:
+                activate_version(version)
+    except BaseException as e:
+        register_version(version, embeddings_model, status="failed", error=str(e))
+        raise
+
+    progress["stage"] = "done"
+    print(f"Reindex: Store version '{version}' is ready ({len(done_sources)} documents, {progress['chunks']} chunks)"
+          + (" and active." if activate else "."))
+    return {"version": version, "previous_version": live_version, "documents": len(done_sources), "chunks": progress["chunks"],
+            "activated": activate, **stats}
+
+
+def main():
+    args = parse_arguments()
+    if args.list:
+        versions = list_versions()
+        for name, details in versions["versions"].items():
+            marker = "*" if name == versions["active"] else " "
+            print(f"{marker} {name}: {details}")
+    elif args.rollback:
+        print(f"Active store version is now '{rollback_version()}'.")
+    elif args.activate:
+        activate_version(args.activate)
+        print(f"Active store version is now '{args.activate}'.")
+    elif args.delete:
+        delete_version(args.delete)
+        print(f"Deleted store version '{args.delete}'.")
+    else:
+        result = reindex(args.embeddings_model, rechunk=args.rechunk, activate=not args.no_activate)
+        print(f"Reindex result: {result}")
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='reindex: Rebuild the vector store as a new version and swap it in atomically.')
+    parser.add_argument("--embeddings-model", default=None,
+                        help='Embedding model for the new version (default: EMBEDDINGS_MODEL_NAME).')
+    parser.add_argument("--rechunk", action='store_true',
+                        help='Split the source documents again with the current CHUNK_SIZE settings instead of reusing the stored chunks.')
+    parser.add_argument("--no-activate", action='store_true',
+                        help='Build the new version without making it active.')
+    parser.add_argument("--list", action='store_true', help='List the store versions.')
+    parser.add_argument("--activate", metavar="VERSION", help='Make an existing version active.')
+    parser.add_argument("--rollback", action='store_true', help='Re-activate the previous version.')
+    parser.add_argument("--delete", metavar="VERSION", help='Delete an inactive version and free its disk space.')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main()
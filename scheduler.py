@@ -0,0 +1,190 @@
+import time
+import asyncio
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from constants import LLM_MAX_CONCURRENCY, LLM_BATCH_MAX_CONCURRENCY, API_WORKERS
+from metrics import LLM_QUEUE_DEPTH, LLM_ACTIVE_REQUESTS, LLM_QUEUE_WAIT_SECONDS, LLM_SCHEDULED_TOTAL
+
+
+# Priority classes, served strictly in this order
+PRIORITY_INTERACTIVE = "interactive" # Chat queries from users waiting on an answer
+PRIORITY_BATCH = "batch" # Summarization, bulk query runs, other background work
+PRIORITIES = (PRIORITY_INTERACTIVE, PRIORITY_BATCH)
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request could not be completed before its deadline."""
+
+
+class _Ticket:
+    """A request waiting for (or holding) an LLM slot."""
+    __slots__ = ("priority", "user", "future", "enqueued_at")
+
+    def __init__(self, priority: str, user: str, future: asyncio.Future):
+        self.priority = priority
+        self.user = user
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+
+class LLMScheduler:
+    """
+    Admission control between the API and the LLM backend.
+
+    At most `max_concurrency` generations run at once (match it to Ollama's
+    OLLAMA_NUM_PARALLEL), and batch work never takes more than
+    `batch_max_concurrency` of those slots, so a slot is left for interactive
+    queries. Waiting requests are served by priority class; within a class, the
+    user holding the fewest slots goes first (round-robin on ties), so one user's
+    burst cannot starve the others.
+    Cancelling the awaiting task (e.g. because the client went away) removes a
+    queued request or aborts an in-flight one, and frees its slot.
+    """
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY, batch_max_concurrency: int = LLM_BATCH_MAX_CONCURRENCY):
+        self.max_concurrency = max(1, max_concurrency)
+        self.batch_max_concurrency = max(1, min(batch_max_concurrency, self.max_concurrency))
+        # priority -> user -> FIFO of tickets; the user order is the round-robin order
+        self._queues: Dict[str, "OrderedDict[str, Deque[_Ticket]]"] = {p: OrderedDict() for p in PRIORITIES}
+        self._active: Dict[str, int] = {p: 0 for p in PRIORITIES}
+        self._active_by_user: Dict[str, int] = {}
+
+    # --- Queue bookkeeping ---
+    def queue_depth(self, priority: Optional[str] = None) -> int:
+        priorities = [priority] if priority else PRIORITIES
+        return sum(len(tickets) for p in priorities for tickets in self._queues[p].values())
+
+    def active_count(self) -> int:
+        return sum(self._active.values())
+
+    def _update_gauges(self) -> None:
+        for priority in PRIORITIES:
+            LLM_QUEUE_DEPTH.set(self.queue_depth(priority), priority=priority)
+            LLM_ACTIVE_REQUESTS.set(self._active[priority], priority=priority)
+
+    def _enqueue(self, ticket: _Ticket) -> None:
+        self._queues[ticket.priority].setdefault(ticket.user, deque()).append(ticket)
+
+    def _remove(self, ticket: _Ticket) -> None:
+        users = self._queues[ticket.priority]
+        tickets = users.get(ticket.user)
+        if tickets and ticket in tickets:
+            tickets.remove(ticket)
+            if not tickets:
+                del users[ticket.user]
+
+    def _can_start(self, priority: str) -> bool:
+        if self.active_count() >= self.max_concurrency:
+            return False
+        return priority != PRIORITY_BATCH or self._active[PRIORITY_BATCH] < self.batch_max_concurrency
+
+    def _next_user(self, priority: str) -> str:
+        """The queued user holding the fewest slots; the first in round-robin order on ties."""
+        users = self._queues[priority]
+        return min(users, key=lambda user: self._active_by_user.get(user, 0))
+
+    def _dispatch(self) -> None:
+        """Grants free slots to waiting requests: highest priority first, fairly across users."""
+        for priority in PRIORITIES:
+            users = self._queues[priority]
+            while users and self._can_start(priority):
+                user = self._next_user(priority)
+                tickets = users[user]
+                ticket = tickets.popleft()
+                # Move the user to the back of the round-robin order
+                del users[user]
+                if tickets:
+                    users[user] = tickets
+                if ticket.future.done(): # Cancelled while queued
+                    continue
+                self._active[priority] += 1
+                self._active_by_user[user] = self._active_by_user.get(user, 0) + 1
+                ticket.future.set_result(None)
+        self._update_gauges()
+
+    def _release(self, ticket: _Ticket) -> None:
+        self._active[ticket.priority] -= 1
+        self._active_by_user[ticket.user] -= 1
+        if not self._active_by_user[ticket.user]:
+            del self._active_by_user[ticket.user]
+        self._dispatch()
+
+    # --- Public API ---
+    async def run(
+        self,
+        job: Callable[[], Awaitable[Any]],
+        priority: str = PRIORITY_INTERACTIVE,
+        user: str = "anonymous",
+        deadline: Optional[float] = None,
+    ) -> Any:
+        """
+        Waits for an LLM slot, then awaits `job()` while holding it.
+        `deadline` is an absolute `time.monotonic()` value covering both the wait and
+        the generation; DeadlineExceeded is raised if it passes first.
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{priority}', expected one of {PRIORITIES}.")
+        ticket = _Ticket(priority, user, asyncio.get_running_loop().create_future())
+        self._enqueue(ticket)
+        self._dispatch()
+
+        try:
+            await asyncio.wait_for(asyncio.shield(ticket.future), _remaining(deadline))
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if ticket.future.done() and not ticket.future.cancelled():
+                # The slot was granted just as we gave up on it; hand it back
+                self._release(ticket)
+            else:
+                ticket.future.cancel()
+                self._remove(ticket)
+                self._update_gauges()
+            outcome = "deadline_exceeded" if isinstance(e, asyncio.TimeoutError) else "cancelled"
+            LLM_SCHEDULED_TOTAL.inc(priority=priority, outcome=outcome)
+            if isinstance(e, asyncio.TimeoutError):
+                raise DeadlineExceeded(f"Request from '{user}' waited {time.monotonic() - ticket.enqueued_at:.1f}s for an LLM slot and missed its deadline.") from e
+            raise
+
+        LLM_QUEUE_WAIT_SECONDS.observe(time.monotonic() - ticket.enqueued_at, priority=priority)
+        try:
+            result = await asyncio.wait_for(job(), _remaining(deadline))
+        except asyncio.TimeoutError as e:
+            LLM_SCHEDULED_TOTAL.inc(priority=priority, outcome="deadline_exceeded")
+            raise DeadlineExceeded(f"Generation for '{user}' did not finish before its deadline.") from e
+        except asyncio.CancelledError:
+            LLM_SCHEDULED_TOTAL.inc(priority=priority, outcome="cancelled")
+            raise
+        except Exception:
+            LLM_SCHEDULED_TOTAL.inc(priority=priority, outcome="error")
+            raise
+        finally:
+            self._release(ticket)
+        LLM_SCHEDULED_TOTAL.inc(priority=priority, outcome="completed")
+        return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current queue state, e.g. for status endpoints."""
+        return {
+            "max_concurrency": self.max_concurrency,
+            "batch_max_concurrency": self.batch_max_concurrency,
+            "active": dict(self._active),
+            "queued": {p: self.queue_depth(p) for p in PRIORITIES},
+            "queued_users": {p: len(self._queues[p]) for p in PRIORITIES},
+        }
+
+
+def _remaining(deadline: Optional[float]) -> Optional[float]:
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+def worker_share(slots: int, workers: int = API_WORKERS) -> int:
+    """
+    Slots of one API worker process. Every worker schedules its own LLM calls, so the
+    slots are split evenly between them (rounded down, but at least one each).
+    """
+    return max(1, slots // max(1, workers))
+
+
+# Shared scheduler for every LLM call made by this process
+llm_scheduler = LLMScheduler(worker_share(LLM_MAX_CONCURRENCY), worker_share(LLM_BATCH_MAX_CONCURRENCY))
@@ -0,0 +1,139 @@
+import time
+import uuid
+import json
+import asyncio
+from array import array
+from collections import OrderedDict, deque
+from typing import Deque, List, Optional, Tuple
+
+from constants import SESSION_MAX_COUNT, SESSION_TTL_SECONDS, SESSION_MAX_TURNS, SESSION_MAX_ANSWER_CHARS
+from metrics import CHAT_SESSIONS
+from shared_state import SHARED_STATE, get_connection
+
+
+class ChatSession:
+    """
+    Compact state of one conversation: the last few question/answer turns and the
+    `context` Ollama returned for the last turn, which lets the next turn reuse the
+    already evaluated prompt instead of sending (and re-evaluating) it again.
+    `lock` serializes the turns of a session within one process only: with several API
+    workers, turns of one session running at the same time on two workers each save
+    their own history, and the later save overwrites the other.
+    """
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.turns: Deque[Tuple[str, str]] = deque(maxlen=SESSION_MAX_TURNS)
+        # Token ids packed as 32-bit ints: a few KB per session instead of a list of Python ints
+        self.ollama_context: Optional[array] = None
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        # Wall-clock time of the turns this copy holds, to notice newer turns saved by another worker
+        self.saved_at = 0.0
+        # Turns of one session are processed one at a time (in this process)
+        self.lock = asyncio.Lock()
+
+    def add_turn(self, question: str, answer: str, ollama_context: Optional[List[int]]) -> None:
+        # Long answers are truncated; the history only needs to carry the gist
+        self.turns.append((question, answer[:SESSION_MAX_ANSWER_CHARS]))
+        self.ollama_context = array("i", ollama_context) if ollama_context else None
+        self.last_used = time.monotonic()
+
+    def history_text(self, max_turns: Optional[int] = None) -> str:
+        """The most recent `max_turns` turns (all kept turns by default) as a transcript."""
+        turns = list(self.turns)
+        if max_turns is not None:
+            turns = turns[len(turns) - max_turns:] if max_turns > 0 else []
+        return "\n".join(f"User: {question}\nAssistant: {answer}" for question, answer in turns)
+
+
+class SessionStore:
+    """
+    In-memory session store bounded in both count (least recently used sessions are
+    evicted beyond `max_sessions`) and time (sessions idle for `ttl_seconds` expire).
+    With `shared` (API_WORKERS > 1), sessions are also saved to the shared state file
+    after every turn, so a follow-up question can be answered by any worker.
+    """
+    def __init__(self, max_sessions: int = SESSION_MAX_COUNT, ttl_seconds: float = SESSION_TTL_SECONDS, shared: bool = SHARED_STATE):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.shared = shared
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        expired = [sid for sid, session in self._sessions.items() if now - session.last_used > self.ttl_seconds]
+        for sid in expired:
+            del self._sessions[sid]
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+        CHAT_SESSIONS.set(len(self._sessions))
+
+    def get_or_create(self, session_id: Optional[str] = None) -> ChatSession:
+        """Returns the session with this id, creating it (with a new id if none is given) when needed."""
+        self._evict()
+        session = self._sessions.get(session_id) if session_id else None
+        if session_id and self.shared:
+            session = self._load(session_id, session)
+        if session is None:
+            session = ChatSession(session_id or uuid.uuid4().hex)
+            self._sessions[session.session_id] = session
+        session.last_used = time.monotonic()
+        self._sessions.move_to_end(session.session_id)
+        self._evict()
+        return session
+
+    def _load(self, session_id: str, session: Optional[ChatSession]) -> Optional[ChatSession]:
+        """
+        Returns the session updated with the turns saved by other workers, if there are
+        newer ones, or None if a saved session was deleted or expired meanwhile (its
+        local copy is dropped, so the conversation starts over).
+        """
+        row = get_connection().execute(
+            "SELECT turns, ollama_context, updated_at FROM sessions WHERE session_id = ? AND updated_at > ?",
+            (session_id, time.time() - self.ttl_seconds),
+        ).fetchone()
+        if row is None:
+            if session is not None and session.saved_at > 0: # Ended through another worker
+                del self._sessions[session_id]
+                return None
+            return session
+        if session is not None and row[2] <= session.saved_at:
+            return session
+        session = session or ChatSession(session_id)
+        session.turns.clear()
+        session.turns.extend(tuple(turn) for turn in json.loads(row[0]))
+        session.ollama_context = array("i", row[1]) if row[1] else None
+        session.saved_at = row[2]
+        self._sessions[session_id] = session
+        return session
+
+    def save(self, session: ChatSession) -> None:
+        """Saves the session's turns for the other workers (no-op unless shared)."""
+        if not self.shared:
+            return
+        session.saved_at = time.time()
+        connection = get_connection()
+        connection.execute(
+            "INSERT OR REPLACE INTO sessions (session_id, turns, ollama_context, updated_at) VALUES (?, ?, ?, ?)",
+            (session.session_id, json.dumps(list(session.turns)),
+             session.ollama_context.tobytes() if session.ollama_context else None, session.saved_at),
+        )
+        connection.execute("DELETE FROM sessions WHERE updated_at < ?", (session.saved_at - self.ttl_seconds,))
+        connection.execute(
+            "DELETE FROM sessions WHERE session_id NOT IN (SELECT session_id FROM sessions ORDER BY updated_at DESC LIMIT ?)",
+            (self.max_sessions,),
+        )
+
+    def delete(self, session_id: str) -> bool:
+        removed = self._sessions.pop(session_id, None) is not None
+        if self.shared:
+            removed = get_connection().execute("DELETE FROM sessions WHERE session_id = ?", (session_id,)).rowcount > 0 or removed
+        CHAT_SESSIONS.set(len(self._sessions))
+        return removed
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+# Shared session store of this process
+session_store = SessionStore()
@@ -0,0 +1,180 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from constants import PERSIST_DIRECTORY, API_WORKERS
+
+
+# --- Shared State ---
+# With API_WORKERS > 1, consecutive requests of one client may be served by different
+# processes. Task status and chat sessions are then kept in a SQLite file that every
+# worker opens (WAL mode lets them read while one of them writes) instead of in
+# per-process dictionaries. With a single worker nothing changes.
+
+SHARED_STATE = API_WORKERS > 1
+SHARED_STATE_PATH = os.path.join(PERSIST_DIRECTORY, "shared_state.sqlite3")
+
+# Seconds between writes of the jobs a worker is running (their progress changes in place)
+FLUSH_INTERVAL_SECONDS = 0.5
+# A finished job unchanged for this long is no longer kept in the memory of the worker that ran it
+IDLE_JOB_SECONDS = 60
+
+_connection: Optional[sqlite3.Connection] = None
+_connection_pid: Optional[int] = None
+_connection_lock = threading.Lock()
+
+
+def get_connection() -> sqlite3.Connection:
+    """Returns this process's connection to the shared state file, creating the tables on first use."""
+    global _connection, _connection_pid
+    with _connection_lock:
+        if _connection is None or _connection_pid != os.getpid():
+            os.makedirs(PERSIST_DIRECTORY, exist_ok=True)
+            connection = sqlite3.connect(SHARED_STATE_PATH, check_same_thread=False, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " kind TEXT NOT NULL,"
+                " job_id TEXT NOT NULL,"
+                " data TEXT NOT NULL,"
+                " pid INTEGER NOT NULL,"
+                " updated_at REAL NOT NULL,"
+                " PRIMARY KEY (kind, job_id))"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                " session_id TEXT PRIMARY KEY,"
+                " turns TEXT NOT NULL,"
+                " ollama_context BLOB,"
+                " updated_at REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions(updated_at)")
+            _connection, _connection_pid = connection, os.getpid()
+        return _connection
+
+
+def _process_alive(pid: int) -> bool:
+    if os.name == "nt": # os.kill would terminate the process on Windows
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class JobStore(MutableMapping):
+    """
+    Dictionary of background jobs (job id -> JSON-serializable status dict) shared by
+    all API workers. The worker that creates a job keeps the live dict, which the job
+    updates in place as it runs; a background thread writes it to the shared state
+    file whenever it changed. Other workers read the last written state. Unfinished
+    jobs of a worker that has exited are reported as failed.
+    """
+    def __init__(self, kind: str, status_key: str, unfinished: Tuple[str, ...], failed: str):
+        self.kind = kind
+        self.status_key = status_key
+        self.unfinished = unfinished
+        self.failed = failed
+        self._lock = threading.Lock()
+        # Jobs run by this process: job id -> (live dict, last written JSON, time it last changed)
+        self._local: Dict[str, Tuple[Dict[str, Any], str, float]] = {}
+        _start_flusher(self)
+
+    def _write(self, job_id: str, serialized: str) -> None:
+        get_connection().execute(
+            "INSERT OR REPLACE INTO jobs (kind, job_id, data, pid, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (self.kind, job_id, serialized, os.getpid(), time.time()),
+        )
+
+    def flush(self) -> None:
+        """Writes the jobs of this process that changed since they were last written."""
+        now = time.monotonic()
+        with self._lock:
+            local = list(self._local.items())
+        for job_id, (data, written, changed_at) in local:
+            try:
+                serialized = json.dumps(data, default=str)
+            except RuntimeError: # Modified by the job while serializing; next round
+                continue
+            with self._lock:
+                if job_id not in self._local:
+                    continue
+                if serialized != written:
+                    self._write(job_id, serialized)
+                    self._local[job_id] = (data, serialized, now)
+                elif now - changed_at > IDLE_JOB_SECONDS and data.get(self.status_key) not in self.unfinished:
+                    # Only finished jobs are dropped: a running job can be quiet for long (a slow embed or LLM
+                    # call) and is still updated through this dict, so it must keep being written
+                    del self._local[job_id]
+
+    def __setitem__(self, job_id: str, data: Dict[str, Any]) -> None:
+        serialized = json.dumps(data, default=str)
+        with self._lock:
+            self._write(job_id, serialized)
+            self._local[job_id] = (data, serialized, time.monotonic())
+
+    def __getitem__(self, job_id: str) -> Dict[str, Any]:
+        with self._lock:
+            if job_id in self._local:
+                return self._local[job_id][0]
+        row = get_connection().execute(
+            "SELECT data, pid FROM jobs WHERE kind = ? AND job_id = ?", (self.kind, job_id)
+        ).fetchone()
+        if row is None:
+            raise KeyError(job_id)
+        data = json.loads(row[0])
+        if data.get(self.status_key) in self.unfinished and not _process_alive(row[1]):
+            data[self.status_key] = self.failed
+            data.setdefault("error", "The worker running this job exited.")
+        return data
+
+    def __delitem__(self, job_id: str) -> None:
+        with self._lock:
+            self._local.pop(job_id, None)
+            deleted = get_connection().execute("DELETE FROM jobs WHERE kind = ? AND job_id = ?", (self.kind, job_id)).rowcount
+        if not deleted:
+            raise KeyError(job_id)
+
+    def __iter__(self) -> Iterator[str]:
+        rows = get_connection().execute("SELECT job_id FROM jobs WHERE kind = ?", (self.kind,)).fetchall()
+        return iter([row[0] for row in rows])
+
+    def __len__(self) -> int:
+        return get_connection().execute("SELECT COUNT(*) FROM jobs WHERE kind = ?", (self.kind,)).fetchone()[0]
+
+
+_job_stores = []
+_flusher: Optional[threading.Thread] = None
+
+def _start_flusher(store: JobStore) -> None:
+    global _flusher
+    _job_stores.append(store)
+    if _flusher is None:
+        def flush_forever():
+            while True:
+                time.sleep(FLUSH_INTERVAL_SECONDS)
+                for job_store in list(_job_stores):
+                    try:
+                        job_store.flush()
+                    except sqlite3.Error as e:
+                        print(f"Warning: Could not write {job_store.kind} jobs to the shared state: {e}")
+        _flusher = threading.Thread(target=flush_forever, name="job-store-flusher", daemon=True)
+        _flusher.start()
+
+
+def job_store(kind: str, status_key: str, unfinished: Tuple[str, ...], failed: str):
+    """
+    Returns the dictionary for jobs of `kind`: a JobStore shared by all workers with
+    API_WORKERS > 1, a plain dict otherwise.
+    """
+    if SHARED_STATE:
+        return JobStore(kind, status_key, unfinished, failed)
+    return {}
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+import sys
+import time
+import datetime
+import importlib
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any
+
+from metrics import record_stage
+
+
+# Heavy modules imported during warm-up, in dependency order. Each module's time
+# includes the dependencies it is the first to import.
+HEAVY_MODULES = [
+    "langchain_core.prompts",
+    "langchain_text_splitters",
+    "chromadb",
+    "langchain_chroma",
+    "torch",
+    "sentence_transformers",
+    "langchain_huggingface",
+    "langchain_community.llms",
+]
+
+STARTUP_STATUS_STARTING = "STARTING"
+STARTUP_STATUS_READY = "READY"
+STARTUP_STATUS_FAILED = "FAILED"
+
+_state: Dict[str, Any] = {
+    "status": STARTUP_STATUS_STARTING,
+    "error": None,
+    "started_at": None,
+    "ready_at": None,
+    "imports": {},
+    "phases": {},
+}
+_state_lock = threading.Lock()
+
+
+def record_import(module_name: str) -> float:
+    """Imports a module and records how long the import took. Returns the duration in seconds."""
+    start = time.perf_counter()
+    importlib.import_module(module_name)
+    elapsed = time.perf_counter() - start
+    with _state_lock:
+        _state["imports"][module_name] = round(elapsed, 4)
+    record_stage("startup", f"import:{module_name}", elapsed)
+    return elapsed
+
+def record_phase(name: str, seconds: float) -> None:
+    with _state_lock:
+        _state["phases"][name] = round(seconds, 4)
+    record_stage("startup", name, seconds)
+
+@contextmanager
+def startup_phase(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(name, time.perf_counter() - start)
+
+
+def warm_up() -> None:
+    """
+    Imports the heavy dependencies and loads the embedding model and vector store,
+    so that the first query does not pay for them. Marks the server ready when done.
+    """
+    from vectorstore import get_embeddings, get_vectorstore
+    from tokenizer import get_tokenizer, LLM
+
+    with _state_lock:
+        _state["status"] = STARTUP_STATUS_STARTING
+        _state["started_at"] = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    try:
+        with startup_phase("heavy_imports"):
+            for module_name in HEAVY_MODULES:
+                try:
+                    record_import(module_name)
+                except ImportError as e:
+                    # Optional dependencies (e.g. torch backends) may be missing; the
+                    # phases below report the real failure if it matters.
+                    print(f"Startup: Could not import {module_name}: {e}", file=sys.stderr)
+        with startup_phase("embeddings_model_load"):
+            embeddings = get_embeddings()
+        with startup_phase("embeddings_first_call"):
+            embeddings.embed_query("warm-up")
+        with startup_phase("vectorstore_open"):
+            get_vectorstore()
+        with startup_phase("llm_tokenizer_load"):
+            # Falls back to estimated counts (with a warning) when it cannot be loaded
+            get_tokenizer(LLM)
+    except Exception as e:
+        print(f"Startup: Warm-up FAILED: {e}", file=sys.stderr)
+        with _state_lock:
+            _state["status"] = STARTUP_STATUS_FAILED
+            _state["error"] = str(e)
+        return
+
+    with _state_lock:
+        _state["status"] = STARTUP_STATUS_READY
+        _state["ready_at"] = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    print("Startup: Warm-up complete, server is ready.")
+
+def start_background_warm_up() -> threading.Thread:
+    """Runs `warm_up` in a daemon thread so the server can accept requests immediately."""
+    thread = threading.Thread(target=warm_up, name="privategpt-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+def is_ready() -> bool:
+    with _state_lock:
+        return _state["status"] == STARTUP_STATUS_READY
+
+def startup_report() -> Dict[str, Any]:
+    """Returns the readiness status and where startup time went (imports and warm-up phases)."""
+    with _state_lock:
+        report = {key: (dict(value) if isinstance(value, dict) else value) for key, value in _state.items()}
+    report["imports"] = dict(sorted(report["imports"].items(), key=lambda item: item[1], reverse=True))
+    return report
+
+
+if __name__ == "__main__":
+    # Standalone mode: run the warm-up in the foreground and print the report.
+    # For a per-module breakdown of every import, also try `python -X importtime api_server.py`.
+    print("Running startup warm-up in standalone mode.")
+    warm_up()
+    report = startup_report()
+    print(f"\nStatus: {report['status']}" + (f" ({report['error']})" if report["error"] else ""))
+    print("\nImports (seconds):")
+    for module_name, seconds in report["imports"].items():
+        print(f"  {seconds:8.3f}  {module_name}")
+    print("\nPhases (seconds):")
+    for phase, seconds in report["phases"].items():
+        print(f"  {seconds:8.3f}  {phase}")
@@ -1,111 +1,209 @@
 #!/usr/bin/env python3
-import tiktoken
-import gradio as gr # Not used in this script, can remove if not planning to use
-from dotenv import load_dotenv
-from langchain import PromptTemplate # Not used in this script, can remove if not planning to use
-from langchain.chains.summarize import load_summarize_chain
-from langchain_community.document_loaders import PyPDFLoader # Changed to langchain_community
-
-from langchain_huggingface.embeddings import HuggingFaceEmbeddings # Changed to langchain_huggingface
-#from langchain.embeddings.openai import OpenAIEmbeddings # Not used, commented out
-
-from langchain.callbacks.streaming_stdout import StreamingStdOutCallbackHandler
-from langchain_chroma.vectorstores import Chroma # Using langchain_chroma now
-from langchain_community.vectorstores import FAISS # Changed to langchain_community
-from langchain_community.llms import GPT4All, LlamaCpp # Changed to langchain_community
-from langchain_community.llms import Ollama # <-- ADDED OLLAMA IMPORT
-import os
+import sys
+import asyncio
 import argparse
-
-
-def num_tokens_from_string(string: str, encoding_name: str) -> int:
-    """Returns the number of tokens in a text string."""
-    encoding = tiktoken.get_encoding(encoding_name)
-    print(encoding.encode(string))
-    num_tokens = len(encoding.encode(string))
-    return num_tokens
-
-def summarize_pdf(pdf_file_path, llm_instance, mute_stream=False): # Pass llm and mute_stream
-    loader = PyPDFLoader(pdf_file_path)
-    docs = loader.load_and_split()
-    
-    # Define callbacks locally for the chain
-    callbacks = [] if mute_stream else [StreamingStdOutCallbackHandler()]
-    
-    chain = load_summarize_chain(llm=llm_instance, chain_type="map_reduce", verbose=True, callbacks=callbacks) # Pass llm_instance and callbacks
-    summary = chain.run(docs)
-    return summary
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from constants import (
+    MODEL_TYPE,
+    OLLAMA_MODEL_NAME,
+    MODEL_N_CTX,
+    MAX_NEW_TOKENS,
+    SUMMARY_CACHE_MAX_MB,
+    SUMMARY_MAX_TOKENS,
+)
+
+from langchain_core.prompts import PromptTemplate
+
+from cache import DiskCache, content_hash
+from metrics import stage_timer
+from vectorstore import get_vectorstore
+from ollama_client import ollama_client
+from scheduler import llm_scheduler, PRIORITY_BATCH
+from tokenizer import count_tokens, count_tokens_batch, truncate_to_tokens
+
+
+# --- Prompt Templates ---
+map_template = """Write a concise summary of the following:
+
+    "{text}"
+
+    CONCISE SUMMARY:"""
+
+map_prompt = PromptTemplate(template=map_template, input_variables=["text"])
+
+combine_template = """The following are summaries of consecutive parts of one document.
+    Combine them into a single concise summary of the whole document.
+
+    {text}
+
+    CONCISE SUMMARY:"""
+
+combine_prompt = PromptTemplate(template=combine_template, input_variables=["text"])
+
+
+@lru_cache(maxsize=None)
+def input_token_budget() -> int:
+    """
+    Tokens of input a single map or combine call may carry: the context window minus the
+    generated tokens and the prompt itself. Keeps every call within MODEL_N_CTX.
+    """
+    return MODEL_N_CTX - max(MAX_NEW_TOKENS, SUMMARY_MAX_TOKENS) - count_tokens(combine_template)
+
+
+# --- Summary Cache ---
+_summary_cache: Optional[DiskCache] = None
+
+def get_summary_cache() -> DiskCache:
+    """
+    Returns the on-disk cache of chunk and partial summaries, keyed by a hash of the
+    model, the prompt and the summarized text. Re-running a summary, or summarizing a
+    document that shares chunks with an earlier one, reuses the cached results.
+    """
+    global _summary_cache
+    if _summary_cache is None:
+        _summary_cache = DiskCache("summaries", max_bytes=int(SUMMARY_CACHE_MAX_MB * 1024 * 1024))
+    return _summary_cache
+
+
+def _group_by_budget(texts: List[str], budget: int) -> List[List[str]]:
+    """Packs consecutive texts into groups whose combined token count stays within `budget`."""
+    groups: List[List[str]] = []
+    current: List[str] = []
+    current_tokens = 0
+    # Texts are joined with a blank line, counted as one extra token per text
+    for text, tokens in zip(texts, count_tokens_batch(texts)):
+        tokens += 1
+        if current and current_tokens + tokens > budget:
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(text)
+        current_tokens += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+async def _summarize_all(
+    texts: List[str],
+    prompt: PromptTemplate,
+    num_predict: int,
+    user: str,
+    progress: Dict[str, Any],
+) -> List[str]:
+    """
+    Summarizes every text with `prompt`. Cached summaries are reused; the others are
+    generated concurrently as batch work, so the scheduler caps how many run at once.
+    Each new summary is cached as soon as it is done, so an interrupted job resumes
+    where it stopped.
+    """
+    cache = get_summary_cache()
+    keys = [content_hash(OLLAMA_MODEL_NAME, prompt.template, str(num_predict), text) for text in texts]
+    cached = await asyncio.to_thread(cache.get_many, keys)
+    summaries: List[Optional[str]] = [cached[key].decode("utf8") if key in cached else None for key in keys]
+    progress["done"] = progress["cached"] = len(texts) - summaries.count(None)
+    progress["total"] = len(texts)
+
+    async def summarize(index: int) -> None:
+        formatted = prompt.format(text=texts[index])
+        result = await llm_scheduler.run(
+            lambda: ollama_client.generate(formatted, options={"num_predict": num_predict}, pipeline="summarize"),
+            priority=PRIORITY_BATCH, user=user,
+        )
+        summaries[index] = (result.get("response") or "").strip()
+        await asyncio.to_thread(cache.put, keys[index], summaries[index].encode("utf8"))
+        progress["done"] += 1
+
+    tasks = [asyncio.create_task(summarize(i)) for i, summary in enumerate(summaries) if summary is None]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        # One failure (or cancellation of the job) abandons the remaining calls
+        for task in tasks:
+            task.cancel()
+        raise
+    return summaries
+
+
+def load_document_chunks(source: str) -> List[str]:
+    """Returns the text of the chunks ingested for `source`, in document order."""
+    result = get_vectorstore().get(where={"source": source}, include=["documents", "metadatas"])
+    chunks = list(zip(result["documents"], result["metadatas"]))
+    # Chunks come back in insertion order; sort by page where loaders record one (stable otherwise)
+    chunks.sort(key=lambda chunk: (chunk[1] or {}).get("page", 0))
+    return [text for text, _ in chunks]
+
+
+async def summarize_document(source: str, user: str = "anonymous", progress: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Map-reduce summary of an ingested document.
+    Map: every chunk is summarized on its own, concurrently (see `_summarize_all`).
+    Reduce: consecutive summaries are packed into groups that fit `input_token_budget()` and
+    combined, level after level, until they fit into one final call; so documents of
+    any length stay within MODEL_N_CTX.
+    `progress` (if given) is updated in place with the current stage and counts.
+    """
+    progress = progress if progress is not None else {}
+    progress.update({"stage": "loading", "level": 0})
+    with stage_timer("summarize", "load_chunks"):
+        chunks = await asyncio.to_thread(load_document_chunks, source)
+    if not chunks:
+        raise ValueError(f"No ingested chunks found for '{source}'.")
+
+    progress["stage"] = "map"
+    with stage_timer("summarize", "map"):
+        chunks = await asyncio.to_thread(lambda: [truncate_to_tokens(chunk, input_token_budget()) for chunk in chunks])
+        summaries = await _summarize_all(chunks, map_prompt, SUMMARY_MAX_TOKENS, user, progress)
+    chunks_cached = progress["cached"]
+
+    progress["stage"] = "reduce"
+    with stage_timer("summarize", "reduce"):
+        while True:
+            # Halving the per-summary budget guarantees at least two summaries per group
+            summaries = await asyncio.to_thread(lambda: [truncate_to_tokens(summary, input_token_budget() // 2) for summary in summaries])
+            groups = await asyncio.to_thread(_group_by_budget, summaries, input_token_budget())
+            if len(groups) == 1:
+                break
+            progress["level"] += 1
+            summaries = await _summarize_all(["\n\n".join(group) for group in groups], combine_prompt, SUMMARY_MAX_TOKENS, user, progress)
+        final = await _summarize_all(["\n\n".join(groups[0])], combine_prompt, MAX_NEW_TOKENS, user, progress)
+
+    progress["stage"] = "done"
+    return {
+        "source": source,
+        "summary": final[0],
+        "chunks": len(chunks),
+        "chunks_cached": chunks_cached,
+        "reduce_levels": progress["level"],
+    }
 
 
 def main():
-    load_dotenv() # Load environment variables here, once per run
-
-    embeddings_model_name = os.environ.get("EMBEDDINGS_MODEL_NAME")
-    # persist_directory = os.environ.get('PERSIST_DIRECTORY') # Not used for summarization, can remove
-
-    model_type = os.environ.get('MODEL_TYPE')
-    model_path = os.environ.get('MODEL_PATH') # Only relevant for LlamaCpp/GPT4All
-    model_n_ctx = int(os.environ.get('MODEL_N_CTX', 2048)) # Default to 2048 if not set
-
-    # target_source_chunks = int(os.environ.get('TARGET_SOURCE_CHUNKS',4)) # Not used for summarization, can remove
-
-    args = parse_arguments() # Parse arguments here
-
-    llm = None # Initialize llm to None
-
-    # Prepare the LLM based on MODEL_TYPE
-    match model_type:
-        case "LlamaCpp":
-            llm = LlamaCpp(model_path=model_path, n_ctx=model_n_ctx, callbacks=[StreamingStdOutCallbackHandler()], verbose=False) # Callbacks defined here
-        case "GPT4All":
-            llm = GPT4All(model=model_path, n_ctx=model_n_ctx, backend='gptj', callbacks=[StreamingStdOutCallbackHandler()], verbose=False) # Callbacks defined here
-        case "Ollama": # <-- ADDED OLLAMA CASE
-            llm = Ollama(
-                model="llama3",
-                callbacks=[StreamingStdOutCallbackHandler()], # Callbacks defined here
-                verbose=False,
-                temperature=0.7,
-                num_ctx=4096, # Ollama uses 'num_ctx'
-            )
-        case _default:
-            print(f"Model {model_type} not supported!")
-            exit() # Corrected: Use exit() as a function call
-
-    if llm is None:
-        print("Failed to initialize LLM. Exiting.")
+    args = parse_arguments()
+
+    if MODEL_TYPE != "Ollama":
+        print(f"Model {MODEL_TYPE} not supported!")
         exit()
 
-    # --- Summarization Part ---
-    # This assumes '2023_GPT4All_Technical_Report.pdf' is in 'source_documents/'
-    pdf_to_summarize_path = 'source_documents/2023_GPT4All_Technical_Report.pdf'
-    
-    print(f"\n--- Summarizing: {pdf_to_summarize_path} ---")
-    # Pass the llm instance and mute_stream arg to the summarize_pdf function
-    summary = summarize_pdf(pdf_to_summarize_path, llm, args.mute_stream) 
+    print(f"\n--- Summarizing: {args.source} ---")
+    try:
+        result = asyncio.run(summarize_document(args.source))
+    except ValueError as e:
+        print(f"{e} Ingest the document first (python ingest.py).", file=sys.stderr)
+        exit(1)
     print("\n--- Summary ---")
-    print(summary)
+    print(result["summary"])
     print("\n--- End of Summary ---")
-
-    # --- FAISS Part (if you still want to run it, 'pages' needs to be defined) ---
-    # To run this, you'd need to load the PDF documents into 'pages' first
-    # For example:
-    # loader = PyPDFLoader(pdf_to_summarize_path)
-    # pages = loader.load_and_split()
-    # faiss_index = FAISS.from_documents(pages, HuggingFaceEmbeddings(model_name=embeddings_model_name))
-    # print("\n--- FAISS Similarity Search ---")
-    # docs = faiss_index.similarity_search("What makes a useful API?", k=2)
-    # for doc in docs:
-    #     print(str(doc.metadata["page"]) + ":", doc.page_content[:1000])
-    # print("\n--- End of FAISS Similarity Search ---")
+    print(f"({result['chunks']} chunks, {result['chunks_cached']} from cache, {result['reduce_levels']} intermediate reduce level(s))")
 
 
 def parse_arguments():
-    parser = argparse.ArgumentParser(description='summarize.py: Summarize PDF documents using LLMs.')
-    parser.add_argument("--mute-stream", "-M",
-                        action='store_true',
-                        help='Use this flag to disable the streaming StdOut callback for LLMs.')
+    parser = argparse.ArgumentParser(description='summarizer.py: Summarize an ingested document using the LLM.')
+    parser.add_argument("source",
+                        help='Path of the ingested document, as stored in the vector store (e.g. source_documents/report_1a2b3c4d.pdf).')
     return parser.parse_args()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,32 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Every store, cache and state file goes to a scratch directory; set before the
+# modules under test import constants.py
+_scratch = tempfile.mkdtemp(prefix="privategpt-tests-")
+for name in ("PERSIST_DIRECTORY", "CACHE_DIRECTORY", "SOURCE_DIRECTORY", "PROFILE_DIRECTORY"):
+    os.environ[name] = os.path.join(_scratch, name.lower())
+    os.makedirs(os.environ[name], exist_ok=True)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeEmbeddings:
+    """Stands in for the embedding model (no model downloads in tests)."""
+    def embed_documents(self, texts):
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text):
+        return [float(len(text)), 1.0]
+
+
+@pytest.fixture
+def store(monkeypatch):
+    """The active store version, embedding with FakeEmbeddings."""
+    import vectorstore
+    monkeypatch.setitem(vectorstore._embeddings, vectorstore.embeddings_model_of(vectorstore.active_version()), FakeEmbeddings())
+    monkeypatch.setattr(vectorstore, "_vectorstores", {})
+    return vectorstore.get_vectorstore()
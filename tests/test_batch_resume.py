@@ -0,0 +1,31 @@
+import json
+
+from privateGPT import completed_batch_lines
+
+
+def write(path, text):
+    path.write_bytes(text.encode("utf8"))
+    return str(path)
+
+
+def test_missing_output_has_nothing_completed(tmp_path):
+    assert completed_batch_lines(str(tmp_path / "answers.jsonl")) == set()
+
+
+def test_failed_queries_run_again_and_a_cut_off_line_is_removed(tmp_path):
+    path = write(tmp_path / "answers.jsonl", '{"line": 1, "answer": "a"}\n{"line": 2, "error": "x"}\n{"line": 3, "ans')
+    assert completed_batch_lines(path) == {1}
+    assert (tmp_path / "answers.jsonl").read_text() == '{"line": 1, "answer": "a"}\n{"line": 2, "error": "x"}\n'
+
+
+def test_last_record_without_newline_is_kept_on_its_own_line(tmp_path):
+    path = write(tmp_path / "answers.jsonl", '{"line": 1, "answer": "a"}')
+    assert completed_batch_lines(path) == {1}
+    with open(path, "a", encoding="utf8") as f:
+        f.write(json.dumps({"line": 2, "answer": "b"}) + "\n")
+    assert completed_batch_lines(path) == {1, 2}
+
+
+def test_lines_that_are_not_answer_records_are_ignored(tmp_path):
+    path = write(tmp_path / "answers.jsonl", '[1, 2]\n"text"\n\n{"answer": "no line"}\n{"line": 4, "answer": "d"}\n')
+    assert completed_batch_lines(path) == {4}
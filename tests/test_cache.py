@@ -0,0 +1,73 @@
+import sqlite3
+
+import pytest
+
+import cache
+from cache import DiskCache, content_hash
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "time", lambda: now[0])
+    return now
+
+
+def test_content_hash_separates_parts():
+    assert content_hash("ab", "c") != content_hash("a", "bc")
+    assert content_hash("a") == content_hash("a")
+
+
+def test_get_and_put(tmp_path):
+    disk_cache = DiskCache("test", directory=str(tmp_path))
+    disk_cache.put_many([("a", b"1"), ("b", b"22")])
+    assert disk_cache.get_many(["a", "b", "c"]) == {"a": b"1", "b": b"22"}
+    assert disk_cache.get("c") is None
+    disk_cache.put("a", b"333") # Replacing a value
+    assert disk_cache.stats() == {"entries": 2, "bytes": 5, "max_bytes": None}
+    disk_cache.clear()
+    assert disk_cache.stats()["bytes"] == 0
+
+
+def test_running_total_matches_stored_sizes(tmp_path):
+    disk_cache = DiskCache("test", max_bytes=10, directory=str(tmp_path))
+    for i in range(20):
+        disk_cache.put(f"key{i % 7}", b"x" * (i % 4 + 1))
+    sizes = sqlite3.connect(disk_cache.path).execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+    assert disk_cache.stats()["bytes"] == sizes <= 10
+
+
+def test_total_is_initialized_from_an_existing_cache(tmp_path):
+    disk_cache = DiskCache("test", directory=str(tmp_path))
+    disk_cache.put_many([("a", b"1234"), ("b", b"56")])
+    connection = sqlite3.connect(disk_cache.path)
+    connection.execute("DROP TABLE total") # As in a cache file written before the total existed
+    connection.commit()
+    assert DiskCache("test", directory=str(tmp_path)).stats()["bytes"] == 6
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, clock):
+    disk_cache = DiskCache("test", max_bytes=3, directory=str(tmp_path))
+    disk_cache.put("a", b"1")
+    clock[0] += 1
+    disk_cache.put("b", b"2")
+    clock[0] += 1
+    disk_cache.put("c", b"3")
+    clock[0] += 1
+    assert disk_cache.get("a") == b"1" # Recency is only kept in memory until the next write
+    clock[0] += 1
+    disk_cache.put("d", b"4")
+    assert disk_cache.get_many(["a", "b", "c", "d"]) == {"a": b"1", "c": b"3", "d": b"4"}
+
+
+def test_hits_do_not_write_until_a_batch_is_due(tmp_path, monkeypatch):
+    disk_cache = DiskCache("test", directory=str(tmp_path))
+    disk_cache.put("a", b"1")
+    stored = lambda: sqlite3.connect(disk_cache.path).execute("SELECT last_access FROM entries").fetchone()[0]
+    written = stored()
+    monkeypatch.setattr(cache.time, "time", lambda: written + 60)
+    disk_cache.get("a")
+    assert stored() == written
+    monkeypatch.setattr(cache, "ACCESS_FLUSH_ENTRIES", 1)
+    disk_cache.get("a")
+    assert stored() == written + 60
@@ -0,0 +1,60 @@
+from types import SimpleNamespace
+
+import pytest
+
+import ingest
+import tokenizer
+import vectorstore
+
+
+class FakeEmbeddings:
+    def __init__(self, max_seq_length):
+        self._client = SimpleNamespace(max_seq_length=max_seq_length)
+
+
+@pytest.fixture(autouse=True)
+def no_tokenizer(monkeypatch):
+    # No Hugging Face Hub here: token counts use the estimate
+    monkeypatch.setattr(tokenizer, "get_tokenizer", lambda kind, model_name=None: None)
+
+
+@pytest.fixture
+def models(monkeypatch):
+    monkeypatch.setattr(vectorstore, "_embeddings", {"short": FakeEmbeddings(128), "long": FakeEmbeddings(512)})
+    monkeypatch.setattr(vectorstore, "embeddings_model_of", lambda version: "short")
+    monkeypatch.setattr(ingest, "embeddings_model_of", lambda version: "short")
+    monkeypatch.setattr(vectorstore, "EMBEDDINGS_MAX_SEQ_LENGTH", 0)
+
+
+def test_max_seq_length_comes_from_the_model(models):
+    assert vectorstore.embeddings_max_seq_length() == 128 # The active version's model
+    assert vectorstore.embeddings_max_seq_length("long") == 512
+
+
+def test_max_seq_length_override(models, monkeypatch):
+    monkeypatch.setattr(vectorstore, "EMBEDDINGS_MAX_SEQ_LENGTH", 64)
+    assert vectorstore.embeddings_max_seq_length("long") == 64
+
+
+def test_max_seq_length_default_when_the_model_does_not_report_it(models, monkeypatch):
+    vectorstore._embeddings["unknown"] = object()
+    assert vectorstore.embeddings_max_seq_length("unknown") == vectorstore.DEFAULT_MAX_SEQ_LENGTH
+
+
+def test_token_chunks_are_capped_at_the_model_limit(models, monkeypatch):
+    monkeypatch.setattr(ingest, "CHUNK_SIZE_UNIT", "tokens")
+    monkeypatch.setattr(ingest, "CHUNK_SIZE", 1000)
+    assert ingest.get_text_splitter()._chunk_size == 128 - ingest.EMBEDDING_SPECIAL_TOKENS
+    assert ingest.get_text_splitter(512)._chunk_size == 512 - ingest.EMBEDDING_SPECIAL_TOKENS
+
+
+def test_tokens_are_counted_with_the_tokenizer_of_the_chunked_model(models, monkeypatch):
+    requested = []
+    monkeypatch.setattr(tokenizer, "get_tokenizer", lambda kind, model_name=None: requested.append(model_name))
+    monkeypatch.setattr(ingest, "CHUNK_SIZE_UNIT", "tokens")
+    document = ingest.Document(page_content="some text to split", metadata={})
+    ingest.get_text_splitter().split_documents([document])
+    ingest.get_text_splitter(512, "long").split_documents([document])
+    ingest.warn_about_truncated_chunks([document], 512, "long")
+    assert set(requested) == {"short", "long"} # The active version's model by default
+    assert requested[-1] == "long"
@@ -0,0 +1,26 @@
+import uuid
+
+import privateGPT
+import vectorstore
+
+
+def test_deleted_chunks_are_no_longer_served(store):
+    source = f"{uuid.uuid4().hex}.txt"
+    chunk_id = uuid.uuid4().hex
+    store._collection.upsert(ids=[chunk_id], embeddings=[[1.0, 0.0]], documents=["full text"], metadatas=[{"source": source}])
+    assert privateGPT.get_chunk(chunk_id) == {"id": chunk_id, "page_content": "full text", "metadata": {"source": source}}
+    assert vectorstore.delete_documents([source]) == 1
+    assert privateGPT.get_chunk(chunk_id) is None
+
+
+def test_unknown_ids_do_not_load_embedding_models(store, monkeypatch):
+    version = f"old-{uuid.uuid4().hex}"
+    vectorstore.register_version(version, "some-other-model", status="ready")
+    vectorstore.get_chroma_client().get_or_create_collection(version)
+
+    def load_model(*args, **kwargs):
+        raise AssertionError("the embedding model must not be loaded")
+
+    monkeypatch.setattr(vectorstore, "get_embeddings", load_model)
+    assert privateGPT.get_chunk("made-up-id") is None
+    vectorstore.delete_version(version)
@@ -0,0 +1,66 @@
+import pytest
+
+import ingest
+import tokenizer
+
+
+@pytest.fixture(autouse=True)
+def character_chunks(monkeypatch):
+    monkeypatch.setattr(tokenizer, "get_tokenizer", lambda kind, model_name=None: None)
+    monkeypatch.setattr(ingest, "CHUNK_SIZE_UNIT", "characters")
+    monkeypatch.setattr(ingest, "CHUNK_SIZE", 40)
+
+
+def write_csv(tmp_path, text, name="data.csv"):
+    path = tmp_path / name
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def test_rows_are_packed_into_chunks_starting_with_the_header(tmp_path):
+    path = write_csv(tmp_path, "id,name\n" + "".join(f"{i},row number {i}\n" for i in range(1, 7)))
+    batches = list(ingest.iter_csv_chunks(path, batch_rows=4))
+    assert [rows for _, rows in batches] == [4, 2, 0]
+    chunks = [chunk for batch, _ in batches for chunk in batch]
+    assert all(chunk.page_content.startswith("id,name\n") for chunk in chunks)
+    assert [(chunk.metadata["row_start"], chunk.metadata["row_end"]) for chunk in chunks] == [(1, 2), (3, 4), (5, 6)]
+    assert chunks[0].page_content == "id,name\n1,row number 1\n2,row number 2"
+    assert {chunk.metadata["source"] for chunk in chunks} == {path}
+
+
+def test_long_rows_become_chunks_of_their_own_and_blank_rows_are_skipped(tmp_path):
+    path = write_csv(tmp_path, "a;b\n1;" + "x" * 100 + "\n\n;\n2;y\n")
+    chunks = [chunk for batch, _ in ingest.iter_csv_chunks(path) for chunk in batch]
+    assert [(chunk.metadata["row_start"], chunk.metadata["row_end"]) for chunk in chunks] == [(1, 1), (2, 2)]
+    assert chunks[1].page_content == "a,b\n2,y" # Delimiter detected, rows rewritten as comma-separated
+
+
+def test_empty_csv_yields_nothing(tmp_path):
+    assert list(ingest.iter_csv_chunks(write_csv(tmp_path, ""))) == []
+
+
+def test_csv_file_is_ingested_batch_by_batch(tmp_path, store):
+    path = write_csv(tmp_path, "id,name\n" + "".join(f"{i},ok {i}\n" for i in range(1, 11)), "ok.csv")
+    stats = {}
+    chunks, rows = ingest.ingest_csv_file(store, store.embeddings, path, stats)
+    assert rows == 10
+    assert len(store._collection.get(where={"source": path})["ids"]) == chunks > 0
+    assert "failed_files" not in stats
+
+
+def test_failed_csv_file_is_removed_again(tmp_path, store, monkeypatch):
+    path = write_csv(tmp_path, "id,name\n" + "".join(f"{i},batch row {i}\n" for i in range(1, 11)), "broken.csv")
+    write_chunks = ingest._write_chunks
+    calls = []
+
+    def fail_on_last_batch(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 2: # After the first chunks were written
+            raise RuntimeError("embedding failed") # Not a csv.Error or OSError
+        return write_chunks(*args, **kwargs)
+
+    monkeypatch.setattr(ingest, "_write_chunks", fail_on_last_batch)
+    stats = {}
+    assert ingest.ingest_csv_file(store, store.embeddings, path, stats)[0] == 0
+    assert stats["failed_files"] == 1
+    assert store._collection.get(where={"source": path})["ids"] == []
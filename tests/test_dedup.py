@@ -0,0 +1,75 @@
+import pytest
+
+from dedup import DuplicateIndex, minhash_signature, estimated_similarity, shingles
+
+POLICY = " ".join(f"word{i}" for i in range(60))
+POLICY_REVISED = POLICY.replace("word30", "changed")
+OTHER = " ".join(f"other{i}" for i in range(60))
+
+
+@pytest.fixture
+def index(tmp_path):
+    return DuplicateIndex(str(tmp_path / "dedup.sqlite3"), threshold=0.7)
+
+
+def test_signatures_are_stable_and_estimate_similarity():
+    assert (minhash_signature(POLICY) == minhash_signature(POLICY.upper())).all() # Case-normalized
+    assert estimated_similarity(minhash_signature(POLICY), minhash_signature(POLICY_REVISED)) > 0.7
+    assert estimated_similarity(minhash_signature(POLICY), minhash_signature(OTHER)) < 0.2
+    assert shingles("a b") == ["a b"]
+
+
+def test_assign_links_near_duplicates_within_and_across_batches(index):
+    assert index.assign("v1", ["a", "b"], [POLICY, POLICY_REVISED]) == {"a": "a", "b": "a"}
+    assert index.assign("v1", ["c", "d"], [OTHER, POLICY]) == {"c": "c", "d": "a"}
+    # Collections do not mix
+    assert index.assign("v2", ["e"], [POLICY]) == {"e": "e"}
+
+
+def test_removed_chunks_no_longer_match(index):
+    index.assign("v1", ["a"], [POLICY])
+    assert index.remove("v1", ["a"]) == 1
+    assert index.assign("v1", ["b"], [POLICY]) == {"b": "b"}
+
+
+def test_removing_a_canonical_chunk_regroups_its_duplicates(index):
+    index.assign("v1", ["a", "b", "c"], [POLICY, POLICY_REVISED, POLICY])
+    index.remove("v1", ["a"])
+    # 'b' is now the canonical chunk of the group, so new duplicates link to a stored chunk
+    assert index.assign("v1", ["d"], [POLICY]) == {"d": "b"}
+
+
+def test_drop_collection(index):
+    index.assign("v1", ["a"], [POLICY])
+    index.drop_collection("v1")
+    assert index.assign("v1", ["b"], [POLICY]) == {"b": "b"}
+
+
+def test_deleting_a_document_removes_its_index_entries(store, monkeypatch):
+    from langchain_core.documents import Document
+    import ingest
+    import vectorstore
+    from dedup import get_duplicate_index
+
+    monkeypatch.setattr(ingest, "DEDUP_MODE", "skip")
+    db, embeddings = store, store.embeddings
+    ingest.add_chunks_to_vectorstore(db, embeddings, [Document(page_content=POLICY, metadata={"source": "old.txt"})])
+
+    assert vectorstore.delete_documents(["old.txt"]) == 1
+    assert db._collection.get(where={"source": "old.txt"})["ids"] == []
+    assert vectorstore.get_document_index().get(ids=["old.txt"])["ids"] == []
+    # In skip mode, a stale entry would drop the chunks of the document that replaces it
+    assert ingest.add_chunks_to_vectorstore(db, embeddings, [Document(page_content=POLICY, metadata={"source": "new.txt"})]) == 1
+    vectorstore.delete_documents(["new.txt"])
+    assert get_duplicate_index().assign(db._collection.name, ["probe"], [POLICY]) == {"probe": "probe"}
+
+
+def test_skipped_duplicates_are_not_counted_as_written(store, monkeypatch):
+    from langchain_core.documents import Document
+    import ingest
+    import vectorstore
+
+    monkeypatch.setattr(ingest, "DEDUP_MODE", "skip")
+    chunks = [Document(page_content=text, metadata={"source": "counted.txt"}) for text in (POLICY, POLICY_REVISED, OTHER)]
+    assert ingest.add_chunks_to_vectorstore(store, store.embeddings, chunks) == 2
+    vectorstore.delete_documents(["counted.txt"])
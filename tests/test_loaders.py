@@ -0,0 +1,109 @@
+import pytest
+
+import ingest
+from ingest import html_to_text, HTMLTextLoader, MarkdownTextLoader, EmailTextLoader, PlainTextLoader, looks_like_text
+
+
+def test_html_without_closing_head_keeps_body():
+    # </head> and <body> are optional in HTML5; the body must not be skipped
+    assert html_to_text("<html><head><title>T</title><body><p>Hello world</p></body></html>") == "T\nHello world"
+    assert html_to_text("<html><head><meta charset=utf-8><p>No body tag</p>") == "No body tag"
+    assert html_to_text("<head><style>p {}</style>Loose text") == "Loose text"
+
+
+def test_html_skips_invisible_elements_and_breaks_blocks():
+    html = (
+        "<html><head><title>Page</title><script>var x = 1;</script></head>"
+        "<body><h1>Head&amp;er</h1><p>One <b>bold</b><br/>two</p><style>p {}</style>"
+        "<ul><li>a</li><li>b</li></ul></body></html>"
+    )
+    assert html_to_text(html) == "Page\nHead&er\nOne bold\ntwo\na\nb"
+
+
+def test_html_loader_uses_meta_charset(tmp_path):
+    path = tmp_path / "page.html"
+    path.write_bytes('<html><head><meta charset="iso-8859-1"></head><body>caf\xe9</body></html>'.encode("latin-1"))
+    documents = HTMLTextLoader(str(path)).load()
+    assert documents[0].page_content == "café"
+    assert documents[0].metadata == {"source": str(path)}
+
+
+def test_html_loader_without_text_raises(tmp_path):
+    path = tmp_path / "empty.html"
+    path.write_text("<html><head><script>only()</script></head></html>")
+    with pytest.raises(ValueError):
+        HTMLTextLoader(str(path)).load()
+
+
+def test_markdown_markup_is_removed(tmp_path):
+    path = tmp_path / "doc.md"
+    path.write_text(
+        "# Title #\n\n"
+        "Some **bold**, *italic* and _under_ text with a [link](http://x) and ![alt](p.png).\n"
+        "`code_span` and snake_case_name stay.\n\n"
+        "> quoted\n\n"
+        "```\n**kept verbatim**\n```\n"
+        "---\n"
+        "[ref]: http://example.com\n"
+    )
+    text = MarkdownTextLoader(str(path)).load()[0].page_content
+    assert text == (
+        "Title\n\n"
+        "Some bold, italic and under text with a link and alt.\n"
+        "code_span and snake_case_name stay.\n\n"
+        "quoted\n\n"
+        "**kept verbatim**"
+    )
+
+
+def test_email_prefers_plain_text_and_records_headers(tmp_path):
+    path = tmp_path / "mail.eml"
+    path.write_text(
+        "From: Alice <a@example.com>\nSubject: Hello\nMIME-Version: 1.0\n"
+        "Content-Type: multipart/alternative; boundary=XX\n\n"
+        "--XX\nContent-Type: text/plain\n\nPlain body\n"
+        "--XX\nContent-Type: text/html\n\n<p>HTML body</p>\n--XX--\n"
+    )
+    document = EmailTextLoader(str(path)).load()[0]
+    assert document.page_content == "Plain body"
+    assert document.metadata["subject"] == "Hello"
+    assert document.metadata["from"] == "Alice <a@example.com>"
+
+
+def test_email_html_only(tmp_path):
+    path = tmp_path / "mail.eml"
+    path.write_text("Subject: x\nContent-Type: text/html\n\n<p>Only <b>html</b></p>\n")
+    assert EmailTextLoader(str(path)).load()[0].page_content == "Only html"
+
+
+def test_plain_text_falls_back_to_cp1252(tmp_path):
+    path = tmp_path / "legacy.txt"
+    path.write_bytes("na\xefve".encode("cp1252"))
+    assert PlainTextLoader(str(path)).load()[0].page_content == "naïve"
+
+
+def test_looks_like_text(tmp_path):
+    text = tmp_path / "notes.log"
+    text.write_text("plain text")
+    binary = tmp_path / "blob.bin"
+    binary.write_bytes(b"\x00\x01\x02binary")
+    assert looks_like_text(str(text))
+    assert not looks_like_text(str(binary))
+    assert ingest.get_loader_for(str(text), ".log") == ("PlainTextLoader", {})
+    assert ingest.get_loader_for(str(binary), ".bin") == ("UnstructuredFileLoader", {})
+
+
+def test_failing_fast_loader_falls_back(tmp_path, monkeypatch):
+    path = tmp_path / "page.html"
+    path.write_text("<html></html>")
+    tried = []
+
+    class Fallback:
+        def __init__(self, file_path, **kwargs):
+            tried.append(file_path)
+        def load(self):
+            return ["parsed by fallback"]
+
+    monkeypatch.setitem(ingest._loader_classes, "UnstructuredHTMLLoader", Fallback)
+    assert ingest._parse_document(str(path), "HTMLTextLoader", {}) == ["parsed by fallback"]
+    assert tried == [str(path)]
@@ -0,0 +1,47 @@
+import pytest
+
+import ollama_client
+from ollama_client import CircuitBreaker, OllamaUnavailableError
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ollama_client.time, "monotonic", lambda: now[0])
+    return now
+
+
+def open_breaker(clock):
+    breaker = CircuitBreaker(threshold=2, reset_seconds=30)
+    breaker.record_failure()
+    assert not breaker.before_call() # Closed: an ordinary call
+    breaker.record_failure()
+    with pytest.raises(OllamaUnavailableError):
+        breaker.before_call()
+    clock[0] += 31
+    return breaker
+
+
+def test_only_one_trial_call_when_half_open(clock):
+    breaker = open_breaker(clock)
+    assert breaker.before_call() # The trial
+    with pytest.raises(OllamaUnavailableError, match="trial"):
+        breaker.before_call()
+    breaker.record_success()
+    assert not breaker.is_open
+    assert not breaker.before_call()
+
+
+def test_failed_trial_reopens_the_circuit(clock):
+    breaker = open_breaker(clock)
+    assert breaker.before_call()
+    breaker.record_failure()
+    with pytest.raises(OllamaUnavailableError, match="retrying in 30s"):
+        breaker.before_call()
+
+
+def test_trial_without_outcome_lets_the_next_call_try(clock):
+    breaker = open_breaker(clock)
+    assert breaker.before_call()
+    breaker.end_trial() # E.g. cancelled
+    assert breaker.before_call()
@@ -0,0 +1,36 @@
+import pytest
+
+import ingest
+import reindex
+import tokenizer
+import vectorstore
+
+pymupdf = pytest.importorskip("pymupdf")
+
+
+@pytest.fixture
+def large_pdf(tmp_path, monkeypatch):
+    monkeypatch.setattr(tokenizer, "get_tokenizer", lambda kind, model_name=None: None)
+    monkeypatch.setattr(ingest, "PDF_PARALLEL_MIN_PAGES", 3)
+    monkeypatch.setattr(ingest, "PDF_PAGE_RANGE_SIZE", 2)
+    path = tmp_path / "large.pdf"
+    with pymupdf.open() as pdf:
+        for number in range(5):
+            pdf.new_page().insert_text((72, 72), f"Text of page {number + 1}")
+        pdf.save(str(path))
+    return str(path)
+
+
+def test_rechunking_reads_large_pdfs_in_page_ranges(large_pdf, store, monkeypatch):
+    def load_whole_file(path):
+        raise AssertionError("large PDFs must not be loaded in one piece")
+
+    monkeypatch.setattr(reindex, "load_single_document", load_whole_file)
+    assert ingest.is_large_pdf(large_pdf)
+    model_name = vectorstore.embeddings_model_of(vectorstore.active_version())
+    assert reindex._rechunk_files(store, store.embeddings, [large_pdf], {}, model_name) == 5
+    stored = store._collection.get(where={"source": large_pdf}, include=["documents", "metadatas"])
+    pages = sorted(zip((metadata["page"] for metadata in stored["metadatas"]), stored["documents"]))
+    assert [page for page, _ in pages] == [0, 1, 2, 3, 4]
+    assert pages[4][1].strip() == "Text of page 5"
+    vectorstore.delete_documents([large_pdf])
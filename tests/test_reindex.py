@@ -0,0 +1,48 @@
+import uuid
+
+import pytest
+from langchain_core.documents import Document
+
+import ingest
+import reindex
+import tokenizer
+import vectorstore
+
+
+@pytest.fixture
+def target(store):
+    """A new, empty store version with the active version's (fake) embedding model."""
+    version = f"reindex-{uuid.uuid4().hex}"
+    vectorstore.register_version(version, vectorstore.embeddings_model_of(vectorstore.active_version()), status="building")
+    return vectorstore.get_vectorstore(version)
+
+
+@pytest.fixture(autouse=True)
+def no_dedup(monkeypatch):
+    monkeypatch.setattr(ingest, "DEDUP_MODE", "off")
+    monkeypatch.setattr(tokenizer, "get_tokenizer", lambda kind, model_name=None: None)
+
+
+def test_stored_chunks_are_copied_page_by_page(store, target, monkeypatch):
+    source = f"long-{uuid.uuid4().hex}.txt"
+    ingest.add_chunks_to_vectorstore(store, store.embeddings, [Document(page_content=f"chunk {i}", metadata={"source": source}) for i in range(5)])
+    monkeypatch.setattr(reindex, "REINDEX_BATCH_SIZE", 2)
+    pages = list(reindex._chunks_from_store(vectorstore.active_version(), [source]))
+    assert [len(page) for page in pages] == [2, 2, 1]
+
+    assert ingest.add_chunk_batches_to_vectorstore(target, store.embeddings, iter(pages)) == 5
+    assert len(target._collection.get(where={"source": source})["ids"]) == 5
+    # One document index entry from all pages, not just the last one
+    entry = vectorstore.get_document_index(target._collection.name).get(ids=[source])
+    assert entry["metadatas"][0]["chunks"] == 5
+    vectorstore.delete_documents([source])
+
+
+def test_rechunking_skips_a_file_that_fails(tmp_path, target, store):
+    good = tmp_path / "good.csv"
+    good.write_text("id,name\n1,one\n2,two\n", encoding="utf-8")
+    stats = {}
+    model_name = vectorstore.embeddings_model_of(vectorstore.active_version())
+    written = reindex._rechunk_files(target, store.embeddings, [str(tmp_path / "missing.csv"), str(good)], stats, model_name)
+    assert written == len(target._collection.get(where={"source": str(good)})["ids"]) > 0
+    assert stats["failed_files"] == 1
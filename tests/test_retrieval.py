@@ -0,0 +1,49 @@
+import uuid
+
+import pytest
+
+import privateGPT
+import vectorstore
+
+
+@pytest.fixture
+def corpus(store, monkeypatch):
+    """Document 'a' has many chunks close to the query, 'b' two farther ones, 'c' is off topic."""
+    monkeypatch.setattr(privateGPT, "TWO_TIER_RETRIEVAL", True)
+    monkeypatch.setattr(privateGPT, "DOCUMENT_CANDIDATES", 2)
+    monkeypatch.setattr(privateGPT, "MAX_CHUNKS_PER_DOCUMENT", 2)
+    monkeypatch.setattr(privateGPT, "DEDUP_MODE", "off")
+    version = f"retrieval-{uuid.uuid4().hex}"
+    db = vectorstore.get_vectorstore(version)
+    chunks = [("a", [1.0, 0.01 * i]) for i in range(6)] + [("b", [0.8, 0.5]), ("b", [0.8, 0.6]), ("c", [-1.0, 0.0])]
+    db._collection.upsert(
+        ids=[f"{source}{i}" for i, (source, _) in enumerate(chunks)],
+        embeddings=[vector for _, vector in chunks],
+        documents=[f"text {i}" for i in range(len(chunks))],
+        metadatas=[{"source": source} for source, _ in chunks],
+    )
+    vectorstore.get_document_index(version).upsert(
+        ids=["a", "b", "c"], embeddings=[[1.0, 0.0], [0.8, 0.55], [-1.0, 0.0]], metadatas=[{"source": s} for s in "abc"]
+    )
+    queries = []
+    query_chunks = privateGPT.query_chunks
+    monkeypatch.setattr(privateGPT, "query_chunks", lambda *args, **kwargs: queries.append(kwargs.get("where")) or query_chunks(*args, **kwargs))
+    return db, queries
+
+
+def sources_of(hits):
+    return [chunk.metadata["source"] for chunk, _ in hits]
+
+
+def test_candidates_are_searched_in_one_query(corpus):
+    db, queries = corpus
+    assert sources_of(privateGPT.retrieve_chunks(db, [1.0, 0.0], k=2)) == ["a", "a"]
+    assert queries == [{"source": {"$in": ["a", "b"]}}]
+
+
+def test_documents_crowded_out_by_the_cap_are_searched_again(corpus):
+    db, queries = corpus
+    hits = privateGPT.retrieve_chunks(db, [1.0, 0.0], k=4)
+    assert sources_of(hits) == ["a", "a", "b", "b"]
+    assert [distance for _, distance in hits] == sorted(distance for _, distance in hits)
+    assert queries == [{"source": {"$in": ["a", "b"]}}, {"source": {"$in": ["b"]}}]
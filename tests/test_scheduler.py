@@ -0,0 +1,117 @@
+import time
+import asyncio
+
+import pytest
+
+from scheduler import LLMScheduler, DeadlineExceeded, PRIORITY_BATCH, PRIORITY_INTERACTIVE, worker_share
+
+
+async def idle():
+    return "done"
+
+
+async def hold_slot(scheduler, release: asyncio.Event, **kwargs):
+    """Starts a job that keeps its slot until `release` is set."""
+    started = asyncio.Event()
+
+    async def job():
+        started.set()
+        await release.wait()
+
+    task = asyncio.create_task(scheduler.run(job, **kwargs))
+    await started.wait()
+    return task
+
+
+def test_slots_are_split_between_api_workers():
+    assert worker_share(4, workers=1) == 4
+    assert worker_share(4, workers=2) == 2
+    assert worker_share(5, workers=2) == 2 # Never more than LLM_MAX_CONCURRENCY in total
+    assert worker_share(2, workers=4) == 1 # But every worker can run something
+
+
+def test_at_most_max_concurrency_jobs_run_at_once():
+    async def main():
+        scheduler = LLMScheduler(max_concurrency=2, batch_max_concurrency=2)
+        running, peak = 0, 0
+
+        async def job():
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return "done"
+
+        results = await asyncio.gather(*(scheduler.run(job, user=f"u{i}") for i in range(5)))
+        assert results == ["done"] * 5
+        assert peak == 2
+        assert scheduler.active_count() == 0
+
+    asyncio.run(main())
+
+
+def test_interactive_work_goes_first_and_users_take_turns():
+    async def main():
+        scheduler = LLMScheduler(max_concurrency=1, batch_max_concurrency=1)
+        release = asyncio.Event()
+        blocker = await hold_slot(scheduler, release, user="blocker")
+        order = []
+
+        def job(name):
+            async def record():
+                order.append(name)
+            return record
+
+        waiting = [
+            asyncio.create_task(scheduler.run(job("batch"), priority=PRIORITY_BATCH, user="a")),
+            asyncio.create_task(scheduler.run(job("a1"), user="a")),
+            asyncio.create_task(scheduler.run(job("a2"), user="a")),
+            asyncio.create_task(scheduler.run(job("b1"), user="b")),
+        ]
+        await asyncio.sleep(0)
+        assert scheduler.queue_depth() == 4
+        release.set()
+        await asyncio.gather(blocker, *waiting)
+        assert order == ["a1", "b1", "a2", "batch"]
+
+    asyncio.run(main())
+
+
+def test_batch_work_leaves_slots_for_interactive_queries():
+    async def main():
+        scheduler = LLMScheduler(max_concurrency=2, batch_max_concurrency=1)
+        release = asyncio.Event()
+        batch = await hold_slot(scheduler, release, priority=PRIORITY_BATCH)
+        second_batch = asyncio.create_task(scheduler.run(idle, priority=PRIORITY_BATCH))
+        await asyncio.sleep(0)
+        assert scheduler.queue_depth(PRIORITY_BATCH) == 1 # The free slot is kept for interactive work
+        interactive = await hold_slot(scheduler, release, priority=PRIORITY_INTERACTIVE)
+        release.set()
+        await asyncio.gather(batch, interactive)
+        assert await second_batch == "done"
+
+    asyncio.run(main())
+
+
+def test_deadline_and_cancellation_free_the_queue():
+    async def main():
+        scheduler = LLMScheduler(max_concurrency=1, batch_max_concurrency=1)
+        release = asyncio.Event()
+        blocker = await hold_slot(scheduler, release)
+
+        with pytest.raises(DeadlineExceeded):
+            await scheduler.run(idle, deadline=time.monotonic() + 0.01)
+        cancelled = asyncio.create_task(scheduler.run(idle))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        assert scheduler.queue_depth() == 0
+
+        release.set()
+        await blocker
+        assert await scheduler.run(idle) == "done"
+        assert scheduler.active_count() == 0
+
+    asyncio.run(main())
@@ -0,0 +1,38 @@
+import uuid
+
+from sessions import SessionStore
+
+
+def stores():
+    return SessionStore(shared=True), SessionStore(shared=True) # Two API workers
+
+
+def test_turns_saved_by_one_worker_reach_the_other():
+    a, b = stores()
+    session_id = uuid.uuid4().hex
+    session = a.get_or_create(session_id)
+    session.add_turn("question", "answer", [1, 2, 3])
+    a.save(session)
+    loaded = b.get_or_create(session_id)
+    assert list(loaded.turns) == [("question", "answer")]
+    assert list(loaded.ollama_context) == [1, 2, 3]
+
+
+def test_session_deleted_by_one_worker_ends_on_the_other():
+    a, b = stores()
+    session_id = uuid.uuid4().hex
+    session = a.get_or_create(session_id)
+    session.add_turn("question", "answer", None)
+    a.save(session)
+    assert list(b.get_or_create(session_id).turns) # Now cached by b as well
+
+    assert a.delete(session_id)
+    restarted = b.get_or_create(session_id)
+    assert list(restarted.turns) == []
+    assert restarted.ollama_context is None
+
+
+def test_unsaved_local_session_is_kept():
+    store = SessionStore(shared=True)
+    session = store.get_or_create()
+    assert store.get_or_create(session.session_id) is session
@@ -0,0 +1,57 @@
+import uuid
+
+import shared_state
+from shared_state import JobStore
+
+
+def make_store() -> JobStore:
+    return JobStore(f"test-{uuid.uuid4().hex}", "status", ("PENDING", "IN_PROGRESS"), "FAILED")
+
+
+def test_job_is_readable_from_another_store(monkeypatch):
+    store = make_store()
+    store["job"] = {"status": "IN_PROGRESS", "done": 0}
+    other = JobStore(store.kind, "status", store.unfinished, store.failed)
+    assert other["job"] == {"status": "IN_PROGRESS", "done": 0}
+    assert list(other) == ["job"]
+    assert len(other) == 1
+
+
+def test_quiet_running_job_keeps_being_written(monkeypatch):
+    store = make_store()
+    job = {"status": "IN_PROGRESS"}
+    store["job"] = job
+    monkeypatch.setattr(shared_state, "IDLE_JOB_SECONDS", -1)
+    store.flush() # Unchanged for "too long", but still running
+    assert store["job"] is job
+
+    job["status"] = "COMPLETED" # Updated in place by the job, as the API wrappers do
+    store.flush()
+    reader = JobStore(store.kind, "status", store.unfinished, store.failed)
+    assert reader["job"]["status"] == "COMPLETED"
+
+
+def test_finished_idle_job_is_dropped_from_memory(monkeypatch):
+    store = make_store()
+    job = {"status": "COMPLETED"}
+    store["job"] = job
+    monkeypatch.setattr(shared_state, "IDLE_JOB_SECONDS", -1)
+    store.flush()
+    assert store["job"] is not job
+    assert store["job"] == job
+
+
+def test_unfinished_job_of_exited_process_is_failed(monkeypatch):
+    store = make_store()
+    store["job"] = {"status": "IN_PROGRESS"}
+    reader = JobStore(store.kind, "status", store.unfinished, store.failed)
+    monkeypatch.setattr(shared_state, "_process_alive", lambda pid: False)
+    assert reader["job"]["status"] == "FAILED"
+    assert "error" in reader["job"]
+
+
+def test_delete():
+    store = make_store()
+    store["job"] = {"status": "COMPLETED"}
+    del store["job"]
+    assert "job" not in store
@@ -0,0 +1,70 @@
+import uuid
+
+import numpy as np
+import pytest
+
+import transfer
+import vectorstore
+from constants import EMBEDDINGS_MODEL_NAME
+
+
+@pytest.fixture
+def source_version(store):
+    version = f"export-{uuid.uuid4().hex}"
+    vectorstore.register_version(version, EMBEDDINGS_MODEL_NAME, status="ready")
+    vectorstore.get_vectorstore(version)._collection.upsert(
+        ids=["c1", "c2", "c3"],
+        embeddings=[[0.5, 1.0, 0.0], [0.25, 0.0, 1.0], [1.0, 1.0, 1.0]],
+        documents=["first chunk", "second chunk", "third chunk"],
+        metadatas=[{"source": "a.txt", "page": 1}, {"source": "a.txt", "dedup_group": "c1"}, {"source": "b.txt"}],
+    )
+    return version
+
+
+def stored(version):
+    page = vectorstore.get_vectorstore(version)._collection.get(include=["documents", "metadatas", "embeddings"])
+    order = np.argsort(page["ids"])
+    return (
+        [page["ids"][i] for i in order],
+        [page["documents"][i] for i in order],
+        [page["metadatas"][i] for i in order],
+        np.asarray(page["embeddings"])[order],
+    )
+
+
+@pytest.mark.parametrize("extension", [".parquet", ".arrow"])
+def test_export_import_round_trip(source_version, tmp_path, extension):
+    path = str(tmp_path / f"corpus{extension}")
+    assert transfer.export_store(path, source_version, batch_size=2)["chunks"] == 3
+
+    result = transfer.import_store(path, activate=False, batch_size=2)
+    assert (result["chunks"], result["documents"], result["activated"]) == (3, 2, False)
+    ids, documents, metadatas, embeddings = stored(result["version"])
+    original = stored(source_version)
+    assert (ids, documents, metadatas) == original[:3]
+    assert np.allclose(embeddings, original[3])
+    details = vectorstore.list_versions()["versions"][result["version"]]
+    assert (details["status"], details["embeddings_model"]) == ("ready", EMBEDDINGS_MODEL_NAME)
+    assert sorted(vectorstore.get_document_index(result["version"]).get()["ids"]) == ["a.txt", "b.txt"]
+
+
+def test_import_rejects_other_files(tmp_path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    path = str(tmp_path / "other.parquet")
+    pq.write_table(pa.table({"id": ["x"]}), path)
+    with pytest.raises(ValueError, match="not a store export"):
+        transfer.import_store(path)
+
+
+def test_export_and_import_do_not_load_the_embedding_model(source_version, tmp_path, monkeypatch):
+    def load_model(model_name=None):
+        raise AssertionError("the stored embeddings are copied as they are")
+
+    monkeypatch.setattr(vectorstore, "get_embeddings", load_model)
+    monkeypatch.setattr(vectorstore, "_vectorstores", {})
+    path = str(tmp_path / "corpus.parquet")
+    transfer.export_store(path, source_version)
+    result = transfer.import_store(path, activate=False)
+    assert vectorstore.get_chroma_client().get_collection(result["version"]).count() == 3
+    assert result["documents"] == 2
@@ -0,0 +1,31 @@
+import json
+import os
+
+import vectorstore
+
+
+def test_scripts_use_the_running_chroma_server(monkeypatch, tmp_path):
+    monkeypatch.setattr(vectorstore, "CHROMA_SERVER_HOST", "")
+    monkeypatch.setattr(vectorstore, "CHROMA_SERVER_FILE", str(tmp_path / "chroma_server.json"))
+    assert vectorstore.chroma_server_address() is None
+
+    vectorstore.write_chroma_server_file(os.getpid(), "127.0.0.1", 8123)
+    assert vectorstore.chroma_server_address() == ("127.0.0.1", 8123)
+
+    # A server that is gone (e.g. the API was killed) is ignored
+    (tmp_path / "chroma_server.json").write_text(json.dumps({"pid": 2**22 + 1, "host": "127.0.0.1", "port": 8123}))
+    assert vectorstore.chroma_server_address() is None
+
+    vectorstore.remove_chroma_server_file()
+    vectorstore.remove_chroma_server_file() # Already removed
+    assert vectorstore.chroma_server_address() is None
+
+
+def test_versions_deleted_by_another_worker_are_forgotten(monkeypatch):
+    monkeypatch.setattr(vectorstore, "_vectorstores", {"old": object(), vectorstore.active_version(): object()})
+    monkeypatch.setattr(vectorstore, "_document_indexes", {"old": object()})
+    # Another worker deleted 'old' (and so rewrote the state file)
+    monkeypatch.setattr(vectorstore, "_store_state_mtime", None)
+    vectorstore.list_versions()
+    assert list(vectorstore._vectorstores) == [vectorstore.active_version()]
+    assert vectorstore._document_indexes == {}
@@ -0,0 +1,95 @@
+import sys
+from functools import lru_cache
+from typing import List, Optional
+
+from constants import EMBEDDINGS_MODEL_NAME, OLLAMA_MODEL_NAME, LLM_TOKENIZER_NAME
+
+
+# --- Shared Token Counting ---
+# One tokenizer per model, loaded once (tokenizer.json from the Hugging Face Hub, via
+# the `tokenizers` library) and shared by ingestion, the query path and summarization.
+# When no tokenizer can be loaded, counting falls back to a deliberately pessimistic
+# estimate of about 3 characters per token.
+
+EMBEDDING = "embedding"
+LLM = "llm"
+
+# Hugging Face tokenizers matching common Ollama models (the name before the ':' tag)
+OLLAMA_TOKENIZERS = {
+    "phi3": "microsoft/Phi-3-mini-4k-instruct",
+    "llama3": "meta-llama/Meta-Llama-3-8B-Instruct",
+    "llama3.1": "meta-llama/Llama-3.1-8B-Instruct",
+    "mistral": "mistralai/Mistral-7B-Instruct-v0.3",
+    "qwen2": "Qwen/Qwen2-7B-Instruct",
+    "qwen2.5": "Qwen/Qwen2.5-7B-Instruct",
+    "gemma2": "google/gemma-2-9b-it",
+}
+
+
+def tokenizer_name(kind: str, model_name: Optional[str] = None) -> Optional[str]:
+    """
+    Hugging Face repository of the tokenizer for `kind` (EMBEDDING or LLM), if known.
+    For EMBEDDING, `model_name` is the embedding model (by default EMBEDDINGS_MODEL_NAME).
+    """
+    if kind == EMBEDDING:
+        model_name = model_name or EMBEDDINGS_MODEL_NAME
+        # sentence-transformers accepts short names such as 'all-MiniLM-L6-v2' for its own models
+        return model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+    if kind == LLM:
+        return LLM_TOKENIZER_NAME or OLLAMA_TOKENIZERS.get(OLLAMA_MODEL_NAME.split(":")[0])
+    raise ValueError(f"Unknown tokenizer kind '{kind}', expected '{EMBEDDING}' or '{LLM}'.")
+
+
+@lru_cache(maxsize=None)
+def get_tokenizer(kind: str, model_name: Optional[str] = None):
+    """Returns the shared `tokenizers.Tokenizer` for `kind` (and `model_name`), or None to use the estimate."""
+    name = tokenizer_name(kind, model_name)
+    if not name:
+        return None
+    try:
+        from tokenizers import Tokenizer
+        tokenizer = Tokenizer.from_pretrained(name)
+    except Exception as e:
+        print(f"Warning: Could not load the {kind} tokenizer '{name}': {e}. Token counts are estimated.", file=sys.stderr)
+        return None
+    tokenizer.no_truncation()
+    tokenizer.no_padding()
+    return tokenizer
+
+
+def _estimate_tokens(text: str) -> int:
+    return len(text) // 3 + 1
+
+
+@lru_cache(maxsize=1024)
+def count_tokens(text: str, kind: str = LLM, model_name: Optional[str] = None) -> int:
+    """
+    Number of tokens in `text` for `kind` (and, for EMBEDDING, the embedding model
+    `model_name`), without special tokens.
+    Results are memoized: prompt templates and text splitter pieces are counted repeatedly.
+    """
+    tokenizer = get_tokenizer(kind, model_name)
+    if tokenizer is None:
+        return _estimate_tokens(text)
+    return len(tokenizer.encode(text, add_special_tokens=False).ids)
+
+
+def count_tokens_batch(texts: List[str], kind: str = LLM, model_name: Optional[str] = None) -> List[int]:
+    """Token counts for many texts at once; the tokenizer encodes them in parallel."""
+    tokenizer = get_tokenizer(kind, model_name)
+    if tokenizer is None:
+        return [_estimate_tokens(text) for text in texts]
+    return [len(encoding.ids) for encoding in tokenizer.encode_batch(texts, add_special_tokens=False)]
+
+
+def truncate_to_tokens(text: str, max_tokens: int, kind: str = LLM, model_name: Optional[str] = None) -> str:
+    """Returns the longest prefix of `text` that fits in `max_tokens` tokens."""
+    if max_tokens <= 0:
+        return ""
+    tokenizer = get_tokenizer(kind, model_name)
+    if tokenizer is None:
+        return text if _estimate_tokens(text) <= max_tokens else text[:(max_tokens - 1) * 3]
+    offsets = tokenizer.encode(text, add_special_tokens=False).offsets
+    if len(offsets) <= max_tokens:
+        return text
+    return text[:offsets[max_tokens - 1][1]]
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+import os
+import json
+import argparse
+from typing import Any, Dict, Iterator, Optional
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from tqdm import tqdm
+
+from constants import TRANSFER_BATCH_SIZE, DEDUP_MODE
+
+from metrics import stage_timer
+from vectorstore import (
+    get_chroma_client,
+    active_version,
+    embeddings_model_of,
+    list_versions,
+    register_version,
+    activate_version,
+)
+
+
+# --- Columnar Export/Import ---
+# A store version is exported as a table of chunk ids, texts, metadata (as JSON) and
+# embeddings, in Parquet (compact, for moving between environments) or Arrow IPC
+# files (.arrow/.feather, memory-mapped on import so the embeddings are not copied).
+# Importing loads the vectors straight into a new store version; the embedding model
+# is never called, so a new node comes up without re-parsing or re-embedding.
+
+FORMAT_VERSION = "1"
+IPC_EXTENSIONS = (".arrow", ".feather", ".ipc")
+
+
+def _schema(dimension: int, metadata: Dict[str, str]) -> pa.Schema:
+    return pa.schema(
+        [
+            ("id", pa.string()),
+            ("document", pa.string()),
+            ("metadata", pa.string()),
+            ("embedding", pa.list_(pa.float32(), dimension)),
+        ],
+        metadata={key.encode("utf8"): value.encode("utf8") for key, value in metadata.items()},
+    )
+
+def _is_ipc(path: str) -> bool:
+    return os.path.splitext(path)[1].lower() in IPC_EXTENSIONS
+
+
+def _stored_batches(version: str, batch_size: int) -> Iterator[Dict[str, Any]]:
+    """The chunks of a store version with their embeddings, `batch_size` at a time."""
+    collection = get_chroma_client().get_collection(version)
+    offset = 0
+    while True:
+        page = collection.get(include=["documents", "metadatas", "embeddings"], limit=batch_size, offset=offset)
+        if not page["ids"]:
+            return
+        yield page
+        offset += len(page["ids"])
+
+def export_store(path: str, version: Optional[str] = None, batch_size: int = TRANSFER_BATCH_SIZE) -> Dict[str, Any]:
+    """
+    Writes every chunk of `version` (the active version by default) to `path`, one
+    record batch (Parquet row group) per `batch_size` chunks, so memory use stays
+    bounded. The embedding model is recorded in the file's schema metadata.
+    """
+    version = version or active_version()
+    collection = get_chroma_client().get_collection(version)
+    total = collection.count()
+    file_metadata = {
+        "format_version": FORMAT_VERSION,
+        "store_version": version,
+        "embeddings_model": embeddings_model_of(version),
+    }
+
+    writer = None
+    written = 0
+    try:
+        with stage_timer("transfer", "export"), tqdm(total=total, desc="Exporting chunks", ncols=80) as pbar:
+            for page in _stored_batches(version, batch_size):
+                vectors = np.asarray(page["embeddings"], dtype=np.float32)
+                if writer is None:
+                    schema = _schema(vectors.shape[1], {**file_metadata, "dimension": str(vectors.shape[1])})
+                    writer = pa.ipc.new_file(path, schema) if _is_ipc(path) else pq.ParquetWriter(path, schema, compression="zstd")
+                batch = pa.record_batch(
+                    [
+                        pa.array(page["ids"], pa.string()),
+                        pa.array(page["documents"], pa.string()),
+                        pa.array([json.dumps(metadata) if metadata else None for metadata in page["metadatas"]], pa.string()),
+                        pa.FixedSizeListArray.from_arrays(pa.array(vectors.reshape(-1), pa.float32()), vectors.shape[1]),
+                    ],
+                    schema=schema,
+                )
+                writer.write_batch(batch)
+                written += len(page["ids"])
+                pbar.update(len(page["ids"]))
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        raise ValueError(f"Store version '{version}' is empty, nothing to export.")
+    print(f"Exported {written} chunks of store version '{version}' to {path}.")
+    return {"version": version, "chunks": written, "path": path}
+
+
+def _file_batches(path: str, batch_size: int):
+    """Returns the file's schema and an iterator over its record batches."""
+    if _is_ipc(path):
+        # Memory-mapped: the embedding buffers are read in place, without copying
+        reader = pa.ipc.open_file(pa.memory_map(path, "r"))
+        batches = [reader.get_batch(i) for i in range(reader.num_record_batches)]
+        return reader.schema, iter(batches), sum(batch.num_rows for batch in batches)
+    parquet_file = pq.ParquetFile(path, memory_map=True)
+    return parquet_file.schema_arrow, parquet_file.iter_batches(batch_size=batch_size), parquet_file.metadata.num_rows
+
+def import_store(
+    path: str,
+    version: Optional[str] = None,
+    activate: bool = True,
+    batch_size: int = TRANSFER_BATCH_SIZE,
+) -> Dict[str, Any]:
+    """
+    Loads an exported file into a new store version (named like a reindex version by
+    default) with the stored embeddings, then rebuilds its document-level index and
+    near-duplicate index. With `activate`, the version becomes active once complete.
+    """
+    from reindex import new_version_name
+    from ingest import rebuild_document_index
+
+    schema, batches, total = _file_batches(path, batch_size)
+    file_metadata = {key.decode("utf8"): value.decode("utf8") for key, value in (schema.metadata or {}).items()}
+    if file_metadata.get("format_version") != FORMAT_VERSION or "embeddings_model" not in file_metadata:
+        raise ValueError(f"{path} is not a store export (format version {FORMAT_VERSION}).")
+    embeddings_model = file_metadata["embeddings_model"]
+    version = version or new_version_name()
+    if version in list_versions()["versions"]:
+        raise ValueError(f"Store version '{version}' already exists.")
+    register_version(version, embeddings_model, status="building", imported_from=os.path.abspath(path))
+
+    # The bare collection: the stored vectors are upserted as they are, so the version's
+    # embedding model is not needed (and not loaded or downloaded)
+    collection = get_chroma_client().get_or_create_collection(version)
+    max_batch_size = collection._client.get_max_batch_size()
+    duplicate_index = None
+    if DEDUP_MODE != "off":
+        from dedup import get_duplicate_index
+        duplicate_index = get_duplicate_index()
+    imported = 0
+    try:
+        with stage_timer("transfer", "import"), tqdm(total=total, desc="Importing chunks", ncols=80) as pbar:
+            for batch in batches:
+                ids = batch.column("id").to_pylist()
+                documents = batch.column("document").to_pylist()
+                metadatas = [json.loads(metadata) if metadata else None for metadata in batch.column("metadata").to_pylist()]
+                embedding_column = batch.column("embedding")
+                # A view of the file's (or the decoded batch's) float32 buffer, no per-vector Python lists
+                vectors = embedding_column.flatten().to_numpy().reshape(len(ids), embedding_column.type.list_size)
+                for start in range(0, len(ids), max_batch_size):
+                    end = start + max_batch_size
+                    collection.upsert(ids=ids[start:end], embeddings=vectors[start:end], metadatas=metadatas[start:end], documents=documents[start:end])
+                if duplicate_index is not None:
+                    _index_duplicates(duplicate_index, version, ids, documents, metadatas)
+                imported += len(ids)
+                pbar.update(len(ids))
+
+        with stage_timer("transfer", "document_index"):
+            documents_indexed = rebuild_document_index(version)
+        register_version(version, embeddings_model, status="ready", chunks=imported, documents=documents_indexed)
+    except BaseException as e:
+        register_version(version, embeddings_model, status="failed", error=str(e))
+        raise
+    if activate:
+        activate_version(version)
+    print(f"Imported {imported} chunks into store version '{version}'" + (" (now active)." if activate else "."))
+    return {"version": version, "chunks": imported, "documents": documents_indexed, "activated": activate}
+
+def _index_duplicates(duplicate_index, version: str, ids, documents, metadatas) -> None:
+    """Adds the imported chunks to the near-duplicate index, keeping their recorded canonical chunk."""
+    from dedup import minhash_signature, band_buckets
+    for chunk_id, text, metadata in zip(ids, documents, metadatas):
+        signature = minhash_signature(text)
+        canonical_id = (metadata or {}).get("dedup_group", chunk_id)
+        duplicate_index.add(version, chunk_id, canonical_id, signature, band_buckets(signature))
+    duplicate_index.commit()
+
+
+def main():
+    args = parse_arguments()
+    if args.command == "export":
+        export_store(args.path, args.version, args.batch_size)
+    else:
+        import_store(args.path, args.version, activate=not args.no_activate, batch_size=args.batch_size)
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='transfer: Export or import a vector store version with its embeddings as Parquet or Arrow files.')
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export_parser = subparsers.add_parser("export", help='Write a store version to a file.')
+    export_parser.add_argument("path", help='Output file: .parquet, or .arrow/.feather for Arrow IPC.')
+    export_parser.add_argument("--version", default=None, help='Store version to export (default: the active one).')
+    import_parser = subparsers.add_parser("import", help='Load a file into a new store version without re-embedding.')
+    import_parser.add_argument("path", help='File written by `transfer.py export`.')
+    import_parser.add_argument("--version", default=None, help='Name of the new store version (default: generated).')
+    import_parser.add_argument("--no-activate", action='store_true', help='Import without making the new version active.')
+    for subparser in (export_parser, import_parser):
+        subparser.add_argument("--batch-size", type=int, default=TRANSFER_BATCH_SIZE,
+                               help=f'Chunks read and written per batch (default: {TRANSFER_BATCH_SIZE}).')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main()
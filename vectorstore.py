@@ -0,0 +1,319 @@
+import os
+import json
+import datetime
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from constants import EMBEDDINGS_MODEL_NAME, EMBEDDINGS_MAX_SEQ_LENGTH, PERSIST_DIRECTORY, CHROMA_SERVER_HOST, CHROMA_SERVER_PORT
+
+
+# --- Shared Embeddings and Vector Store ---
+# Loading the embedding model takes seconds, so one instance is created lazily and
+# shared by queries and ingestion for the lifetime of the process.
+_lock = threading.RLock()
+_embeddings: Dict[str, Any] = {}
+_vectorstores: Dict[str, Any] = {}
+_document_indexes: Dict[str, Any] = {}
+_client = None
+
+
+class StoreWriteLock:
+    """
+    Held while chunks are written to the active store version, so that a reindex can
+    copy the last ingested documents and swap versions without missing any.
+    Besides a thread lock it takes an exclusive lock on a file in PERSIST_DIRECTORY
+    (where the OS supports it), so writers in other processes (API workers, the ingest
+    and reindex scripts) wait for each other too.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._thread_lock = threading.Lock()
+        self._file = None
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        try:
+            import fcntl
+        except ImportError: # Windows: threads of this process only
+            return self
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._file = open(self.path, "a")
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        except BaseException:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._thread_lock.release()
+            raise
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._file is not None:
+            import fcntl
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+        self._thread_lock.release()
+
+store_write_lock = StoreWriteLock(os.path.join(PERSIST_DIRECTORY, "store_write.lock"))
+
+
+# --- Store Versions ---
+# The vector store is versioned: every version is a separate Chroma collection (plus
+# its document-level index) in PERSIST_DIRECTORY. A small JSON file names the active
+# version and the embedding model of each version. It is replaced atomically, so a
+# reindex can build a new version next to the live one and switch over at once.
+STORE_VERSIONS_FILE = os.path.join(PERSIST_DIRECTORY, "store_versions.json")
+
+# Collection used before the store was versioned (LangChain's default collection name)
+LEGACY_COLLECTION = "langchain"
+
+_store_state: Optional[Dict[str, Any]] = None
+_store_state_mtime: Optional[float] = None
+
+
+def _read_store_state() -> Dict[str, Any]:
+    """
+    Returns the store version state, re-reading the file when it changed (e.g. another
+    worker swapped versions). Created on first use with the legacy collection active.
+    """
+    global _store_state, _store_state_mtime
+    with _lock:
+        try:
+            mtime = os.stat(STORE_VERSIONS_FILE).st_mtime
+        except FileNotFoundError:
+            mtime = None
+        if mtime is None:
+            if _store_state is None:
+                _store_state = {
+                    "active": LEGACY_COLLECTION,
+                    "previous": None,
+                    "versions": {LEGACY_COLLECTION: {"embeddings_model": EMBEDDINGS_MODEL_NAME, "created_at": None}},
+                }
+                _write_store_state(_store_state)
+        elif mtime != _store_state_mtime:
+            with open(STORE_VERSIONS_FILE, "r", encoding="utf8") as f:
+                _store_state = json.load(f)
+            _store_state_mtime = mtime
+            # Drop the handles of versions another process deleted; their collections are gone
+            for handles in (_vectorstores, _document_indexes):
+                for version in [version for version in handles if version not in _store_state["versions"]]:
+                    del handles[version]
+        return _store_state
+
+def _write_store_state(state: Dict[str, Any]) -> None:
+    """Writes the state to a temporary file and renames it over the old one (atomic on POSIX and Windows)."""
+    global _store_state, _store_state_mtime
+    os.makedirs(PERSIST_DIRECTORY, exist_ok=True)
+    temporary_path = f"{STORE_VERSIONS_FILE}.{os.getpid()}.tmp"
+    with open(temporary_path, "w", encoding="utf8") as f:
+        json.dump(state, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary_path, STORE_VERSIONS_FILE)
+    _store_state = state
+    _store_state_mtime = os.stat(STORE_VERSIONS_FILE).st_mtime
+
+def active_version() -> str:
+    """Name of the store version that queries and ingestion use."""
+    return _read_store_state()["active"]
+
+def list_versions() -> Dict[str, Any]:
+    """The active and previous version names and the metadata of every version."""
+    state = _read_store_state()
+    return json.loads(json.dumps(state))
+
+def register_version(version: str, embeddings_model: str, **details: Any) -> None:
+    """
+    Records a (not yet active) version and the embedding model its vectors come from,
+    or updates the details of a registered one.
+    """
+    with _lock:
+        state = json.loads(json.dumps(_read_store_state()))
+        entry = state["versions"].setdefault(version, {"created_at": datetime.datetime.now(datetime.timezone.utc).isoformat()})
+        entry.update(embeddings_model=embeddings_model, **details)
+        _write_store_state(state)
+
+def activate_version(version: str) -> str:
+    """Makes `version` the active one; in-flight queries finish on the version they started with. Returns the previous version."""
+    with _lock:
+        state = json.loads(json.dumps(_read_store_state()))
+        if version not in state["versions"]:
+            raise ValueError(f"Unknown store version '{version}'.")
+        previous = state["active"]
+        if version != previous:
+            state["previous"] = previous
+            state["active"] = version
+            _write_store_state(state)
+        return previous
+
+def rollback_version() -> str:
+    """Re-activates the previous version. Returns the version now active."""
+    previous = _read_store_state().get("previous")
+    if not previous:
+        raise ValueError("There is no previous store version to roll back to.")
+    activate_version(previous)
+    return previous
+
+def delete_version(version: str) -> None:
+    """Deletes an inactive version's collections and frees their disk space."""
+    with _lock:
+        state = json.loads(json.dumps(_read_store_state()))
+        if version == state["active"]:
+            raise ValueError("The active store version cannot be deleted.")
+        if version not in state["versions"]:
+            raise ValueError(f"Unknown store version '{version}'.")
+        client = get_chroma_client()
+        for name in (version, document_index_name(version)):
+            try:
+                client.delete_collection(name)
+            except Exception as e: # Already gone (e.g. a reindex that failed early)
+                print(f"Warning: Could not delete collection '{name}': {e}")
+        from dedup import get_duplicate_index
+        get_duplicate_index().drop_collection(version)
+        _vectorstores.pop(version, None)
+        _document_indexes.pop(version, None)
+        del state["versions"][version]
+        if state.get("previous") == version:
+            state["previous"] = None
+        _write_store_state(state)
+
+def delete_documents(sources: List[str], version: Optional[str] = None) -> int:
+    """
+    Removes the chunks of the source documents from a store version (the active one by
+    default), together with their document-index and near-duplicate index entries.
+    Returns the number of chunks removed.
+    """
+    if not sources:
+        return 0
+    collection = get_vectorstore(version)._collection
+    chunk_ids = collection.get(where={"source": {"$in": list(sources)}}, include=[])["ids"]
+    if chunk_ids:
+        collection.delete(ids=chunk_ids)
+        from dedup import get_duplicate_index
+        get_duplicate_index().remove(collection.name, chunk_ids)
+    get_document_index(collection.name).delete(ids=list(sources))
+    return len(chunk_ids)
+
+def embeddings_model_of(version: str) -> str:
+    return _read_store_state()["versions"].get(version, {}).get("embeddings_model", EMBEDDINGS_MODEL_NAME)
+
+
+def get_embeddings(model_name: Optional[str] = None):
+    """
+    Returns the shared HuggingFaceEmbeddings instance for `model_name` (by default the
+    model of the active store version), loading the model on first use.
+    """
+    model_name = model_name or embeddings_model_of(active_version())
+    if model_name not in _embeddings:
+        with _lock:
+            if model_name not in _embeddings:
+                from langchain_huggingface.embeddings import HuggingFaceEmbeddings
+                print(f"Initializing embeddings with {model_name}...")
+                # Force device to 'cpu' as specified in the original code
+                _embeddings[model_name] = HuggingFaceEmbeddings(model_name=model_name, model_kwargs={'device': 'cpu'})
+                print("Embeddings initialized.")
+    return _embeddings[model_name]
+
+
+# Used when the embedding model does not report how many tokens it reads
+DEFAULT_MAX_SEQ_LENGTH = 512
+
+def embeddings_max_seq_length(model_name: Optional[str] = None) -> int:
+    """
+    Number of tokens the embedding model `model_name` (by default the model of the active
+    store version) reads; longer inputs are truncated. EMBEDDINGS_MAX_SEQ_LENGTH overrides
+    the `max_seq_length` of the loaded model.
+    """
+    if EMBEDDINGS_MAX_SEQ_LENGTH > 0:
+        return EMBEDDINGS_MAX_SEQ_LENGTH
+    embeddings = get_embeddings(model_name)
+    model = getattr(embeddings, "_client", None) or getattr(embeddings, "client", None) # The SentenceTransformer
+    return getattr(model, "max_seq_length", None) or DEFAULT_MAX_SEQ_LENGTH
+
+
+# Written by the API server while the Chroma server it started owns PERSIST_DIRECTORY,
+# so scripts (ingest, reindex, transfer) go through that server too
+CHROMA_SERVER_FILE = os.path.join(PERSIST_DIRECTORY, "chroma_server.json")
+
+def write_chroma_server_file(pid: int, host: str, port: int) -> None:
+    with open(CHROMA_SERVER_FILE, "w", encoding="utf8") as f:
+        json.dump({"pid": pid, "host": host, "port": port}, f)
+
+def remove_chroma_server_file() -> None:
+    try:
+        os.remove(CHROMA_SERVER_FILE)
+    except FileNotFoundError:
+        pass
+
+def chroma_server_address() -> Optional[Tuple[str, int]]:
+    """
+    Host and port of the Chroma server to use: CHROMA_SERVER_HOST if set, else the
+    server the API started for PERSIST_DIRECTORY if it is still running, else None.
+    """
+    if CHROMA_SERVER_HOST:
+        return CHROMA_SERVER_HOST, CHROMA_SERVER_PORT
+    try:
+        with open(CHROMA_SERVER_FILE, "r", encoding="utf8") as f:
+            server = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    from shared_state import _process_alive
+    if not _process_alive(server["pid"]):
+        return None
+    return server["host"], server["port"]
+
+def get_chroma_client():
+    """
+    Returns the shared Chroma client: of the Chroma server that owns PERSIST_DIRECTORY if
+    there is one (see `chroma_server_address`; several processes must not open it
+    directly), of PERSIST_DIRECTORY otherwise.
+    """
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                import chromadb
+                address = chroma_server_address()
+                if address:
+                    _client = chromadb.HttpClient(host=address[0], port=address[1])
+                else:
+                    _client = chromadb.PersistentClient(path=PERSIST_DIRECTORY)
+    return _client
+
+
+def get_vectorstore(version: Optional[str] = None):
+    """
+    Returns the shared Chroma vector store of `version` (the active version by default),
+    using the embedding model that version was built with. Queries should take the
+    embeddings from the returned store (`db.embeddings`) so both always match.
+    """
+    version = version or active_version()
+    if version not in _vectorstores:
+        with _lock:
+            if version not in _vectorstores:
+                from langchain_chroma.vectorstores import Chroma
+                _vectorstores[version] = Chroma(
+                    client=get_chroma_client(),
+                    collection_name=version,
+                    embedding_function=get_embeddings(embeddings_model_of(version)),
+                )
+    return _vectorstores[version]
+
+
+def document_index_name(version: str) -> str:
+    return f"{version}_documents"
+
+def get_document_index(version: Optional[str] = None):
+    """
+    Returns the document-level Chroma collection of `version` (the active version by
+    default), holding one entry (the centroid of its chunk embeddings) per document.
+    Queries search it first to pick candidate documents (see TWO_TIER_RETRIEVAL).
+    """
+    version = version or active_version()
+    if version not in _document_indexes:
+        with _lock:
+            if version not in _document_indexes:
+                _document_indexes[version] = get_chroma_client().get_or_create_collection(document_index_name(version))
+    return _document_indexes[version]